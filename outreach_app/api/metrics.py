@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from werkzeug.wrappers import Response
+from outreach_app.outreach_app.utils.metrics import collect_metrics, format_prometheus
+
+@frappe.whitelist(methods=["GET"])
+def metrics():
+    """
+    Queue depth, backlog age, send rates and remaining capacity in the Prometheus
+    text format, for System Managers or an API key of one:
+
+        /api/method/outreach_app.outreach_app.api.metrics.metrics
+    """
+    frappe.only_for("System Manager")
+    
+    return Response(format_prometheus(collect_metrics()), mimetype="text/plain; version=0.0.4")
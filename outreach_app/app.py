@@ -18,21 +18,32 @@ app_license = "MIT"
 doc_events = {
     "Email Queue": {
         "before_insert": "outreach_app.outreach_app.utils.email_distribution.assign_sender",
+    },
+    "Message Template": {
+        "validate": "outreach_app.outreach_app.utils.templates.validate_template",
+    },
+    "Campaign Sequence": {
+        "on_update": "outreach_app.outreach_app.utils.sequences.clear_step_successors",
+        "on_trash": "outreach_app.outreach_app.utils.sequences.clear_step_successors",
     }
 }
 
+# Template Variables
+# outreach_template_variables = ["myapp.outreach.get_template_variables"]
+# outreach_template_variable_names = ["account_manager", "last_order_date"]
+
 # Scheduled Tasks
 scheduler_events = {
-    "hourly": [
-        "outreach_app.outreach_app.utils.email_distribution.reset_hourly_counters"
+    "all": [
+        "outreach_app.outreach_app.doctype.email_queue.email_queue.release_expired_claims"
     ],
-    "daily": [
-        "outreach_app.outreach_app.utils.email_distribution.reset_daily_counters"
+    "hourly": [
+        "outreach_app.outreach_app.utils.email_distribution.sync_usage_counters"
     ],
     "cron": {
         # Run campaign email distribution every 15 minutes
         "*/15 * * * *": [
-            "outreach_app.outreach_app.utils.email_distribution.distribute_emails_for_campaign"
+            "outreach_app.outreach_app.utils.email_distribution.distribute_emails_for_all_campaigns"
         ]
     }
 }
@@ -44,5 +55,7 @@ website_route_rules = [
 
 # Commands
 from outreach_app.outreach_app.commands.distribute_emails import commands as distribute_commands
+from outreach_app.outreach_app.commands.dispatcher import commands as dispatcher_commands
+from outreach_app.outreach_app.commands.benchmark import commands as benchmark_commands
 
-commands = distribute_commands
+commands = distribute_commands + dispatcher_commands + benchmark_commands
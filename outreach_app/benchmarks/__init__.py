@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
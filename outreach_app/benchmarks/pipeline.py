@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import math
+import time
+from frappe.utils import now_datetime
+from outreach_app.outreach_app.utils.query_profiler import profile_queries
+from outreach_app.outreach_app.utils.smtp_sink import SMTPSink
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Synthetic records are named after the run, so they can be told apart and removed
+RUN_PREFIX = "OB"
+
+INSERT_CHUNK_SIZE = 10000
+
+# Provider and account limits high enough that capacity never limits a run
+UNLIMITED = 1000000000
+
+class BenchmarkData(object):
+    """
+    Synthetic campaign for one benchmark run: providers whose accounts point at a
+    local SMTP sink, a two-step sequence, contacts and due campaign contacts
+    Bulk records are written with multi-row inserts, using only the columns the
+    site's doctypes actually have
+    """
+
+    def __init__(self, contacts, providers, accounts):
+        self.run_id = f"{RUN_PREFIX}-{frappe.generate_hash(length=8)}"
+        self.contacts = contacts
+        self.providers = providers
+        self.accounts = accounts
+
+        self.campaign = f"{self.run_id} Campaign"
+        self.sequence = f"{self.run_id} Sequence"
+        self.template = f"{self.run_id} Template"
+        self.provider_names = []
+
+    def create(self, sink):
+        now = now_datetime()
+
+        for p in range(self.providers):
+            provider = frappe.get_doc({
+                "doctype": "Email Provider",
+                "provider_name": f"{self.run_id} Provider {p}",
+                "provider_type": "SMTP",
+                "is_active": 1,
+                "daily_email_limit": UNLIMITED,
+                "hourly_email_limit": UNLIMITED,
+                "min_interval_seconds": 0,
+                "max_interval_seconds": 0,
+                "email_accounts": [{
+                    "email": f"{self.run_id.lower()}-{p}-{a}@example.com",
+                    "is_active": 1,
+                    "status": "Active",
+                    "smtp_server": sink.host,
+                    "smtp_port": sink.port,
+                    "use_tls": 0,
+                    "username": f"{self.run_id.lower()}-{p}-{a}",
+                    "password": "secret",
+                    "daily_limit": UNLIMITED,
+                    "hourly_limit": UNLIMITED
+                } for a in range(self.accounts)]
+            }).insert(ignore_permissions=True)
+            self.provider_names.append(provider.name)
+
+        insert_rows("Message Template", [{
+            "name": self.template,
+            "template_name": self.template,
+            "subject": "Hello {first_name}",
+            "body": "Hi {first_name},\n\nThis is a benchmark message for {email}.\n\n{campaign.name}"
+        }])
+
+        step_field = next((df.fieldname for df in frappe.get_meta("Campaign Sequence").get_table_fields()
+            if df.options == "Campaign Step"), "steps")
+        steps = [f"{self.run_id}-step-{i}" for i in range(1, 3)]
+
+        insert_rows("Campaign Sequence", [{"name": self.sequence, "sequence_name": self.sequence}])
+        insert_rows("Campaign Step", [{
+            "name": step,
+            "parent": self.sequence,
+            "parenttype": "Campaign Sequence",
+            "parentfield": step_field,
+            "idx": i,
+            "delay_days": 1,
+            "message_template": self.template
+        } for i, step in enumerate(steps, 1)])
+
+        insert_rows("Campaign", [{
+            "name": self.campaign,
+            "campaign_name": self.campaign,
+            "sequence": self.sequence,
+            "status": "Active"
+        }])
+
+        contact_names = [f"{self.run_id}-{i}" for i in range(self.contacts)]
+
+        insert_rows("Contact", [{
+            "name": name,
+            "first_name": "Bench",
+            "last_name": str(i),
+            "full_name": f"Bench {i}",
+            "email_id": f"{name.lower()}@example.com"
+        } for i, name in enumerate(contact_names)])
+
+        insert_rows("Campaign Contact", [{
+            "name": f"{name}-cc",
+            "campaign": self.campaign,
+            "contact": name,
+            "status": "Pending",
+            "current_step": steps[0],
+            "next_message_date": now
+        } for name in contact_names])
+
+        frappe.db.commit()
+
+    def cleanup(self):
+        """Remove everything the run created"""
+        from outreach_app.outreach_app.utils.send_slots import SLOTS_CACHE_KEY, account_field, provider_field
+        from outreach_app.outreach_app.utils.sequences import clear_step_successors
+
+        contacts = f"{self.run_id}-%"
+
+        frappe.db.sql("""
+            delete from `tabEmail Queue Attachment`
+            where parenttype = 'Email Queue'
+                and parent in (select name from `tabEmail Queue` where campaign = %(campaign)s)
+        """, {"campaign": self.campaign})
+        frappe.db.sql("delete from `tabEmail Queue` where campaign = %(campaign)s", {"campaign": self.campaign})
+        frappe.db.sql("delete from `tabSender Assignment` where contact like %(contacts)s", {"contacts": contacts})
+        frappe.db.sql("delete from `tabSeries` where name like %(series)s", {"series": f"SA-{contacts}"})
+        frappe.db.sql("delete from `tabCampaign Contact` where campaign = %(campaign)s", {"campaign": self.campaign})
+        frappe.db.sql("delete from `tabContact` where name like %(contacts)s", {"contacts": contacts})
+        frappe.db.sql("delete from `tabCampaign` where name = %(campaign)s", {"campaign": self.campaign})
+        frappe.db.sql("delete from `tabCampaign Step` where parent = %(sequence)s", {"sequence": self.sequence})
+        frappe.db.sql("delete from `tabCampaign Sequence` where name = %(sequence)s", {"sequence": self.sequence})
+        frappe.db.sql("delete from `tabMessage Template` where name = %(template)s", {"template": self.template})
+
+        accounts = frappe.get_all("Email Account", filters={"parent": ["in", self.provider_names or [""]],
+            "parenttype": "Email Provider"}, pluck="name")
+
+        for provider in self.provider_names:
+            frappe.delete_doc("Email Provider", provider, ignore_permissions=True, force=True)
+
+        # Slot calendar cursors of the deleted providers and accounts
+        for field in [provider_field(provider) for provider in self.provider_names] + [account_field(account) for account in accounts]:
+            frappe.cache().hdel(SLOTS_CACHE_KEY, field)
+
+        clear_step_successors(frappe._dict(name=self.sequence))
+        frappe.db.commit()
+
+def insert_rows(doctype, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """Multi-row insert of plain dicts, dropping keys that are not columns of the doctype"""
+    if not rows:
+        return
+
+    now = now_datetime()
+    columns = set(frappe.get_meta(doctype).get_valid_columns())
+    standard = {"owner": frappe.session.user, "modified_by": frappe.session.user,
+        "creation": now, "modified": now, "docstatus": 0}
+
+    fields = [field for field in list(standard) + list(rows[0]) if field in columns]
+    if "idx" in columns and "idx" not in fields:
+        fields.append("idx")
+
+    values = [[row.get(field, standard.get(field, 0 if field == "idx" else None)) for field in fields] for row in rows]
+    frappe.db.bulk_insert(doctype, fields, values, chunk_size=chunk_size)
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(percent / 100.0 * len(ordered))))
+
+    return ordered[min(rank, len(ordered)) - 1]
+
+def run_pipeline_benchmark(contacts=1000, providers=5, accounts=10, latency=0, chunk_size=None,
+        send_batch=500, keep_data=False):
+    """
+    Run one synthetic campaign through distribution and sending against a local
+    SMTP sink and report throughput, queries per email and send latency
+
+    Distribution is distribute_emails_for_campaign. Sending follows the
+    process_queue path: due emails are claimed with claim_emails and each is
+    sent with send_email, as the send jobs would, run inline so every send can
+    be timed. Only the benchmark campaign's emails are selected, so other emails
+    on the site are never touched.
+
+    Creates and deletes records, so it only runs on sites with allow_tests set.
+    """
+    from outreach_app.outreach_app.doctype.email_queue.email_queue import claim_emails, send_email
+    from outreach_app.outreach_app.utils.email_distribution import distribute_emails_for_campaign
+    from outreach_app.outreach_app.utils.smtp_pool import get_smtp_pool
+
+    if not frappe.conf.get("allow_tests"):
+        frappe.throw("Benchmarks create and delete records; set allow_tests in site_config.json to run them on this site")
+
+    data = BenchmarkData(int(contacts), int(providers), int(accounts))
+    results = {"contacts": data.contacts, "providers": data.providers, "accounts": data.providers * data.accounts}
+
+    with SMTPSink(latency=latency) as sink:
+        try:
+            start = time.monotonic()
+            data.create(sink)
+            results["setup_seconds"] = time.monotonic() - start
+
+            # Distribution
+            with profile_queries("distribute") as profile:
+                start = time.monotonic()
+                queued = distribute_emails_for_campaign(data.campaign, data.contacts, chunk_size)
+                frappe.db.commit()
+                elapsed = time.monotonic() - start
+
+            results["distribute"] = phase_result(queued, elapsed, profile)
+
+            # Send times are spread into the future by the slot calendar; make them all due now
+            frappe.db.sql("""
+                update `tabEmail Queue` set scheduled_time = %(now)s
+                where campaign = %(campaign)s and status in ('Queued', 'Scheduled')
+            """, {"now": now_datetime(), "campaign": data.campaign})
+            frappe.db.commit()
+
+            # Sending
+            latencies = []
+            with profile_queries("send") as profile:
+                start = time.monotonic()
+
+                while True:
+                    names = frappe.db.sql_list("""
+                        select name from `tabEmail Queue`
+                        where campaign = %(campaign)s and status in ('Queued', 'Scheduled')
+                            and scheduled_time <= %(now)s
+                        order by scheduled_time asc
+                        limit %(limit)s
+                    """, {"campaign": data.campaign, "now": now_datetime(), "limit": int(send_batch)})
+
+                    if not names:
+                        break
+
+                    claim, claimed = claim_emails(names)
+                    frappe.db.commit()
+
+                    if not claimed:
+                        break
+
+                    for name in names:
+                        if name not in claimed:
+                            continue
+
+                        sent_at = time.monotonic()
+                        send_email(name, claim)
+                        frappe.db.commit()
+                        latencies.append(time.monotonic() - sent_at)
+
+                elapsed = time.monotonic() - start
+
+            sent = frappe.db.count("Email Queue", {"campaign": data.campaign, "status": "Sent"})
+            results["send"] = phase_result(sent, elapsed, profile)
+            results["send"]["attempted"] = len(latencies)
+            results["send"]["received"] = sink.messages
+            results["send"]["p50_ms"] = percentile(latencies, 50) * 1000
+            results["send"]["p99_ms"] = percentile(latencies, 99) * 1000
+        finally:
+            get_smtp_pool().close_all()
+
+            if not keep_data:
+                frappe.db.rollback()
+                data.cleanup()
+
+    results["run_id"] = data.run_id
+    return results
+
+def phase_result(emails, elapsed, profile):
+    return {
+        "emails": emails,
+        "seconds": elapsed,
+        "emails_per_second": emails / elapsed if elapsed else 0.0,
+        "queries": profile.queries,
+        "queries_per_email": float(profile.queries) / emails if emails else 0.0,
+        "db_seconds": profile.db_time,
+        "top_statements": profile.top(5)
+    }
+
+def run_pipeline_benchmarks(sizes=DEFAULT_SIZES, providers=5, accounts=10, latency=0, chunk_size=None,
+        keep_data=False):
+    """
+    Run the pipeline benchmark for each campaign size
+    Returns the results of every size; format_report renders one as text
+
+    bench --site <site> execute outreach_app.outreach_app.benchmarks.pipeline.run_pipeline_benchmarks
+    """
+    return [
+        run_pipeline_benchmark(contacts, providers, accounts, latency, chunk_size, keep_data=keep_data)
+        for contacts in sizes
+    ]
+
+def format_report(results):
+    lines = [f"{results['contacts']} contacts, {results['providers']} providers, {results['accounts']} accounts"
+        f" (run {results['run_id']}, setup {results['setup_seconds']:.1f}s)"]
+
+    for phase in ("distribute", "send"):
+        phase_results = results[phase]
+        lines.append(
+            f"  {phase:<10} {phase_results['emails']:>8} emails  {phase_results['seconds']:>8.2f}s"
+            f"  {phase_results['emails_per_second']:>9.1f} emails/s"
+            f"  {phase_results['queries_per_email']:>6.1f} queries/email"
+            f"  {phase_results['db_seconds']:>7.2f}s in the database"
+        )
+
+        for statement, count in phase_results["top_statements"]:
+            lines.append(f"      {count:>8}x  {statement[:120]}")
+
+    lines.append(f"  send latency p50 {results['send']['p50_ms']:.1f} ms, p99 {results['send']['p99_ms']:.1f} ms")
+
+    return "\n".join(lines)
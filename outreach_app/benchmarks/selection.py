@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import datetime
+import random
+import time
+from outreach_app.outreach_app.utils.capacity import (
+    AccountCapacity, ProviderCapacity, CapacitySnapshot, account_weight
+)
+
+def build_synthetic_snapshot(accounts=10000, providers=10, seed=None):
+    """In-memory snapshot of providers and accounts with random usage; no database access"""
+    rng = random.Random(seed)
+    now = datetime.datetime.now()
+    records = [ProviderCapacity(f"Provider {i}", 0) for i in range(providers)]
+
+    for i in range(accounts):
+        daily_limit = rng.choice((200, 500, 1000))
+        records[i % providers].add_account(AccountCapacity(
+            f"Account {i}", f"sender{i}@example.com", records[i % providers].name,
+            rng.randint(0, daily_limit // 2), daily_limit,
+            0, daily_limit,
+            now - datetime.timedelta(seconds=rng.randint(0, 7200))
+        ))
+
+    return CapacitySnapshot(records)
+
+def linear_selection(accounts, now):
+    """Previous strategy: rebuild the weights and scan a cumulative list on every call"""
+    available = [account for account in accounts if account.is_available()]
+    weights = [account_weight(account, now) for account in available]
+    total = sum(weights)
+
+    if not total:
+        return None
+
+    target = random.random() * total
+    cumulative = 0.0
+    for account, weight in zip(available, weights):
+        cumulative += weight
+        if target < cumulative:
+            return account
+
+    return available[-1]
+
+def run_selection_benchmark(accounts=10000, selections=1000, providers=1, seed=None):
+    """
+    Time account selection with the per-call linear scan against the snapshot's
+    Fenwick tree sampler, recording a send after every selection in both cases
+
+    bench --site <site> execute outreach_app.outreach_app.benchmarks.selection.run_selection_benchmark
+    """
+    accounts, selections, providers = int(accounts), int(selections), int(providers)
+    results = {"accounts": accounts, "selections": selections, "providers": providers}
+
+    snapshot = build_synthetic_snapshot(accounts, providers, seed)
+    provider_names = list(snapshot.providers)
+    now = datetime.datetime.now()
+    start = time.perf_counter()
+    for i in range(selections):
+        account = linear_selection(snapshot.providers[provider_names[i % providers]].accounts, now)
+        if account:
+            snapshot.record_send(account.name, when=now)
+    results["linear_seconds"] = time.perf_counter() - start
+
+    snapshot = build_synthetic_snapshot(accounts, providers, seed)
+    start = time.perf_counter()
+    for i in range(selections):
+        account = snapshot.sample_account(provider_names[i % providers])
+        if account:
+            snapshot.record_send(account.name, when=now)
+    results["sampler_seconds"] = time.perf_counter() - start
+
+    for strategy in ("linear", "sampler"):
+        seconds = results[f"{strategy}_seconds"]
+        results[f"{strategy}_us_per_selection"] = seconds * 1e6 / selections if selections else 0.0
+
+    results["speedup"] = results["linear_seconds"] / results["sampler_seconds"] if results["sampler_seconds"] else 0.0
+
+    return results
+
+def format_report(results):
+    return (
+        f"{results['accounts']} accounts, {results['selections']} selections: "
+        f"linear {results['linear_us_per_selection']:.1f} us, "
+        f"sampler {results['sampler_us_per_selection']:.1f} us, "
+        f"{results['speedup']:.0f}x"
+    )
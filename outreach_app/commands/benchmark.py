@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import click
+from frappe.commands.utils import pass_context
+
+@click.command('outreach-benchmark')
+@click.option('--contacts', type=int, multiple=True, help='Campaign size to run; repeat for several (default 1000, 10000 and 100000)')
+@click.option('--providers', default=5, help='Number of synthetic email providers')
+@click.option('--accounts', default=10, help='Number of email accounts per provider')
+@click.option('--latency', default=0.0, help='Seconds the SMTP sink waits before accepting each message')
+@click.option('--chunk-size', type=int, help='Campaign contacts claimed and committed at a time during distribution')
+@click.option('--keep-data', is_flag=True, help='Keep the synthetic records instead of deleting them')
+@pass_context
+def outreach_benchmark(context, contacts=None, providers=5, accounts=10, latency=0.0, chunk_size=None, keep_data=False):
+    """Run synthetic campaigns through distribution and sending against a local SMTP sink"""
+    from outreach_app.outreach_app.benchmarks.pipeline import DEFAULT_SIZES, run_pipeline_benchmark, format_report
+    
+    with frappe.init_site(context.sites[0]):
+        frappe.connect()
+        
+        try:
+            for size in contacts or DEFAULT_SIZES:
+                results = run_pipeline_benchmark(size, providers, accounts, latency, chunk_size, keep_data=keep_data)
+                click.echo(format_report(results))
+        finally:
+            frappe.destroy()
+
+@click.command('outreach-selection-benchmark')
+@click.option('--accounts', default=10000, help='Number of synthetic email accounts')
+@click.option('--selections', default=1000, help='Number of account selections to time')
+@click.option('--providers', default=1, help='Number of providers the accounts are spread over')
+@click.option('--seed', type=int, help='Random seed for the synthetic usage counters')
+@pass_context
+def outreach_selection_benchmark(context, accounts=10000, selections=1000, providers=1, seed=None):
+    """Time account selection by linear scan against the weighted sampler, in memory"""
+    from outreach_app.outreach_app.benchmarks.selection import run_selection_benchmark, format_report
+    
+    with frappe.init_site(context.sites[0]):
+        click.echo(format_report(run_selection_benchmark(accounts, selections, providers, seed)))
+
+commands = [
+    outreach_benchmark,
+    outreach_selection_benchmark
+]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import click
+from frappe.commands.utils import pass_context
+
+@click.command('outreach-dispatcher')
+@click.option('--lookahead', type=int, help='Seconds ahead of now to keep scheduled emails in memory')
+@click.option('--refill-interval', type=int, help='Seconds between incremental reads of the queue')
+@pass_context
+def outreach_dispatcher(context, lookahead=None, refill_interval=None):
+    """Run the long-running email dispatcher until stopped with SIGTERM or Ctrl+C"""
+    from outreach_app.outreach_app.utils.dispatcher import EmailDispatcher
+    
+    with frappe.init_site(context.sites[0]):
+        frappe.connect()
+        
+        dispatcher = EmailDispatcher(lookahead=lookahead, refill_interval=refill_interval)
+        click.echo(f"Dispatcher {dispatcher.lock.owner} started, waiting for the leader lock")
+        
+        try:
+            dispatcher.run()
+        finally:
+            frappe.destroy()
+        
+        click.echo("Dispatcher stopped")
+
+commands = [
+    outreach_dispatcher
+]
@@ -13,12 +13,18 @@ from frappe.utils import now_datetime
 @click.option('--campaign', help='Campaign name to distribute emails for')
 @click.option('--limit', default=100, help='Maximum number of emails to distribute')
 @click.option('--force', is_flag=True, help='Force distribution even if daily limits are reached')
+@click.option('--workers', default=1, help='Number of worker processes distributing in parallel')
+@click.option('--chunk-size', type=int, help='Campaign contacts claimed and committed at a time')
 @pass_context
-def distribute_emails(context, campaign=None, limit=100, force=False):
+def distribute_emails(context, campaign=None, limit=100, force=False, workers=1, chunk_size=None):
     """Distribute emails for a campaign or all active campaigns"""
-    from outreach_app.outreach_app.utils.email_distribution import distribute_emails_for_campaign, check_daily_limits_reached
+    from outreach_app.outreach_app.utils.email_distribution import (distribute_emails_for_campaign,
+        get_campaign_shares, check_daily_limits_reached)
+    from outreach_app.outreach_app.utils.parallel_distribution import distribute_in_parallel
     
-    with frappe.init_site(context.sites[0]):
+    site = context.sites[0]
+    
+    with frappe.init_site(site):
         frappe.connect()
         
         if not force and check_daily_limits_reached():
@@ -31,27 +37,30 @@ def distribute_emails(context, campaign=None, limit=100, force=False):
                 click.echo(f"Campaign {campaign} does not exist")
                 return
             
-            count = distribute_emails_for_campaign(campaign, limit)
-            click.echo(f"Distributed {count} emails for campaign {campaign}")
+            shares = {campaign: limit}
         else:
-            # Distribute emails for all active campaigns
-            campaigns = frappe.get_all(
-                "Campaign",
-                filters={"status": "Active"},
-                fields=["name"]
-            )
+            # Distribute emails for all active campaigns, sharing capacity by campaign weight
+            shares = get_campaign_shares(limit, force)
             
-            if not campaigns:
+            if not shares:
                 click.echo("No active campaigns found")
                 return
-            
-            total_count = 0
-            for campaign_data in campaigns:
-                count = distribute_emails_for_campaign(campaign_data.name, limit)
-                total_count += count
-                click.echo(f"Distributed {count} emails for campaign {campaign_data.name}")
-            
-            click.echo(f"Total emails distributed: {total_count}")
+        
+        if workers > 1:
+            # Workers claim disjoint chunks of due contacts, so they can run side by side
+            frappe.db.commit()
+            counts = distribute_in_parallel(site, shares, workers, chunk_size)
+        else:
+            counts = {
+                campaign_name: distribute_emails_for_campaign(campaign_name, share, chunk_size) if share else 0
+                for campaign_name, share in shares.items()
+            }
+        
+        for campaign_name, count in counts.items():
+            click.echo(f"Distributed {count} emails for campaign {campaign_name}")
+        
+        if not campaign:
+            click.echo(f"Total emails distributed: {sum(counts.values())}")
         
         frappe.db.commit()
 
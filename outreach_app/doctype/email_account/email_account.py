@@ -8,6 +8,11 @@ import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from frappe.model.document import Document
+from outreach_app.outreach_app.doctype.email_provider.email_provider import (
+    reserve_account_slot, release_account_slot, log_limits_reached
+)
+from outreach_app.outreach_app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker
+from outreach_app.outreach_app.utils.smtp_pool import get_smtp_pool
 
 class EmailAccount(Document):
     def validate(self):
@@ -52,6 +57,8 @@ class EmailAccount(Document):
     def send_email(self, to_email, subject, message, html_message=None, attachments=None):
         """
         Send an email using this account
+        Raises CircuitOpenError without connecting while the circuit breaker of
+        this account or its SMTP server is open
         Returns: success (bool), error_message (str)
         """
         if not self.is_active:
@@ -60,45 +67,32 @@ class EmailAccount(Document):
         if self.status != "Active":
             return False, f"Email account status is {self.status}"
         
-        if self.daily_count >= self.daily_limit:
-            return False, "Daily sending limit reached"
-        
-        if self.hourly_count >= self.hourly_limit:
-            return False, "Hourly sending limit reached"
+        # Check and record the send against the rolling-window limits in one step
+        # so concurrent workers cannot overshoot
+        token = reserve_account_slot(self.name)
+        if not token:
+            return False, "Sending limit reached"
         
         try:
             # Create message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            # Attach text part
-            msg.attach(MIMEText(message, 'plain'))
-            
-            # Attach HTML part if provided
-            if html_message:
-                msg.attach(MIMEText(html_message, 'html'))
+            msg = build_message(self.email, to_email, subject, message, html_message, attachments)
             
-            # Connect to SMTP server
-            if self.use_tls:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-                server.starttls()
-            else:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            
-            # Login and send
-            server.login(self.username, self.get_password())
-            server.sendmail(self.email, to_email, msg.as_string())
-            server.quit()
+            # Send over a pooled session, logging in only when a new connection is needed
+            get_smtp_pool().sendmail(self, self.email, to_email, msg.as_string(), breaker=get_circuit_breaker())
             
-            # Update usage counters
-            parent_provider = frappe.get_doc("Email Provider", self.parent)
-            parent_provider.update_account_usage(self.name)
+            # Keep this instance's counters current when it is reused for a batch
+            self.hourly_count, self.daily_count = token.counts
+            log_limits_reached(self)
             
             return True, "Email sent successfully"
         
+        except CircuitOpenError:
+            release_account_slot(token)
+            raise
+        
         except Exception as e:
+            release_account_slot(token)
+            
             error_message = str(e)
             frappe.log_error(
                 message=f"Failed to send email from {self.email}: {error_message}",
@@ -107,7 +101,42 @@ class EmailAccount(Document):
             
             # Update status if there's a connection issue
             if "Authentication" in error_message or "login" in error_message.lower():
+                get_smtp_pool().close_account(self.name)
                 self.status = "Error"
                 self.save()
             
             return False, error_message
+
+def build_message(from_email, to_email, subject, message, html_message=None, attachments=None):
+    """
+    Build the MIME message for an outgoing email
+    attachments is a list of {"fname", "fpath"} dicts; their encoded parts come
+    from the MIME part cache, so a file shared by many emails is encoded once
+    Returns: email.mime.multipart.MIMEMultipart
+    """
+    from outreach_app.outreach_app.utils.mime_cache import get_attachment_parts
+    
+    body = MIMEMultipart('alternative')
+    
+    # Attach text part
+    body.attach(MIMEText(message, 'plain'))
+    
+    # Attach HTML part if provided
+    if html_message:
+        body.attach(MIMEText(html_message, 'html'))
+    
+    parts = get_attachment_parts(attachments) if attachments else []
+    
+    if parts:
+        msg = MIMEMultipart('mixed')
+        msg.attach(body)
+        for part in parts:
+            msg.attach(part)
+    else:
+        msg = body
+    
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    return msg
@@ -7,6 +7,8 @@ import frappe
 import random
 from frappe.model.document import Document
 from frappe.utils import now_datetime, get_datetime, time_diff_in_seconds
+from outreach_app.outreach_app.utils.circuit_breaker import get_circuit_breaker
+from outreach_app.outreach_app.utils.rate_limiter import get_rate_limiter
 
 class EmailProvider(Document):
     def validate(self):
@@ -36,9 +38,22 @@ class EmailProvider(Document):
                 "parenttype": "Email Provider",
                 "is_active": 1
             },
-            fields=["name", "email", "daily_limit", "hourly_limit", "daily_count", "hourly_count", "last_used"]
+            fields=["name", "email", "daily_limit", "hourly_limit", "daily_count", "hourly_count", "last_used",
+                "smtp_server"]
         )
         
+        # Current usage comes from the rolling-window limiter
+        usage = get_rate_limiter().get_account_usage([account.name for account in email_accounts])
+        
+        # blocked_until is set for accounts whose circuit breaker is open
+        blocked = get_circuit_breaker().blocked_until(
+            [(account.name, account.smtp_server) for account in email_accounts]
+        )
+        
+        for account in email_accounts:
+            account.hourly_count, account.daily_count = usage[account.name]
+            account.blocked_until = blocked.get(account.name)
+        
         return email_accounts
     
     def get_next_available_account(self, contact=None):
@@ -48,22 +63,18 @@ class EmailProvider(Document):
         """
         # First check if contact has a previous sender assignment
         if contact:
-            sender_assignment = frappe.get_all(
-                "Sender Assignment",
-                filters={
-                    "contact": contact,
-                    "is_active": 1
-                },
-                fields=["email_account"],
-                limit=1
-            )
+            from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
+            
+            sender_assignment = SenderAssignment.get_cached_assignment(contact)
             
             if sender_assignment:
                 # Check if the assigned account is still available
-                account = frappe.get_doc("Email Account", sender_assignment[0].email_account)
+                account = frappe.get_doc("Email Account", sender_assignment.email_account)
+                hourly_count, daily_count = get_rate_limiter().get_account_usage([account.name])[account.name]
                 if (account.is_active and 
-                    account.daily_count < account.daily_limit and 
-                    account.hourly_count < account.hourly_limit):
+                    daily_count < account.daily_limit and 
+                    hourly_count < account.hourly_limit and
+                    not get_circuit_breaker().blocked_until([(account.name, account.smtp_server)])):
                     return account
         
         # Get all available accounts
@@ -76,15 +87,16 @@ class EmailProvider(Document):
             )
             return None
         
-        # Filter accounts that haven't reached their limits
+        # Filter accounts that haven't reached their limits or had their circuit breaker opened
         available_accounts = [
             account for account in available_accounts 
             if account.daily_count < account.daily_limit and account.hourly_count < account.hourly_limit
+            and not account.blocked_until
         ]
         
         if not available_accounts:
             frappe.log_error(
-                message=f"All email accounts for provider {self.name} have reached their sending limits",
+                message=f"All email accounts for provider {self.name} have reached their sending limits or are blocked by an open circuit breaker",
                 title="Email Provider Error"
             )
             return None
@@ -155,42 +167,109 @@ class EmailProvider(Document):
     
     def update_account_usage(self, email_account):
         """
-        Update usage counters for an email account after sending
+        Record a send for an email account against its and this provider's
+        rolling-window limits; see reserve_account_slot
+        Returns the SendToken, or None if a limit is reached and nothing was recorded
         """
-        account = frappe.get_doc("Email Account", email_account)
-        account.daily_count += 1
-        account.hourly_count += 1
-        account.last_used = now_datetime()
-        account.save()
-        
-        # Check if account has reached its limits
-        if account.daily_count >= account.daily_limit:
-            frappe.log_error(
-                message=f"Email account {account.email} has reached its daily sending limit",
-                title="Email Account Limit Reached"
-            )
+        token = reserve_account_slot(email_account)
         
-        if account.hourly_count >= account.hourly_limit:
-            frappe.log_error(
-                message=f"Email account {account.email} has reached its hourly sending limit",
-                title="Email Account Limit Reached"
+        if token:
+            # Check if account has reached its limits
+            account = frappe.db.get_value(
+                "Email Account",
+                email_account,
+                ["email", "daily_count", "daily_limit", "hourly_count", "hourly_limit"],
+                as_dict=True
             )
+            log_limits_reached(account)
+        
+        return token
+
+def get_account_limits(email_account):
+    """
+    Get the limits that apply to sends from an account, including its provider's
+    Returns a dict or None
+    """
+    limits = frappe.db.sql("""
+        select account.name, account.parent as provider, account.is_active,
+            account.hourly_limit, account.daily_limit,
+            provider.hourly_email_limit, provider.daily_email_limit
+        from `tabEmail Account` account
+        inner join `tabEmail Provider` provider on provider.name = account.parent
+        where account.name = %(account)s
+    """, {"account": email_account}, as_dict=True)
     
-    def reset_hourly_counters(self):
-        """
-        Reset hourly counters for all email accounts in this provider
-        """
-        for account_data in self.email_accounts:
-            account = frappe.get_doc("Email Account", account_data.name)
-            account.hourly_count = 0
-            account.save()
+    return limits[0] if limits else None
+
+def reserve_account_slot(email_account, limits=None):
+    """
+    Atomically record one send from an account if the account and its provider
+    are under their rolling hourly and daily limits
+    Returns a SendToken to release if the send fails, or None if a limit is reached
+    """
+    tokens = reserve_account_slots(email_account, 1, limits)
+    return tokens[0] if tokens else None
+
+def reserve_account_slots(email_account, count, limits=None):
+    """
+    Atomically record up to count sends from an account, stopping at the first limit
+    Returns the list of SendTokens granted
+    """
+    limits = limits or get_account_limits(email_account)
+    if not limits or not limits.is_active:
+        return []
     
-    def reset_daily_counters(self):
-        """
-        Reset daily counters for all email accounts in this provider
-        """
-        for account_data in self.email_accounts:
-            account = frappe.get_doc("Email Account", account_data.name)
-            account.daily_count = 0
-            account.hourly_count = 0
-            account.save()
+    limiter = get_rate_limiter()
+    tokens = []
+    for i in range(count):
+        token = limiter.try_acquire(
+            email_account,
+            (limits.hourly_limit, limits.daily_limit),
+            limits.provider,
+            (limits.hourly_email_limit, limits.daily_email_limit)
+        )
+        if not token:
+            break
+        
+        tokens.append(token)
+    
+    if tokens:
+        update_usage_counters(email_account, *tokens[-1].counts)
+    
+    return tokens
+
+def release_account_slot(token):
+    """
+    Give back a reserved send that was not used, e.g. after a failed send
+    """
+    get_rate_limiter().release(token)
+
+def update_usage_counters(email_account, hourly_count, daily_count):
+    """
+    Mirror an account's rolling-window usage onto its counter fields
+    The limiter is authoritative; the fields are kept for display and reporting
+    """
+    frappe.db.sql("""
+        update `tabEmail Account`
+        set hourly_count = %(hourly_count)s,
+            daily_count = %(daily_count)s,
+            last_used = %(now)s
+        where name = %(account)s
+    """, {"hourly_count": hourly_count, "daily_count": daily_count, "now": now_datetime(), "account": email_account})
+
+def log_limits_reached(account):
+    """Log when an account has reached its daily or hourly sending limit"""
+    if not account:
+        return
+    
+    if account.daily_count >= account.daily_limit:
+        frappe.log_error(
+            message=f"Email account {account.email} has reached its daily sending limit",
+            title="Email Account Limit Reached"
+        )
+    
+    if account.hourly_count >= account.hourly_limit:
+        frappe.log_error(
+            message=f"Email account {account.email} has reached its hourly sending limit",
+            title="Email Account Limit Reached"
+        )
@@ -5,10 +5,35 @@
 from __future__ import unicode_literals
 import frappe
 import json
-import os
+import time
+import uuid
 from frappe.model.document import Document
-from frappe.utils import now_datetime, get_datetime, time_diff_in_seconds, add_to_date
+from frappe.utils import now_datetime, get_datetime, time_diff_in_seconds, add_to_date, cint
 from frappe.utils.background_jobs import enqueue
+from outreach_app.outreach_app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker, get_retry_datetime
+from outreach_app.outreach_app.utils.link_validation import validate_links, validate_links_bulk
+from outreach_app.outreach_app.utils.naming import reserve_series
+from outreach_app.outreach_app.utils.query_profiler import profiled
+
+# Batch dispatch defaults, overridable from site_config.json
+DEFAULT_SEND_BATCH_SIZE = 50
+DEFAULT_SEND_BATCH_TIME_BUDGET = 240
+
+DEFAULT_BULK_INSERT_CHUNK_SIZE = 500
+
+# Seconds a dispatch claim is held before the sweeper returns the email to the queue
+DEFAULT_CLAIM_LEASE = 900
+
+# Series used by the "format:EQ-{####}" autoname
+NAMING_SERIES = "EQ-"
+
+LINK_FIELDS = {
+    "contact": "Contact",
+    "email_provider": "Email Provider",
+    "email_account": "Email Account",
+    "campaign": "Campaign",
+    "campaign_step": "Campaign Step"
+}
 
 class EmailQueue(Document):
     def validate(self):
@@ -26,25 +51,8 @@ class EmailQueue(Document):
         if not self.scheduled_time:
             self.scheduled_time = now_datetime()
         
-        # Validate contact if provided
-        if self.contact and not frappe.db.exists("Contact", self.contact):
-            frappe.throw(f"Contact {self.contact} does not exist")
-        
-        # Validate email provider if provided
-        if self.email_provider and not frappe.db.exists("Email Provider", self.email_provider):
-            frappe.throw(f"Email Provider {self.email_provider} does not exist")
-        
-        # Validate email account if provided
-        if self.email_account and not frappe.db.exists("Email Account", self.email_account):
-            frappe.throw(f"Email Account {self.email_account} does not exist")
-        
-        # Validate campaign if provided
-        if self.campaign and not frappe.db.exists("Campaign", self.campaign):
-            frappe.throw(f"Campaign {self.campaign} does not exist")
-        
-        # Validate campaign step if provided
-        if self.campaign_step and not frappe.db.exists("Campaign Step", self.campaign_step):
-            frappe.throw(f"Campaign Step {self.campaign_step} does not exist")
+        # Validate contact, provider, account, campaign and step if provided
+        validate_links(self, LINK_FIELDS)
     
     def before_insert(self):
         """Before inserting a new email queue entry"""
@@ -73,7 +81,7 @@ class EmailQueue(Document):
         """Check if contact has an existing sender assignment"""
         from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
         
-        assignment = SenderAssignment.get_assignment_for_contact(self.contact)
+        assignment = SenderAssignment.get_cached_assignment(self.contact)
         
         if assignment:
             self.email_provider = assignment.email_provider
@@ -103,7 +111,7 @@ class EmailQueue(Document):
                 from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
                 
                 # Check if assignment already exists
-                existing_assignment = SenderAssignment.get_assignment_for_contact(self.contact)
+                existing_assignment = SenderAssignment.get_cached_assignment(self.contact)
                 
                 if not existing_assignment:
                     # Create new assignment
@@ -120,66 +128,58 @@ class EmailQueue(Document):
         provider = frappe.get_doc("Email Provider", self.email_provider)
         
         self.sender_email = account.email
-        
-        # Use default sender name from provider if available
-        if provider.default_sender_name:
-            self.sender_name = provider.default_sender_name
-        else:
-            # Extract name from email (before @)
-            self.sender_name = account.email.split('@')[0].replace('.', ' ').title()
+        self.sender_name = get_sender_name(account.email, provider.default_sender_name)
     
     def calculate_next_send_time(self):
-        """Calculate the next send time based on provider settings"""
-        provider = frappe.get_doc("Email Provider", self.email_provider)
-        
-        # Get the last sent email from this provider
-        last_sent = frappe.get_all(
-            "Email Queue",
-            filters={
-                "email_provider": self.email_provider,
-                "status": "Sent"
-            },
-            fields=["sent_time"],
-            order_by="sent_time desc",
-            limit=1
-        )
+        """Calculate the next send time from the send slot calendar of the account and provider"""
+        from outreach_app.outreach_app.utils.send_slots import get_send_slot_calendar
         
-        if last_sent:
-            last_send_time = get_datetime(last_sent[0].sent_time)
-        else:
-            last_send_time = now_datetime()
-        
-        # Calculate next send time
-        next_send_time = provider.get_next_send_time(last_send_time)
+        next_send_time = get_send_slot_calendar().allocate(
+            [(self.email_account, self.email_provider)],
+            natural=False
+        )[0]
         
         # Update scheduled time if it's earlier than the calculated next send time
-        if get_datetime(self.scheduled_time) < next_send_time:
+        if next_send_time and get_datetime(self.scheduled_time) < next_send_time:
             self.scheduled_time = next_send_time
             self.status = "Scheduled"
     
-    def send(self):
-        """Send the email using the assigned email account"""
-        if self.status not in ["Queued", "Scheduled"]:
+    def send(self, account=None, claim=None):
+        """
+        Send the email using the assigned email account
+        account can be passed to reuse the document already loaded by a batch job
+        claim is the dispatch claim the job was enqueued with; the email is only sent
+        while that claim still holds it. Emails held by a claim cannot be sent
+        without it, so a manual send never races the job that claimed them.
+        """
+        if claim:
+            if self.status != "Dispatching" or self.claimed_by != claim:
+                return False, "Email is no longer claimed by this job"
+        elif self.status == "Dispatching":
+            return False, "Email is claimed by a send job"
+        elif self.status not in ["Queued", "Scheduled"]:
             return False, f"Cannot send email with status {self.status}"
         
         if not self.email_account:
             return False, "No email account assigned"
         
         try:
+            if not account or account.name != self.email_account:
+                account = frappe.get_doc("Email Account", self.email_account)
+            
+            # While the account's or its server's circuit breaker is open, wait instead of failing
+            retry_at = get_circuit_breaker().blocked_until([(account.name, account.smtp_server)]).get(account.name)
+            if retry_at:
+                return self.defer(retry_at)
+            
             self.status = "Sending"
             self.save()
             
-            account = frappe.get_doc("Email Account", self.email_account)
-            
-            # Prepare attachments
-            attachments = []
-            if self.attachments:
-                for attachment in self.attachments:
-                    if os.path.exists(attachment.file_path):
-                        attachments.append({
-                            "fname": attachment.file_name,
-                            "fpath": attachment.file_path
-                        })
+            # Prepare attachments; missing files are skipped when the message is built
+            attachments = [
+                {"fname": attachment.file_name, "fpath": attachment.file_path}
+                for attachment in self.attachments or []
+            ]
             
             # Send email
             success, message = account.send_email(
@@ -198,9 +198,9 @@ class EmailQueue(Document):
                 if self.contact:
                     from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
                     
-                    assignment = SenderAssignment.get_assignment_for_contact(self.contact)
+                    assignment = SenderAssignment.get_cached_assignment(self.contact)
                     if assignment:
-                        assignment.update_email_sent(self.campaign)
+                        SenderAssignment.record_email_sent(assignment.name, self.campaign)
             else:
                 self.status = "Error"
                 self.error = message
@@ -209,6 +209,9 @@ class EmailQueue(Document):
             self.save()
             return success, message
         
+        except CircuitOpenError as e:
+            return self.defer(e.retry_at)
+        
         except Exception as e:
             self.status = "Error"
             self.error = str(e)
@@ -222,6 +225,20 @@ class EmailQueue(Document):
             
             return False, str(e)
     
+    def defer(self, retry_at):
+        """
+        Put the email back in the queue until retry_at (a POSIX timestamp), without
+        counting a retry
+        """
+        self.flags.deferred = True
+        self.status = "Scheduled"
+        self.scheduled_time = get_retry_datetime(retry_at)
+        self.claimed_by = None
+        self.claim_expires = None
+        self.save()
+        
+        return False, f"Circuit breaker open for {self.email_account}, deferred to {self.scheduled_time}"
+    
     def retry(self):
         """Retry sending the email"""
         if self.status != "Error":
@@ -246,67 +263,496 @@ class EmailQueue(Document):
         return True, "Email cancelled successfully"
     
     @staticmethod
-    def process_queue(limit=100):
+    def process_queue(limit=100, batch=None):
         """
         Process the email queue
         This method is called by the scheduler
+        Due emails are grouped by email account and each background job sends a
+        whole batch for one account. RQ forks a fresh process for every job, so the
+        SMTP connection pool only lives as long as one job: a batch logs in once,
+        while per-email jobs (outreach_batch_dispatch set to 0, kept as a fallback)
+        log in again for every email.
+        With outreach_async_send enabled a single job sends concurrently across accounts,
+        up to outreach_async_send_limit emails. It is enqueued under a fixed job id, so
+        ticks that come while a run is waiting or in progress add no second run
         """
-        # Get emails that are scheduled to be sent now
-        current_time = now_datetime()
-        
-        emails = frappe.get_all(
-            "Email Queue",
-            filters={
-                "status": ["in", ["Queued", "Scheduled"]],
-                "scheduled_time": ["<=", current_time]
-            },
-            fields=["name"],
-            order_by="priority desc, scheduled_time asc",
-            limit=limit
-        )
+        if cint(frappe.conf.get("outreach_async_send")):
+            from outreach_app.outreach_app.utils.async_sender import (
+                ASYNC_SEND_JOB_ID, DEFAULT_ASYNC_SEND_LIMIT, get_async_send_timeout
+            )
+            
+            enqueue(
+                "outreach_app.outreach_app.utils.async_sender.send_queued_emails_async",
+                queue="long",
+                timeout=get_async_send_timeout(),
+                job_id=ASYNC_SEND_JOB_ID,
+                deduplicate=True,
+                limit=cint(frappe.conf.get("outreach_async_send_limit")) or DEFAULT_ASYNC_SEND_LIMIT
+            )
+            return
+        
+        if batch is None:
+            batch = cint(frappe.conf.get("outreach_batch_dispatch", 1))
+        
+        # Get emails that are scheduled to be sent now, shared fairly across campaigns
+        emails = get_due_emails(limit, ["name", "email_account"])
         
+        # Only enqueue emails this run has claimed, so a backlog of jobs is never enqueued twice
+        claim, claimed = claim_emails([email_data.name for email_data in emails])
+        emails = [email_data for email_data in emails if email_data.name in claimed]
+        frappe.db.commit()
+        
+        if batch:
+            enqueue_batches(emails, claim)
+            return
+        
+        # Fallback: one job, and so one SMTP login, per email
         for email_data in emails:
-            # Process each email in a background job
             enqueue(
                 "outreach_app.outreach_app.doctype.email_queue.email_queue.send_email",
                 queue="short",
-                email_queue=email_data.name
+                email_queue=email_data.name,
+                claim=claim
             )
     
     @staticmethod
-    def clear_old_emails(days=30):
+    def clear_old_emails(days=None):
         """
         Clear old emails from the queue
         This method is called by the scheduler
+        Rows are deleted in committed chunks within a time budget, optionally
+        archived first; see utils.retention.purge_old_emails
         """
-        cutoff_date = add_to_date(now_datetime(), days=-days)
-        
-        # Get old emails
-        old_emails = frappe.get_all(
-            "Email Queue",
-            filters={
-                "status": ["in", ["Sent", "Error", "Expired", "Cancelled"]],
-                "modified": ["<", cutoff_date]
-            },
-            fields=["name"]
-        )
+        from outreach_app.outreach_app.utils.retention import purge_old_emails
         
-        # Delete old emails
-        for email_data in old_emails:
-            frappe.delete_doc("Email Queue", email_data.name)
+        return purge_old_emails(days)
+
+def on_doctype_update():
+    """Index for due-email reads and the metrics aggregates, all filtering on status and scheduled_time"""
+    frappe.db.add_index("Email Queue", ["status", "scheduled_time"])
+
+def get_due_emails(limit, fields, require_account=False):
+    """
+    Due Queued/Scheduled emails, at most limit
+    The limit is split across campaigns by weighted fair share
+    (outreach_campaign_weights) and each campaign's share is read in priority and
+    scheduled_time order, all in one statement. Emails are returned interleaved
+    in deficit round robin order, so a large campaign cannot fill the batch.
+    """
+    from outreach_app.outreach_app.utils.fair_share import (DeficitRoundRobin, NO_CAMPAIGN, fair_shares,
+        get_campaign_weights)
+    
+    values = {"now": now_datetime()}
+    conditions = "status in ('Queued', 'Scheduled') and scheduled_time <= %(now)s"
+    if require_account:
+        conditions += " and ifnull(email_account, '') != ''"
+    
+    backlog = dict(frappe.db.sql(f"""
+        select ifnull(campaign, ''), count(*)
+        from `tabEmail Queue`
+        where {conditions}
+        group by ifnull(campaign, '')
+    """, values))
+    
+    if not backlog:
+        return []
+    
+    weights = get_campaign_weights(backlog)
+    shares = fair_shares(backlog, cint(limit), weights)
+    
+    columns = ", ".join(f"`{field}`" for field in sorted(set(fields) | {"campaign"}))
+    selects = []
+    
+    for i, (campaign, share) in enumerate(shares.items()):
+        if not share:
+            continue
         
-        frappe.db.commit()
+        if campaign == NO_CAMPAIGN:
+            campaign_condition = "ifnull(campaign, '') = ''"
+        else:
+            campaign_condition = f"campaign = %(campaign_{i})s"
+            values[f"campaign_{i}"] = campaign
+        
+        selects.append(f"""(
+            select {columns}
+            from `tabEmail Queue`
+            where {conditions} and {campaign_condition}
+            order by priority desc, scheduled_time asc
+            limit {cint(share)}
+        )""")
+    
+    if not selects:
+        return []
+    
+    emails_by_campaign = {}
+    for email in frappe.db.sql(" union all ".join(selects), values, as_dict=True):
+        emails_by_campaign.setdefault(email.campaign or NO_CAMPAIGN, []).append(email)
+    
+    return [email for campaign, email in DeficitRoundRobin(emails_by_campaign, weights).take()]
+
+def claim_emails(names, lease=None):
+    """
+    Claim Queued/Scheduled emails for dispatch with a single UPDATE
+    Claimed emails are marked Dispatching with a new claim id and lease expiry;
+    emails already claimed or sent by someone else are left alone
+    Returns the claim id and the set of names it holds
+    """
+    claim = uuid.uuid4().hex
+    
+    if not names:
+        return claim, set()
+    
+    lease = lease or cint(frappe.conf.get("outreach_claim_lease")) or DEFAULT_CLAIM_LEASE
+    now = now_datetime()
+    
+    frappe.db.sql("""
+        update `tabEmail Queue`
+        set status = 'Dispatching', claimed_by = %(claim)s, claim_expires = %(expires)s, modified = %(now)s
+        where name in %(names)s and status in ('Queued', 'Scheduled')
+    """, {
+        "claim": claim,
+        "expires": add_to_date(now, seconds=lease),
+        "now": now,
+        "names": tuple(names)
+    })
+    
+    claimed = set(frappe.db.sql_list("""
+        select name from `tabEmail Queue`
+        where claimed_by = %(claim)s and name in %(names)s
+    """, {"claim": claim, "names": tuple(names)}))
+    
+    return claim, claimed
+
+def release_claim(claim, names=None, scheduled_time=None):
+    """
+    Return emails still held by a claim (optionally only some of them) to the queue
+    scheduled_time, if given, postpones them
+    """
+    values = {"claim": claim, "now": now_datetime(), "scheduled_time": scheduled_time}
+    names_condition = ""
+    
+    if names is not None:
+        if not names:
+            return
+        
+        names_condition = "and name in %(names)s"
+        values["names"] = tuple(names)
+    
+    frappe.db.sql(f"""
+        update `tabEmail Queue`
+        set status = 'Scheduled', claimed_by = null, claim_expires = null, modified = %(now)s,
+            scheduled_time = coalesce(%(scheduled_time)s, scheduled_time)
+        where claimed_by = %(claim)s and status = 'Dispatching' {names_condition}
+    """, values)
+
+def release_expired_claims():
+    """
+    Return emails whose dispatch claim has expired to the queue
+    A claim expires when its job was lost or never ran; this function is called
+    via scheduler
+    """
+    now = now_datetime()
+    
+    frappe.db.sql("""
+        update `tabEmail Queue`
+        set status = 'Scheduled', claimed_by = null, claim_expires = null, modified = %(now)s
+        where status = 'Dispatching' and claim_expires < %(now)s
+    """, {"now": now})
+    
+    frappe.db.commit()
+
+def get_sender_name(email, default_sender_name=None):
+    """Use default sender name from provider if available, else derive it from the email"""
+    if default_sender_name:
+        return default_sender_name
+    
+    # Extract name from email (before @)
+    return email.split('@')[0].replace('.', ' ').title()
+
+def bulk_enqueue(rows, chunk_size=DEFAULT_BULK_INSERT_CHUNK_SIZE):
+    """
+    Insert many Email Queue rows without a per-row document lifecycle
+    Each row is a dict of Email Queue fields, optionally with an "attachments"
+    list of {"file_name", "file_path"} dicts. Links are validated set-wise and
+    sender assignment, sender details and scheduled_time are filled in with the
+    same rules as EmailQueue.before_insert, using a handful of queries for the
+    whole list. Rows are written with multi-row inserts in chunks.
+    Returns the list of inserted names
+    """
+    if not rows:
+        return []
+    
+    now = now_datetime()
+    rows = [dict(row) for row in rows]
+    
+    for row in rows:
+        row.pop("doctype", None)
+        row.setdefault("status", "Queued")
+        row.setdefault("priority", "Medium")
+        row.setdefault("retry_count", 0)
+        
+        if not row.get("recipient_email"):
+            frappe.throw("Recipient Email is required")
         
-        return len(old_emails)
+        if not row.get("subject"):
+            frappe.throw("Subject is required")
+        
+        if not row.get("message"):
+            frappe.throw("Message is required")
+        
+        if not row.get("scheduled_time"):
+            row["scheduled_time"] = now
+    
+    validate_links_bulk(rows, LINK_FIELDS)
+    fill_senders_bulk(rows)
+    fill_send_times_bulk(rows)
+    
+    names = reserve_names(len(rows))
+    
+    fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "idx",
+        "status", "priority", "scheduled_time", "recipient", "recipient_email", "contact",
+        "campaign", "campaign_step", "email_provider", "email_account", "sender_name",
+        "sender_email", "subject", "message", "html_message", "retry_count"]
+    attachment_fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "idx",
+        "parent", "parenttype", "parentfield", "file_name", "file_path"]
+    
+    values = []
+    attachment_values = []
+    for name, row in zip(names, rows):
+        row["name"] = name
+        row.update({"owner": frappe.session.user, "modified_by": frappe.session.user,
+            "creation": now, "modified": now, "docstatus": 0, "idx": 0})
+        values.append([row.get(field) for field in fields])
+        
+        for idx, attachment in enumerate(row.get("attachments") or [], 1):
+            attachment_values.append([frappe.generate_hash(length=10), frappe.session.user,
+                frappe.session.user, now, now, 0, idx, name, "Email Queue", "attachments",
+                attachment.get("file_name"), attachment.get("file_path")])
+    
+    frappe.db.bulk_insert("Email Queue", fields, values, chunk_size=chunk_size)
+    
+    if attachment_values:
+        frappe.db.bulk_insert("Email Queue Attachment", attachment_fields, attachment_values, chunk_size=chunk_size)
+    
+    return names
+
+def fill_senders_bulk(rows):
+    """
+    Set email_provider, email_account, sender_name and sender_email as
+    EmailQueue.before_insert would, for a list of rows
+    """
+    from outreach_app.outreach_app.utils.allocator import BatchAllocator
+    from outreach_app.outreach_app.utils.assignment_cache import get_assignment_cache
+    from outreach_app.outreach_app.utils.capacity import CapacitySnapshot
+    
+    # Existing sender assignments, one query for all contacts not already cached
+    contacts = {row["contact"] for row in rows
+        if row.get("contact") and not (row.get("email_provider") and row.get("email_account"))}
+    
+    if contacts:
+        assignment_cache = get_assignment_cache()
+        assignment_cache.prime(contacts)
+        
+        for row in rows:
+            assignment = assignment_cache.get(row["contact"]) if row.get("contact") else None
+            if assignment and not (row.get("email_provider") and row.get("email_account")):
+                row["email_provider"] = assignment.email_provider
+                row["email_account"] = assignment.email_account
+    
+    # Default provider
+    if any(not row.get("email_provider") for row in rows):
+        providers = frappe.get_all("Email Provider", filters={"is_active": 1}, limit=1, pluck="name")
+        for row in rows:
+            if not row.get("email_provider") and providers:
+                row["email_provider"] = providers[0]
+    
+    # Next available account, allocated for all rows of a provider at once and
+    # counted as it is assigned
+    unassigned = [row for row in rows if row.get("email_provider") and not row.get("email_account")]
+    if unassigned:
+        snapshot = CapacitySnapshot.build()
+        
+        for provider in {row["email_provider"] for row in unassigned}:
+            provider_rows = [row for row in unassigned if row["email_provider"] == provider]
+            allocator = BatchAllocator(snapshot, provider)
+            allocation = allocator.allocate([row["contact"] for row in provider_rows if row.get("contact")])
+            
+            for row in provider_rows:
+                account = allocation.get(row["contact"]) if row.get("contact") else snapshot.select_account(provider)
+                if not account:
+                    continue
+                
+                row["email_account"] = account.name
+                if not row.get("contact"):
+                    snapshot.record_send(account.name)
+            
+            allocator.save({row["contact"]: row.get("campaign") for row in reversed(provider_rows) if row.get("contact")})
+    
+    # Sender details
+    accounts = {row["email_account"] for row in rows
+        if row.get("email_account") and not (row.get("sender_name") and row.get("sender_email"))}
+    
+    if accounts:
+        account_emails = dict(frappe.get_all(
+            "Email Account",
+            filters={"name": ["in", list(accounts)]},
+            fields=["name", "email"],
+            as_list=True
+        ))
+        sender_names = dict(frappe.get_all(
+            "Email Provider",
+            filters={"name": ["in", list({row["email_provider"] for row in rows if row.get("email_provider")})]},
+            fields=["name", "default_sender_name"],
+            as_list=True
+        ))
+        
+        for row in rows:
+            email = account_emails.get(row.get("email_account"))
+            if email and not (row.get("sender_name") and row.get("sender_email")):
+                row["sender_email"] = email
+                row["sender_name"] = get_sender_name(email, sender_names.get(row.get("email_provider")))
+
+def fill_send_times_bulk(rows):
+    """
+    Push back scheduled_time of Queued rows as EmailQueue.calculate_next_send_time
+    would, allocating the send slots of all rows in one call
+    """
+    from outreach_app.outreach_app.utils.send_slots import get_send_slot_calendar
+    
+    queued = [row for row in rows if row.get("status") == "Queued" and row.get("email_provider")]
+    if not queued:
+        return
+    
+    send_times = get_send_slot_calendar().allocate(
+        [(row.get("email_account"), row["email_provider"]) for row in queued],
+        natural=False
+    )
+    
+    for row, next_send_time in zip(queued, send_times):
+        if next_send_time and get_datetime(row["scheduled_time"]) < next_send_time:
+            row["scheduled_time"] = next_send_time
+            row["status"] = "Scheduled"
+
+def reserve_names(count):
+    """
+    Reserve count consecutive names from the Email Queue naming series (EQ-####)
+    The series is advanced in its own short transaction; see utils.naming.reserve_series
+    """
+    start = reserve_series({NAMING_SERIES: count})[NAMING_SERIES]
+    
+    return [f"{NAMING_SERIES}{start + i:04d}" for i in range(1, count + 1)]
+
+def enqueue_batches(emails, claim=None):
+    """
+    Group emails by email account and enqueue one batch job per account
+    Emails without an account are still sent individually
+    claim is passed on to the jobs when the emails were claimed with claim_emails
+    """
+    batch_size = cint(frappe.conf.get("outreach_send_batch_size")) or DEFAULT_SEND_BATCH_SIZE
+    time_budget = cint(frappe.conf.get("outreach_send_batch_time_budget")) or DEFAULT_SEND_BATCH_TIME_BUDGET
+    
+    emails_by_account = {}
+    for email_data in emails:
+        if not email_data.email_account:
+            enqueue(
+                "outreach_app.outreach_app.doctype.email_queue.email_queue.send_email",
+                queue="short",
+                email_queue=email_data.name,
+                claim=claim
+            )
+            continue
+        
+        emails_by_account.setdefault(email_data.email_account, []).append(email_data.name)
+    
+    for email_account, names in emails_by_account.items():
+        for i in range(0, len(names), batch_size):
+            enqueue(
+                "outreach_app.outreach_app.doctype.email_queue.email_queue.send_email_batch",
+                queue="short",
+                email_account=email_account,
+                email_queues=names[i:i + batch_size],
+                time_budget=time_budget,
+                claim=claim
+            )
+
+@profiled()
+def send_email_batch(email_account, email_queues, time_budget=DEFAULT_SEND_BATCH_TIME_BUDGET, claim=None):
+    """
+    Send a batch of emails from one account
+    This function is called by the background job
+    The account is loaded once and the SMTP session is shared by the
+    connection pool. Emails left over when the time budget runs out are
+    released back to the queue and picked up by the next scheduler run.
+    """
+    start = time.monotonic()
+    
+    try:
+        account = frappe.get_doc("Email Account", email_account)
+    except Exception as e:
+        frappe.log_error(
+            message=f"Failed to load email account {email_account} for batch send: {str(e)}",
+            title="Email Queue Processing Error"
+        )
+        if claim:
+            release_claim(claim, email_queues)
+            frappe.db.commit()
+        return 0
+    
+    sent = 0
+    for i, email_queue in enumerate(email_queues):
+        if time_budget and time.monotonic() - start >= time_budget:
+            if claim:
+                release_claim(claim, email_queues[i:])
+                frappe.db.commit()
+            break
+        
+        try:
+            email = frappe.get_doc("Email Queue", email_queue)
+            success, message = email.send(account=account, claim=claim)
+            frappe.db.commit()
+            
+            if success:
+                sent += 1
+            elif email.flags.deferred and claim:
+                # Deferred by an open circuit breaker; the rest of the batch waits as well
+                release_claim(claim, email_queues[i + 1:], email.scheduled_time)
+                frappe.db.commit()
+                break
+        except Exception as e:
+            frappe.db.rollback()
+            frappe.log_error(
+                message=f"Failed to process email queue {email_queue}: {str(e)}",
+                title="Email Queue Processing Error"
+            )
+    
+    return sent
+
+@profiled()
+def process_queue():
+    """
+    Scheduler entry point for EmailQueue.process_queue
+    Skipped while the outreach-dispatcher command is dispatching for the site
+    """
+    from outreach_app.outreach_app.utils.dispatcher import is_dispatcher_running
+    
+    if is_dispatcher_running():
+        return
+    
+    EmailQueue.process_queue()
+
+def clear_old_emails():
+    """Scheduler entry point for EmailQueue.clear_old_emails"""
+    EmailQueue.clear_old_emails()
 
-def send_email(email_queue):
+@profiled()
+def send_email(email_queue, claim=None):
     """
     Send an email from the queue
     This function is called by the background job
     """
     try:
         email = frappe.get_doc("Email Queue", email_queue)
-        email.send()
+        email.send(claim=claim)
     except Exception as e:
         frappe.log_error(
             message=f"Failed to process email queue {email_queue}: {str(e)}",
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import unittest
+from frappe.utils import now_datetime
+from outreach_app.outreach_app.benchmarks.pipeline import BenchmarkData
+from outreach_app.outreach_app.doctype.email_queue.email_queue import bulk_enqueue, claim_emails, send_email_batch
+from outreach_app.outreach_app.utils.query_profiler import assert_query_budget
+from outreach_app.outreach_app.utils.smtp_pool import get_smtp_pool
+from outreach_app.outreach_app.utils.smtp_sink import SMTPSink
+
+CONTACTS = 100
+
+# Query budgets. bulk_enqueue runs a fixed set of statements for the whole list;
+# each send loads the email and saves it twice with change tracking
+BULK_ENQUEUE_BUDGET = 40
+SEND_BUDGET_PER_EMAIL = 20
+
+class TestEmailQueueQueryBudget(unittest.TestCase):
+    def setUp(self):
+        self.sink = SMTPSink().start()
+        self.data = BenchmarkData(CONTACTS, providers=2, accounts=2)
+        self.data.create(self.sink)
+    
+    def tearDown(self):
+        get_smtp_pool().close_all()
+        self.sink.stop()
+        frappe.db.rollback()
+        self.data.cleanup()
+    
+    def make_rows(self):
+        return [{
+            "recipient": f"Bench {i}",
+            "recipient_email": f"{self.data.run_id.lower()}-{i}@example.com",
+            "contact": f"{self.data.run_id}-{i}",
+            "campaign": self.data.campaign,
+            "subject": "Hello",
+            "message": "Hello from the query budget test"
+        } for i in range(CONTACTS)]
+    
+    def test_bulk_enqueue(self):
+        with assert_query_budget(max_queries=BULK_ENQUEUE_BUDGET, name="bulk_enqueue"):
+            names = bulk_enqueue(self.make_rows())
+        
+        self.assertEqual(len(names), CONTACTS)
+        self.assertEqual(frappe.db.count("Email Queue", {"campaign": self.data.campaign, "email_account": ["is", "set"]}), CONTACTS)
+    
+    def test_send_email_batch(self):
+        bulk_enqueue(self.make_rows())
+        
+        # Send times are paced into the future by the slot calendar; make them all due now
+        frappe.db.sql("""
+            update `tabEmail Queue` set scheduled_time = %(now)s
+            where campaign = %(campaign)s
+        """, {"now": now_datetime(), "campaign": self.data.campaign})
+        
+        emails = frappe.get_all("Email Queue", filters={"campaign": self.data.campaign},
+            fields=["name", "email_account"])
+        claim, claimed = claim_emails([email.name for email in emails])
+        frappe.db.commit()
+        
+        emails_by_account = {}
+        for email in emails:
+            emails_by_account.setdefault(email.email_account, []).append(email.name)
+        
+        with assert_query_budget(per_item=SEND_BUDGET_PER_EMAIL, name="send_email_batch") as profile:
+            profile.items = sum(
+                send_email_batch(email_account, names, time_budget=0, claim=claim)
+                for email_account, names in emails_by_account.items()
+            )
+        
+        self.assertEqual(len(claimed), CONTACTS)
+        self.assertEqual(profile.items, CONTACTS)
+        self.assertTrue(self.sink.wait_for(CONTACTS, timeout=10))
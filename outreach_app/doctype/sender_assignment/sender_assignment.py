@@ -6,21 +6,20 @@ from __future__ import unicode_literals
 import frappe
 from frappe.model.document import Document
 from frappe.utils import now_datetime
+from outreach_app.outreach_app.utils.assignment_cache import get_assignment_cache
+from outreach_app.outreach_app.utils.link_validation import validate_links
+
+LINK_FIELDS = {
+    "contact": "Contact",
+    "email_account": "Email Account",
+    "email_provider": "Email Provider"
+}
 
 class SenderAssignment(Document):
     def validate(self):
         """Validate sender assignment"""
-        # Check if contact exists
-        if not frappe.db.exists("Contact", self.contact):
-            frappe.throw(f"Contact {self.contact} does not exist")
-        
-        # Check if email account exists
-        if not frappe.db.exists("Email Account", self.email_account):
-            frappe.throw(f"Email Account {self.email_account} does not exist")
-        
-        # Check if email provider exists
-        if not frappe.db.exists("Email Provider", self.email_provider):
-            frappe.throw(f"Email Provider {self.email_provider} does not exist")
+        # Check if contact, email account and email provider exist
+        validate_links(self, LINK_FIELDS)
         
         # Check if there's already an active assignment for this contact
         if not self.is_new():
@@ -41,6 +40,13 @@ class SenderAssignment(Document):
                     doc.is_active = 0
                     doc.save()
     
+    def on_update(self):
+        """Drop the cached assignment of the contact"""
+        get_assignment_cache().invalidate(self.contact)
+    
+    def on_trash(self):
+        get_assignment_cache().invalidate(self.contact)
+    
     def update_email_sent(self, campaign=None):
         """
         Update the last email sent timestamp and counter
@@ -60,21 +66,35 @@ class SenderAssignment(Document):
         Get the active sender assignment for a contact
         Returns the SenderAssignment document or None
         """
-        assignments = frappe.get_all(
-            "Sender Assignment",
-            filters={
-                "contact": contact,
-                "is_active": 1
-            },
-            fields=["name"],
-            limit=1
-        )
+        assignment = get_assignment_cache().get(contact)
         
-        if assignments:
-            return frappe.get_doc("Sender Assignment", assignments[0].name)
+        if assignment:
+            return frappe.get_doc("Sender Assignment", assignment.name)
         
         return None
     
+    @staticmethod
+    def get_cached_assignment(contact):
+        """
+        Get the active sender assignment for a contact from the assignment cache
+        Returns frappe._dict(name, contact, email_account, email_provider) or None
+        """
+        return get_assignment_cache().get(contact)
+    
+    @staticmethod
+    def record_email_sent(assignment, campaign=None):
+        """
+        Update the last email sent timestamp and counter of an assignment by name,
+        with a single UPDATE instead of loading and saving the document
+        """
+        frappe.db.sql("""
+            update `tabSender Assignment`
+            set last_email_sent = %(now)s,
+                total_emails_sent = total_emails_sent + 1,
+                campaign = coalesce(nullif(campaign, ''), %(campaign)s)
+            where name = %(name)s
+        """, {"now": now_datetime(), "campaign": campaign, "name": assignment})
+    
     @staticmethod
     def create_assignment(contact, email_account, email_provider, campaign=None):
         """
@@ -108,4 +128,12 @@ class SenderAssignment(Document):
         })
         
         assignment.insert()
+        
+        get_assignment_cache().set(contact, frappe._dict({
+            "name": assignment.name,
+            "contact": contact,
+            "email_account": email_account,
+            "email_provider": email_provider
+        }))
+        
         return assignment
@@ -83,29 +83,44 @@ app_license = "MIT"
 doc_events = {
     "Email Queue": {
         "before_insert": "outreach_app.utils.email_distribution.assign_sender",
+    },
+    "Message Template": {
+        "validate": "outreach_app.outreach_app.utils.templates.validate_template",
+    },
+    "Campaign Sequence": {
+        "on_update": "outreach_app.outreach_app.utils.sequences.clear_step_successors",
+        "on_trash": "outreach_app.outreach_app.utils.sequences.clear_step_successors",
     }
 }
 
+# Template Variables
+# ------------------
+# Methods taking (contact, campaign) and returning extra personalization
+# variables for message templates, and the variable names they provide
+
+# outreach_template_variables = ["myapp.outreach.get_template_variables"]
+# outreach_template_variable_names = ["account_manager", "last_order_date"]
+
 # Scheduled Tasks
 # ---------------
 
 
 scheduler_events = {
     "all": [
-        "outreach_app.outreach_app.doctype.email_queue.email_queue.process_queue"
+        "outreach_app.outreach_app.doctype.email_queue.email_queue.process_queue",
+        "outreach_app.outreach_app.doctype.email_queue.email_queue.release_expired_claims"
     ],
     "hourly": [
-        "outreach_app.utils.email_distribution.reset_hourly_counters"
+        "outreach_app.utils.email_distribution.sync_usage_counters"
     ],
 
     "daily": [
-        "outreach_app.utils.email_distribution.reset_daily_counters",
         "outreach_app.outreach_app.doctype.email_queue.email_queue.clear_old_emails"
     ],
     "cron": {
         # Run campaign email distribution every 15 minutes
         "*/15 * * * *": [
-            "outreach_app.utils.email_distribution.distribute_emails_for_campaign"
+            "outreach_app.utils.email_distribution.distribute_emails_for_all_campaigns"
         ]
     }
 }
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import now_datetime, cint
+from outreach_app.outreach_app.utils.assignment_cache import get_assignment_cache
+from outreach_app.outreach_app.utils.naming import reserve_series
+
+ASSIGNMENT_PREFIX = "SA-{contact}-"
+
+class BatchAllocator(object):
+    """
+    Assigns email accounts to a batch of contacts against a capacity snapshot
+    Contacts with an active sender assignment keep their account while it has
+    capacity. The other contacts are split across providers in proportion to the
+    sends each has left, then across each provider's accounts in proportion to
+    theirs, so every account ends the batch with the same share of its remaining
+    capacity used and no account is given more than it can send. Every allocated
+    contact is counted against the snapshot as one send.
+    """
+
+    def __init__(self, snapshot, provider=None):
+        self.snapshot = snapshot
+        self.provider = provider
+        self.new_assignments = {}
+
+    def allocate(self, contacts):
+        """
+        Allocate an account to each contact
+        Returns a dict of contact -> AccountCapacity; contacts left out could not
+        be given an account within the remaining capacity
+        """
+        contacts = list(dict.fromkeys(contact for contact in contacts if contact))
+        assignment_cache = get_assignment_cache()
+        assignment_cache.prime(contacts)
+
+        allocation = {}
+        unassigned = []
+
+        # Sticky assignments first, while their accounts have capacity
+        for contact in contacts:
+            assignment = assignment_cache.get(contact)
+            account = self.snapshot.get_account(assignment.email_account) if assignment else None
+
+            if account and self.usable(account):
+                allocation[contact] = account
+                self.snapshot.record_send(account.name)
+                continue
+
+            unassigned.append(contact)
+
+        # Spread the remaining contacts over the capacity that is left
+        accounts = self.fill(len(unassigned))
+        for contact, account in zip(unassigned, accounts):
+            allocation[contact] = account
+            self.new_assignments[contact] = account
+            self.snapshot.record_send(account.name)
+
+        return allocation
+
+    def usable(self, account):
+        provider = self.snapshot.get_provider(account.parent)
+
+        if self.provider and provider.name != self.provider:
+            return False
+
+        return account.is_available() and provider.is_available()
+
+    def fill(self, count):
+        """
+        Accounts for count new contacts, in an order that interleaves accounts by
+        their share
+        """
+        providers = [provider for provider in self.snapshot.providers.values()
+            if not self.provider or provider.name == self.provider]
+
+        provider_shares = proportional_split(count, {provider.name: provider.remaining for provider in providers})
+
+        shares = {}
+        for provider in providers:
+            if provider_shares.get(provider.name):
+                shares.update(proportional_split(
+                    provider_shares[provider.name],
+                    {account.name: account.remaining for account in provider.accounts}
+                ))
+
+        # Place each account's picks evenly through the batch
+        slots = sorted(
+            ((i + 0.5) / share, name)
+            for name, share in shares.items()
+            for i in range(share)
+        )
+
+        return [self.snapshot.get_account(name) for position, name in slots]
+
+    def save(self, campaign=None):
+        """
+        Write the new sender assignments with one multi-row insert
+        Earlier active assignments of the reassigned contacts are deactivated with
+        a single update. campaign is a campaign name or a dict of contact -> campaign
+        Returns the number of assignments created
+        """
+        if not self.new_assignments:
+            return 0
+
+        count = len(self.new_assignments)
+        save_assignments(self.new_assignments, campaign)
+        self.new_assignments = {}
+
+        return count
+
+def proportional_split(count, capacities):
+    """
+    Split count units in proportion to capacities (largest remainder method)
+    No name gets more than its capacity; if count exceeds the total capacity
+    every name gets its full capacity
+    Returns a dict of name -> units
+    """
+    capacities = {name: max(0, cint(capacity)) for name, capacity in capacities.items()}
+    total = sum(capacities.values())
+
+    if count >= total:
+        return capacities
+
+    shares = {}
+    remainders = []
+
+    for name, capacity in capacities.items():
+        quota = float(count) * capacity / total
+        shares[name] = int(quota)
+        remainders.append((quota - shares[name], capacity, name))
+
+    # A share below capacity rounds up to at most its capacity, since count < total
+    for remainder, capacity, name in sorted(remainders, reverse=True)[:count - sum(shares.values())]:
+        shares[name] += 1
+
+    return shares
+
+def save_assignments(assignments, campaign=None):
+    """
+    Insert Sender Assignments for a dict of contact -> AccountCapacity
+    campaign is a campaign name or a dict of contact -> campaign
+    Names follow the doctype's SA-{contact}-#### format, reserved per contact
+    with a few statements for the whole batch
+    """
+    contacts = list(assignments)
+    now = now_datetime()
+
+    frappe.db.sql("""
+        update `tabSender Assignment`
+        set is_active = 0, modified = %(now)s
+        where contact in %(contacts)s and is_active = 1
+    """, {"now": now, "contacts": tuple(contacts)})
+
+    names = reserve_assignment_names(contacts)
+
+    fields = ["name", "owner", "modified_by", "creation", "modified", "docstatus", "idx",
+        "contact", "email_account", "email_provider", "assigned_date", "is_active", "campaign",
+        "total_emails_sent"]
+
+    values = []
+    cached = {}
+
+    for contact in contacts:
+        account = assignments[contact]
+        values.append([names[contact], frappe.session.user, frappe.session.user, now, now, 0, 0,
+            contact, account.name, account.parent, now, 1,
+            campaign.get(contact) if isinstance(campaign, dict) else campaign, 0])
+
+        cached[contact] = frappe._dict({
+            "name": names[contact],
+            "contact": contact,
+            "email_account": account.name,
+            "email_provider": account.parent
+        })
+
+    frappe.db.bulk_insert("Sender Assignment", fields, values)
+
+    # Other workers see the new assignments once the transaction commits
+    get_assignment_cache().set_many(cached)
+
+def reserve_assignment_names(contacts):
+    """
+    Next name of each contact's SA-{contact}-#### series
+    The series are advanced in their own short transaction; see utils.naming.reserve_series
+    Returns a dict of contact -> name
+    """
+    prefixes = {contact: ASSIGNMENT_PREFIX.format(contact=contact) for contact in contacts}
+    current = reserve_series({prefix: 1 for prefix in prefixes.values()})
+
+    return {contact: f"{prefix}{current[prefix] + 1:04d}" for contact, prefix in prefixes.items()}
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Defaults, overridable from site_config.json
+DEFAULT_CACHE_SIZE = 50000
+DEFAULT_CACHE_TTL = 300
+
+ASSIGNMENT_FIELDS = ["name", "contact", "email_account", "email_provider"]
+
+ASSIGNMENTS_CACHE_KEY = "outreach:sender_assignment:"
+
+_memory_stores = {}
+_memory_lock = threading.Lock()
+
+class RedisAssignmentStore(object):
+    """
+    Cached assignments as one Redis key per contact, shared by all workers of the site
+    Keys expire after ttl seconds, so assignments changed outside the app's
+    hooks are picked up eventually
+    """
+
+    def __init__(self, cache=None, ttl=DEFAULT_CACHE_TTL):
+        self.cache = cache or frappe.cache()
+        self.ttl = ttl
+
+    def get(self, contacts):
+        """Returns a dict of contact -> encoded entry, without the contacts that are not cached"""
+        if not contacts:
+            return {}
+
+        values = self.cache.mget([self.cache.make_key(ASSIGNMENTS_CACHE_KEY + contact) for contact in contacts])
+        return {contact: frappe.safe_decode(value) for contact, value in zip(contacts, values) if value is not None}
+
+    def set(self, entries):
+        pipeline = self.cache.pipeline()
+        for contact, value in entries.items():
+            pipeline.set(self.cache.make_key(ASSIGNMENTS_CACHE_KEY + contact), value, ex=self.ttl)
+        pipeline.execute()
+
+    def delete(self, contacts):
+        if contacts:
+            self.cache.delete(*[self.cache.make_key(ASSIGNMENTS_CACHE_KEY + contact) for contact in contacts])
+
+class InMemoryAssignmentStore(object):
+    """In-process LRU stand-in for RedisAssignmentStore, for tests and single-process use"""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE, ttl=DEFAULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, contacts):
+        found = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for contact in contacts:
+                entry = self._entries.get(contact)
+                if not entry:
+                    continue
+
+                if entry[1] < now:
+                    del self._entries[contact]
+                    continue
+
+                self._entries.move_to_end(contact)
+                found[contact] = entry[0]
+
+        return found
+
+    def set(self, entries):
+        expires = time.monotonic() + self.ttl
+
+        with self._lock:
+            for contact, value in entries.items():
+                self._entries[contact] = (value, expires)
+                self._entries.move_to_end(contact)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, contacts):
+        with self._lock:
+            for contact in contacts:
+                self._entries.pop(contact, None)
+
+class AssignmentCache(object):
+    """
+    Read-through cache of contact -> active sender assignment
+    Entries are frappe._dict(name, contact, email_account, email_provider), or None
+    for contacts known to have no active assignment. The store is shared by all
+    workers, so an invalidation reaches every process. Changes only reach the
+    store once their transaction commits, so a rolled back insert never leaves
+    a phantom assignment behind.
+    Assignments loaded by prime or changed by this transaction are also kept on
+    frappe.local, so a batch reads the store once.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, contact):
+        """
+        Get the active assignment of a contact, querying only on a cache miss
+        Returns the cached assignment or None
+        """
+        local = get_local_assignments()
+        if contact in local:
+            return local[contact]
+
+        found = self.store.get([contact])
+        if contact in found:
+            return decode(found[contact])
+
+        assignments = frappe.get_all(
+            "Sender Assignment",
+            filters={"contact": contact, "is_active": 1},
+            fields=ASSIGNMENT_FIELDS,
+            order_by="modified desc",
+            limit=1
+        )
+
+        assignment = assignments[0] if assignments else None
+        self.fill({contact: assignment})
+        return assignment
+
+    def prime(self, contacts):
+        """Load the assignments of many contacts with one store read and at most one query"""
+        local = get_local_assignments()
+        missing = [contact for contact in set(contacts) if contact and contact not in local]
+
+        if not missing:
+            return
+
+        for contact, value in self.store.get(missing).items():
+            local[contact] = decode(value)
+
+        missing = [contact for contact in missing if contact not in local]
+        if not missing:
+            return
+
+        assignments = {}
+        for assignment in frappe.get_all(
+            "Sender Assignment",
+            filters={"contact": ["in", missing], "is_active": 1},
+            fields=ASSIGNMENT_FIELDS,
+            order_by="modified asc"
+        ):
+            # The most recently modified active assignment wins
+            assignments[assignment.contact] = assignment
+
+        self.fill({contact: assignments.get(contact) for contact in missing})
+
+    def fill(self, assignments):
+        """Cache assignments read from the database"""
+        local = get_local_assignments()
+        pending = get_pending_contacts()
+        local.update(assignments)
+
+        # Rows this transaction changed are not committed yet; keep them out of the shared store
+        self.store.set({
+            contact: encode(assignment) for contact, assignment in assignments.items()
+            if contact not in pending
+        })
+
+    def set(self, contact, assignment):
+        """Record a contact's new assignment; other workers see it once the transaction commits"""
+        self.set_many({contact: assignment})
+
+    def set_many(self, assignments):
+        entries = {contact: encode(assignment) for contact, assignment in assignments.items()}
+
+        self.invalidate_many(entries)
+        get_local_assignments().update(assignments)
+        frappe.db.after_commit.add(lambda: self.store.set(entries))
+
+    def invalidate(self, contact):
+        self.invalidate_many([contact])
+
+    def invalidate_many(self, contacts):
+        """
+        Drop cached assignments now and again when the transaction ends, so no
+        worker keeps a value read before the change was committed
+        """
+        contacts = list(contacts)
+        if not contacts:
+            return
+
+        local = get_local_assignments()
+        pending = get_pending_contacts()
+
+        for contact in contacts:
+            local.pop(contact, None)
+            pending.add(contact)
+
+        self.store.delete(contacts)
+
+        def committed():
+            pending.difference_update(contacts)
+            self.store.delete(contacts)
+
+        def rolled_back():
+            for contact in contacts:
+                local.pop(contact, None)
+                pending.discard(contact)
+
+            self.store.delete(contacts)
+
+        frappe.db.after_commit.add(committed)
+        frappe.db.after_rollback.add(rolled_back)
+
+def get_local_assignments():
+    """Assignments known to this job, on frappe.local; cleared with clear_local_assignments"""
+    if getattr(frappe.local, "outreach_assignments", None) is None:
+        frappe.local.outreach_assignments = {}
+
+    return frappe.local.outreach_assignments
+
+def get_pending_contacts():
+    """Contacts whose assignment changed in the current, uncommitted transaction"""
+    if getattr(frappe.local, "outreach_pending_assignments", None) is None:
+        frappe.local.outreach_pending_assignments = set()
+
+    return frappe.local.outreach_pending_assignments
+
+def clear_local_assignments():
+    """Forget assignments kept for this job, e.g. at the start of each chunk in a long-running process"""
+    frappe.local.outreach_assignments = {}
+
+def encode(assignment):
+    if not assignment:
+        return "null"
+
+    return json.dumps({field: assignment.get(field) for field in ASSIGNMENT_FIELDS})
+
+def decode(value):
+    value = json.loads(value)
+    return frappe._dict(value) if value else None
+
+def get_assignment_cache():
+    """Get the assignment cache of the current site"""
+    conf = frappe.conf or {}
+    ttl = conf.get("outreach_assignment_cache_ttl", DEFAULT_CACHE_TTL)
+
+    if frappe.flags.in_test or conf.get("outreach_rate_limiter_store") == "memory":
+        site = frappe.local.site
+        store = _memory_stores.get(site)
+
+        if store is None:
+            with _memory_lock:
+                store = _memory_stores.get(site)
+                if store is None:
+                    store = _memory_stores[site] = InMemoryAssignmentStore(
+                        max_size=conf.get("outreach_assignment_cache_size", DEFAULT_CACHE_SIZE),
+                        ttl=ttl
+                    )
+
+        return AssignmentCache(store)
+
+    return AssignmentCache(RedisAssignmentStore(ttl=ttl))
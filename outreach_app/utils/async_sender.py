@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from frappe.utils import now_datetime, cint
+from outreach_app.outreach_app.doctype.email_provider.email_provider import reserve_account_slots, release_account_slot
+from outreach_app.outreach_app.utils.circuit_breaker import CircuitOpenError, get_circuit_breaker, get_retry_datetime
+from outreach_app.outreach_app.utils.smtp_pool import SMTPConnectionPool, get_smtp_pool
+
+# Defaults, overridable from site_config.json
+DEFAULT_GLOBAL_CONCURRENCY = 20
+DEFAULT_ASYNC_SEND_LIMIT = 500
+
+# Seconds the send job may run (the long queue's default), and how much longer
+# its emails stay claimed, so a lost job's emails are swept only once it is gone
+DEFAULT_ASYNC_SEND_TIMEOUT = 1500
+ASYNC_CLAIM_MARGIN = 300
+
+# One async run at a time per site, so each account still sends one message at a time
+ASYNC_SEND_JOB_ID = "outreach_async_send"
+
+class PreparedAccount(object):
+    """
+    Connection settings of an Email Account with the password already decrypted
+    Safe to hand to worker threads, which have no Frappe site context
+    """
+
+    def __init__(self, name, email, smtp_server, smtp_port, use_tls, username, password, modified=None):
+        self.name = name
+        self.email = email
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.use_tls = use_tls
+        self.username = username
+        self.modified = modified
+        self._password = password
+
+    def get_password(self):
+        return self._password
+
+class SendJob(object):
+    """
+    One message to send, and its outcome once the engine has run
+    retry_at is set instead of an error when a circuit breaker refused the send
+    """
+
+    def __init__(self, name, account, to_email, msg):
+        self.name = name
+        self.account = account
+        self.to_email = to_email
+        self.msg = msg
+        self.success = None
+        self.error = None
+        self.latency = None
+        self.token = None
+        self.retry_at = None
+
+class AsyncSendEngine(object):
+    """
+    Drive many email accounts concurrently from a single process
+    Each account sends one message at a time to respect pacing, and at most
+    global_concurrency SMTP conversations are in flight overall. Blocking SMTP
+    I/O runs on a thread pool through the shared connection pool. With a
+    circuit breaker, sends from accounts whose breaker is open are refused
+    without connecting.
+    """
+
+    def __init__(self, global_concurrency=DEFAULT_GLOBAL_CONCURRENCY, pool=None, breaker=None):
+        self.global_concurrency = max(1, global_concurrency)
+        self.pool = pool or get_smtp_pool()
+        self.breaker = breaker
+
+    def run(self, jobs):
+        """Send all jobs and return them with success/error filled in"""
+        return asyncio.run(self.send_all(jobs))
+
+    async def send_all(self, jobs):
+        jobs_by_account = {}
+        for job in jobs:
+            jobs_by_account.setdefault(job.account.name, []).append(job)
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.global_concurrency)
+
+        with ThreadPoolExecutor(max_workers=self.global_concurrency) as executor:
+            async def drain_account(account_jobs):
+                # One coroutine per account keeps its concurrency at 1
+                for job in account_jobs:
+                    async with semaphore:
+                        await loop.run_in_executor(executor, self.send_job, job)
+
+            await asyncio.gather(*(drain_account(account_jobs) for account_jobs in jobs_by_account.values()))
+
+        return jobs
+
+    def send_job(self, job):
+        start = time.monotonic()
+
+        try:
+            self.pool.sendmail(job.account, job.account.email, job.to_email, job.msg, breaker=self.breaker)
+            job.success = True
+        except CircuitOpenError as e:
+            job.success = False
+            job.retry_at = e.retry_at
+        except Exception as e:
+            job.success = False
+            job.error = str(e)
+
+        job.latency = time.monotonic() - start
+
+def send_queued_emails_async(limit=DEFAULT_ASYNC_SEND_LIMIT, global_concurrency=None):
+    """
+    Send due emails concurrently across accounts from this worker
+    Sends are recorded against the rolling-window limits before sending; statuses
+    and sender assignments are written back in bulk
+    Emails stay Dispatching under this run's claim until their status is written
+    back. The claim outlasts the job timeout, so if the job is killed or crashes
+    release_expired_claims returns them to the queue
+    Returns the number of emails sent
+    """
+    from outreach_app.outreach_app.doctype.email_account.email_account import build_message
+    from outreach_app.outreach_app.doctype.email_queue.email_queue import get_due_emails, claim_emails, release_claim
+
+    global_concurrency = (global_concurrency
+        or cint(frappe.conf.get("outreach_async_global_concurrency"))
+        or DEFAULT_GLOBAL_CONCURRENCY)
+
+    emails = get_due_emails(
+        limit,
+        ["name", "email_account", "recipient_email", "subject", "message", "html_message", "contact"],
+        require_account=True
+    )
+
+    if not emails:
+        return 0
+
+    # Claim the emails so an overlapping run or scheduler tick cannot pick them up too
+    lease = get_async_send_timeout() + ASYNC_CLAIM_MARGIN
+    claim, claimed = claim_emails([email.name for email in emails], lease)
+    emails = [email for email in emails if email.name in claimed]
+    frappe.db.commit()
+
+    # Built here rather than in the worker threads, which have no site context
+    breaker = get_circuit_breaker()
+    accounts = load_prepared_accounts({email.email_account for email in emails}, breaker)
+
+    # Attachment rows of all emails in one query; encoded parts are shared through the MIME cache
+    attachments = {}
+    if emails:
+        for attachment in frappe.get_all(
+            "Email Queue Attachment",
+            filters={"parent": ["in", [email.name for email in emails]], "parenttype": "Email Queue"},
+            fields=["parent", "file_name", "file_path"],
+            order_by="idx asc"
+        ):
+            attachments.setdefault(attachment.parent, []).append(
+                {"fname": attachment.file_name, "fpath": attachment.file_path}
+            )
+
+    jobs = []
+    contacts = {}
+    deferred = {}
+    for email in emails:
+        account_data = accounts.get(email.email_account)
+
+        # Emails of accounts behind an open circuit breaker wait until it may close
+        if account_data and account_data["blocked_until"]:
+            deferred.setdefault(account_data["blocked_until"], []).append(email.name)
+            continue
+
+        # Leave emails for unavailable or exhausted accounts in the queue
+        if not account_data or account_data["remaining"] <= 0:
+            continue
+
+        account_data["remaining"] -= 1
+        account = account_data["account"]
+
+        msg = build_message(account.email, email.recipient_email, email.subject, email.message, email.html_message,
+            attachments.get(email.name))
+        jobs.append(SendJob(email.name, account, email.recipient_email, msg.as_string()))
+
+        if email.contact:
+            contacts[email.name] = email.contact
+
+    # Record the sends against the rolling-window limits up front
+    jobs_by_account = {}
+    for job in jobs:
+        jobs_by_account.setdefault(job.account.name, []).append(job)
+
+    jobs = []
+    for account_name, account_jobs in jobs_by_account.items():
+        tokens = reserve_account_slots(account_name, len(account_jobs))
+        for job, token in zip(account_jobs, tokens):
+            job.token = token
+            jobs.append(job)
+
+    for retry_at, names in deferred.items():
+        release_claim(claim, names, get_retry_datetime(retry_at))
+
+    if not jobs:
+        release_claim(claim)
+        frappe.db.commit()
+        return 0
+
+    # Emails left out of this run (no capacity, unavailable account) go back to the queue
+    release_claim(claim, list(claimed - {job.name for job in jobs}))
+    frappe.db.commit()
+
+    AsyncSendEngine(global_concurrency, breaker=breaker).run(jobs)
+
+    sent = write_back_results(jobs, contacts)
+    frappe.db.commit()
+
+    return sent
+
+def get_async_send_timeout():
+    return cint(frappe.conf.get("outreach_async_send_timeout")) or DEFAULT_ASYNC_SEND_TIMEOUT
+
+def load_prepared_accounts(account_names, breaker=None):
+    """
+    Load sending accounts in one query, with remaining capacity
+    With a circuit breaker, accounts it blocks come back with the time sends may
+    resume and no decrypted password
+    Returns a dict of account name -> {"account": PreparedAccount, "remaining": int, "blocked_until": float}
+    """
+    from frappe.utils.password import get_decrypted_password
+    from outreach_app.outreach_app.utils.rate_limiter import get_rate_limiter
+
+    rows = frappe.get_all(
+        "Email Account",
+        filters={
+            "name": ["in", list(account_names)],
+            "is_active": 1,
+            "status": "Active"
+        },
+        fields=["name", "email", "smtp_server", "smtp_port", "use_tls", "username", "modified",
+            "daily_limit", "hourly_limit"]
+    )
+
+    usage = get_rate_limiter().get_account_usage([row.name for row in rows])
+    blocked = breaker.blocked_until([(row.name, row.smtp_server) for row in rows]) if breaker else {}
+
+    accounts = {}
+    for row in rows:
+        if row.name in blocked:
+            accounts[row.name] = {"account": None, "remaining": 0, "blocked_until": blocked[row.name]}
+            continue
+
+        hourly_count, daily_count = usage[row.name]
+        remaining = min(row.daily_limit - daily_count, row.hourly_limit - hourly_count)
+        if remaining <= 0:
+            continue
+
+        accounts[row.name] = {
+            "account": PreparedAccount(
+                row.name, row.email, row.smtp_server, row.smtp_port, row.use_tls, row.username,
+                get_decrypted_password("Email Account", row.name, "password"), row.modified
+            ),
+            "remaining": remaining,
+            "blocked_until": None
+        }
+
+    return accounts
+
+def write_back_results(jobs, contacts=None):
+    """
+    Write the outcome of sent jobs back with a handful of set-based updates
+    Jobs refused by an open circuit breaker are rescheduled for when it may
+    close, without counting a retry
+    Returns the number of emails sent
+    """
+    now = now_datetime()
+    contacts = contacts or {}
+
+    sent = [job for job in jobs if job.success]
+    failed_by_error = {}
+    deferred = {}
+    for job in jobs:
+        if job.retry_at:
+            deferred.setdefault(job.retry_at, []).append(job)
+        elif not job.success:
+            failed_by_error.setdefault(job.error, []).append(job)
+
+    if sent:
+        frappe.db.sql("""
+            update `tabEmail Queue`
+            set status = 'Sent', sent_time = %(now)s, claimed_by = null, claim_expires = null, modified = %(now)s
+            where name in %(names)s
+        """, {"now": now, "names": tuple(job.name for job in sent)})
+
+    for error, failed in failed_by_error.items():
+        frappe.db.sql("""
+            update `tabEmail Queue`
+            set status = 'Error', error = %(error)s, retry_count = retry_count + 1, claimed_by = null,
+                claim_expires = null, modified = %(now)s
+            where name in %(names)s
+        """, {"now": now, "error": error, "names": tuple(job.name for job in failed)})
+
+    for retry_at, waiting in deferred.items():
+        frappe.db.sql("""
+            update `tabEmail Queue`
+            set status = 'Scheduled', scheduled_time = %(scheduled_time)s, claimed_by = null,
+                claim_expires = null, modified = %(now)s
+            where name in %(names)s
+        """, {
+            "now": now,
+            "scheduled_time": get_retry_datetime(retry_at),
+            "names": tuple(job.name for job in waiting)
+        })
+
+    # Sends were recorded before sending; give back the ones that failed
+    for job in jobs:
+        if not job.success:
+            release_account_slot(job.token)
+
+    # Sender assignments, grouped by the number of emails sent to each contact
+    sent_by_contact = {}
+    for job in sent:
+        if contacts.get(job.name):
+            sent_by_contact[contacts[job.name]] = sent_by_contact.get(contacts[job.name], 0) + 1
+
+    contacts_by_count = {}
+    for contact, count in sent_by_contact.items():
+        contacts_by_count.setdefault(count, []).append(contact)
+
+    for count, contact_names in contacts_by_count.items():
+        frappe.db.sql("""
+            update `tabSender Assignment`
+            set last_email_sent = %(now)s, total_emails_sent = total_emails_sent + %(count)s
+            where is_active = 1 and contact in %(contacts)s
+        """, {"now": now, "count": count, "contacts": tuple(contact_names)})
+
+    # Authentication failures take the account out of rotation, as in EmailAccount.send_email
+    failed_accounts = {}
+    for job in jobs:
+        if not job.success and not job.retry_at:
+            failed_accounts.setdefault(job.account.name, job)
+
+    for account_name, job in failed_accounts.items():
+        frappe.log_error(
+            message=f"Failed to send email from {job.account.email}: {job.error}",
+            title="Email Sending Failed"
+        )
+
+        if "Authentication" in job.error or "login" in job.error.lower():
+            get_smtp_pool().close_account(account_name)
+            frappe.db.set_value("Email Account", account_name, "status", "Error", update_modified=False)
+
+    return len(sent)
+
+def measure_engine_throughput(messages=1000, accounts=10, global_concurrency=20, latency=0):
+    """
+    Measure raw engine throughput against a local SMTP sink, without a site
+    Returns a dict with the elapsed time and emails per second
+    """
+    from outreach_app.outreach_app.utils.smtp_sink import SMTPSink
+
+    with SMTPSink(latency=latency) as sink:
+        prepared = [
+            PreparedAccount(f"sink-{i}", f"sender{i}@example.com", sink.host, sink.port, 0, f"sender{i}", "secret")
+            for i in range(accounts)
+        ]
+        jobs = [
+            SendJob(f"job-{i}", prepared[i % accounts], f"recipient{i}@example.com",
+                "Subject: Benchmark\r\n\r\nHello\r\n")
+            for i in range(messages)
+        ]
+
+        pool = SMTPConnectionPool()
+        start = time.monotonic()
+        AsyncSendEngine(global_concurrency, pool=pool).run(jobs)
+        elapsed = time.monotonic() - start
+        pool.close_all()
+
+    return {
+        "messages": messages,
+        "sent": sum(1 for job in jobs if job.success),
+        "received": sink.messages,
+        "elapsed": elapsed,
+        "emails_per_second": messages / elapsed if elapsed else 0
+    }
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from outreach_app.outreach_app.utils.assignment_cache import get_assignment_cache
+from outreach_app.outreach_app.utils.link_validation import mark_existing
+from outreach_app.outreach_app.utils.sequences import get_step_successors
+from outreach_app.outreach_app.utils.templates import get_compiled_template
+
+CONTACT_FIELDS = ["name", "first_name", "last_name", "full_name", "email_id", "company_name"]
+PROVIDER_FIELDS = ["name", "min_interval_seconds", "max_interval_seconds", "enable_random_intervals",
+    "default_sender_name"]
+
+class CampaignBatch(object):
+    """
+    Records needed to distribute one batch of campaign contacts
+    Contacts, steps, templates and providers are fetched with one IN (...) query
+    each, the campaign once and the sequence's step map from the cache, then
+    reused for the whole run
+    """
+
+    def __init__(self, campaign, successors, contacts, steps, templates, providers):
+        self.campaign = campaign
+        self.successors = successors
+        self.contacts = contacts
+        self.steps = steps
+        self.templates = templates
+        self.providers = providers
+
+    @classmethod
+    def load(cls, campaign, campaign_contacts):
+        """Load everything referenced by a list of Campaign Contact rows"""
+        campaign_doc = frappe.get_doc("Campaign", campaign)
+        successors = get_step_successors(campaign_doc.get("sequence"))
+
+        steps = get_records_by_name(
+            "Campaign Step",
+            {row.current_step for row in campaign_contacts},
+            ["*"]
+        )
+
+        templates = get_records_by_name(
+            "Message Template",
+            {step.message_template for step in steps.values()},
+            ["name", "subject", "body", "modified"]
+        )
+
+        # Load every Contact field the batch's templates refer to
+        contact_fields = set(CONTACT_FIELDS)
+        for template in templates.values():
+            contact_fields |= get_compiled_template(template).contact_fields
+
+        contact_fields &= set(frappe.get_meta("Contact").get_valid_columns()) | {"name"}
+
+        contacts = get_records_by_name(
+            "Contact",
+            {row.contact for row in campaign_contacts},
+            sorted(contact_fields)
+        )
+
+        providers = {
+            provider.name: provider
+            for provider in frappe.get_all("Email Provider", filters={"is_active": 1}, fields=PROVIDER_FIELDS)
+        }
+
+        # Everything loaded here exists, so link validation later in the job needs no queries
+        mark_existing("Campaign", [campaign_doc.name])
+        mark_existing("Contact", contacts)
+        mark_existing("Campaign Step", steps)
+        mark_existing("Message Template", templates)
+        mark_existing("Email Provider", providers)
+        
+        # Sender assignments of the batch's contacts, so sender selection needs no per-contact queries
+        get_assignment_cache().prime(contacts)
+
+        return cls(campaign_doc, successors, contacts, steps, templates, providers)
+
+    def get_contact(self, name):
+        return self.contacts.get(name)
+
+    def get_step(self, name):
+        return self.steps.get(name)
+
+    def get_template(self, name):
+        return self.templates.get(name)
+
+    def get_provider(self, name):
+        return self.providers.get(name)
+
+def get_records_by_name(doctype, names, fields):
+    """
+    Fetch records for a set of names in a single query
+    Returns a dict of name -> record
+    """
+    names = [name for name in names if name]
+    if not names:
+        return {}
+
+    records = frappe.get_all(
+        doctype,
+        filters={"name": ["in", names]},
+        fields=fields
+    )
+
+    return {record.name: record for record in records}
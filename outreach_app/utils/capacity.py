@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import datetime
+import random
+from frappe.utils import now_datetime, get_datetime
+from outreach_app.outreach_app.utils.circuit_breaker import get_circuit_breaker
+from outreach_app.outreach_app.utils.link_validation import mark_existing
+from outreach_app.outreach_app.utils.rate_limiter import get_rate_limiter
+from outreach_app.outreach_app.utils.weighted_sampler import WeightedSampler
+
+NEVER_USED = datetime.datetime(1900, 1, 1)
+
+class AccountCapacity(object):
+    """
+    Usage counters and limits of one email account
+    blocked_until is set while the account's circuit breaker is open
+    """
+
+    __slots__ = ("name", "email", "parent", "daily_count", "daily_limit", "hourly_count",
+        "hourly_limit", "last_used", "blocked_until")
+
+    def __init__(self, name, email, parent, daily_count, daily_limit, hourly_count, hourly_limit, last_used=None,
+            blocked_until=None):
+        self.name = name
+        self.email = email
+        self.parent = parent
+        self.daily_count = daily_count or 0
+        self.daily_limit = daily_limit or 0
+        self.hourly_count = hourly_count or 0
+        self.hourly_limit = hourly_limit or 0
+        self.last_used = get_datetime(last_used) if last_used else NEVER_USED
+        self.blocked_until = blocked_until
+
+    def is_available(self):
+        return (not self.blocked_until and self.daily_count < self.daily_limit and
+            self.hourly_count < self.hourly_limit)
+
+    @property
+    def remaining(self):
+        if self.blocked_until:
+            return 0
+
+        return max(0, min(self.daily_limit - self.daily_count, self.hourly_limit - self.hourly_count))
+
+    @property
+    def daily_ratio(self):
+        return float(self.daily_count) / float(self.daily_limit) if self.daily_limit > 0 else 1.0
+
+    @property
+    def hourly_ratio(self):
+        return float(self.hourly_count) / float(self.hourly_limit) if self.hourly_limit > 0 else 1.0
+
+class ProviderCapacity(object):
+    """Selection settings of one email provider and the totals of its active accounts"""
+
+    __slots__ = ("name", "enable_auto_rotation", "accounts", "daily_count", "daily_limit",
+        "hourly_count", "hourly_limit", "daily_email_limit", "hourly_email_limit",
+        "sent_last_day", "sent_last_hour")
+
+    def __init__(self, name, enable_auto_rotation, daily_email_limit=None, hourly_email_limit=None,
+            sent_last_day=0, sent_last_hour=0):
+        self.name = name
+        self.enable_auto_rotation = enable_auto_rotation
+        self.accounts = []
+        self.daily_count = 0
+        self.daily_limit = 0
+        self.hourly_count = 0
+        self.hourly_limit = 0
+        self.daily_email_limit = daily_email_limit
+        self.hourly_email_limit = hourly_email_limit
+        self.sent_last_day = sent_last_day
+        self.sent_last_hour = sent_last_hour
+
+    def add_account(self, account):
+        self.accounts.append(account)
+        self.daily_count += account.daily_count
+        self.daily_limit += account.daily_limit
+        self.hourly_count += account.hourly_count
+        self.hourly_limit += account.hourly_limit
+
+    def is_available(self):
+        """True while the provider itself is under its own rolling limits"""
+        return ((self.daily_email_limit is None or self.sent_last_day < self.daily_email_limit) and
+            (self.hourly_email_limit is None or self.sent_last_hour < self.hourly_email_limit))
+
+    def available_accounts(self):
+        if not self.is_available():
+            return []
+
+        return [account for account in self.accounts if account.is_available()]
+
+    @property
+    def remaining(self):
+        """Sends left across the provider's accounts, capped by the provider's own limits"""
+        remaining = sum(account.remaining for account in self.accounts)
+
+        if self.daily_email_limit is not None:
+            remaining = min(remaining, max(0, self.daily_email_limit - self.sent_last_day))
+
+        if self.hourly_email_limit is not None:
+            remaining = min(remaining, max(0, self.hourly_email_limit - self.sent_last_hour))
+
+        return remaining
+
+    @property
+    def daily_ratio(self):
+        return float(self.daily_count) / float(self.daily_limit) if self.daily_limit > 0 else 1.0
+
+    @property
+    def hourly_ratio(self):
+        return float(self.hourly_count) / float(self.hourly_limit) if self.hourly_limit > 0 else 1.0
+
+class CapacitySnapshot(object):
+    """
+    In-memory view of active providers and accounts for one batch
+    Built with two queries plus one limiter round trip and updated in place as
+    sends are assigned, so provider and account selection within the batch needs
+    no database access
+    """
+
+    def __init__(self, providers):
+        self.providers = {provider.name: provider for provider in providers}
+        self.accounts = {}
+
+        for provider in providers:
+            for account in provider.accounts:
+                self.accounts[account.name] = account
+
+        # Weighted samplers, built on first use and updated as sends are recorded
+        self._available_counts = {}
+        self._provider_sampler = None
+        self._provider_order = []
+        self._provider_index = {}
+        self._account_samplers = {}
+
+    @classmethod
+    def build(cls):
+        """Load all active providers and their active accounts"""
+        provider_rows = frappe.get_all(
+            "Email Provider",
+            filters={"is_active": 1},
+            fields=["name", "enable_auto_rotation", "daily_email_limit", "hourly_email_limit"]
+        )
+
+        if not provider_rows:
+            return cls([])
+
+        limiter = get_rate_limiter()
+        provider_usage = limiter.get_provider_usage([row.name for row in provider_rows])
+
+        providers = []
+        for row in provider_rows:
+            sent_last_hour, sent_last_day = provider_usage[row.name]
+            providers.append(ProviderCapacity(
+                row.name, row.enable_auto_rotation, row.daily_email_limit, row.hourly_email_limit,
+                sent_last_day, sent_last_hour
+            ))
+
+        account_rows = frappe.get_all(
+            "Email Account",
+            filters={
+                "parent": ["in", [provider.name for provider in providers]],
+                "parenttype": "Email Provider",
+                "is_active": 1
+            },
+            fields=["name", "email", "parent", "daily_limit", "hourly_limit", "last_used", "smtp_server"],
+            order_by="idx asc"
+        )
+
+        # Usage comes from the rolling-window limiter rather than the counter fields
+        account_usage = limiter.get_account_usage([row.name for row in account_rows])
+
+        # Accounts whose own or SMTP server's circuit breaker is open stay out of selection
+        blocked = get_circuit_breaker().blocked_until([(row.name, row.smtp_server) for row in account_rows])
+
+        providers_by_name = {provider.name: provider for provider in providers}
+        for row in account_rows:
+            hourly_count, daily_count = account_usage[row.name]
+            providers_by_name[row.parent].add_account(AccountCapacity(
+                row.name, row.email, row.parent, daily_count, row.daily_limit,
+                hourly_count, row.hourly_limit, row.last_used, blocked.get(row.name)
+            ))
+
+        mark_existing("Email Provider", providers_by_name)
+        mark_existing("Email Account", [row.name for row in account_rows])
+
+        return cls(providers)
+
+    def get_provider(self, provider_name):
+        return self.providers.get(provider_name)
+
+    def get_account(self, account_name):
+        return self.accounts.get(account_name)
+
+    def record_send(self, account_name, count=1, when=None):
+        """Count sends assigned to an account against the snapshot"""
+        account = self.accounts.get(account_name)
+        if not account:
+            return
+
+        was_available = account.is_available()
+        when = when or now_datetime()
+
+        account.daily_count += count
+        account.hourly_count += count
+        account.last_used = when
+
+        provider = self.providers[account.parent]
+        provider.daily_count += count
+        provider.hourly_count += count
+        provider.sent_last_day += count
+        provider.sent_last_hour += count
+
+        if provider.name in self._available_counts and was_available and not account.is_available():
+            self._available_counts[provider.name] -= 1
+
+        # One weight update per sampler instead of rebuilding them
+        if provider.name in self._account_samplers:
+            sampler, index = self._account_samplers[provider.name]
+            sampler.update(index[account.name], account_weight(account, when))
+
+        if self._provider_sampler is not None:
+            self._provider_sampler.update(self._provider_index[provider.name], self._provider_weight(provider))
+
+    def least_used_provider(self):
+        """Provider with the lowest daily usage ratio, or None"""
+        providers = [provider for provider in self.providers.values() if provider.accounts]
+
+        if not providers:
+            return None
+
+        return min(providers, key=lambda provider: provider.daily_ratio)
+
+    def select_account(self, provider_name):
+        """
+        Next available account of a provider
+        Least recently used with auto rotation, otherwise random
+        """
+        provider = self.providers.get(provider_name)
+        if not provider:
+            return None
+
+        available = provider.available_accounts()
+        if not available:
+            return None
+
+        if provider.enable_auto_rotation:
+            return min(available, key=lambda account: account.last_used)
+
+        return random.choice(available)
+
+    def sample_provider(self):
+        """
+        Random provider with available accounts, weighted towards low daily usage
+        Returns the ProviderCapacity record or None
+        """
+        if self._provider_sampler is None:
+            self._provider_order = list(self.providers.values())
+            self._provider_index = {provider.name: i for i, provider in enumerate(self._provider_order)}
+            self._provider_sampler = WeightedSampler(
+                self._provider_weight(provider) for provider in self._provider_order
+            )
+
+        index = self._provider_sampler.sample()
+        return self._provider_order[index] if index is not None else None
+
+    def sample_account(self, provider_name):
+        """
+        Random available account of a provider, weighted towards low daily usage
+        and long idle time
+        Returns the AccountCapacity record or None
+        """
+        provider = self.providers.get(provider_name)
+        if not provider:
+            return None
+
+        if provider_name not in self._account_samplers:
+            now = now_datetime()
+            sampler = WeightedSampler(account_weight(account, now) for account in provider.accounts)
+            index = {account.name: i for i, account in enumerate(provider.accounts)}
+            self._account_samplers[provider_name] = (sampler, index)
+
+        sampler, index = self._account_samplers[provider_name]
+        selected = sampler.sample()
+
+        return provider.accounts[selected] if selected is not None else None
+
+    def _provider_weight(self, provider):
+        if provider.name not in self._available_counts:
+            self._available_counts[provider.name] = sum(1 for account in provider.accounts if account.is_available())
+
+        return provider_weight(provider, self._available_counts[provider.name])
+
+    def remaining_capacity(self):
+        """Sends left across all providers before an hourly or daily limit is hit"""
+        return sum(provider.remaining for provider in self.providers.values())
+
+    def daily_limits_reached(self, provider_name=None):
+        """True if no account of the provider (or of any provider) is under its daily limit"""
+        if provider_name:
+            providers = [self.providers[provider_name]] if provider_name in self.providers else []
+        else:
+            providers = self.providers.values()
+
+        for provider in providers:
+            for account in provider.accounts:
+                if account.daily_count < account.daily_limit:
+                    return False
+
+        return True
+
+def provider_weight(provider, available_accounts):
+    """
+    Selection weight of a provider: inverse of its daily usage ratio, with a
+    small floor so even busy providers are picked now and then; 0 if none of its
+    accounts can send
+    """
+    if not available_accounts or not provider.is_available():
+        return 0.0
+
+    return max(0.05, 1.0 - provider.daily_ratio)
+
+def account_weight(account, now):
+    """
+    Selection weight of an account: mostly inverse daily usage ratio, partly time
+    since last use (full weight after an hour); 0 if it cannot send
+    """
+    if not account.is_available():
+        return 0.0
+
+    usage_weight = max(0.05, 1.0 - account.daily_ratio)
+    time_weight = min(1.0, max(0.0, (now - account.last_used).total_seconds()) / 3600.0)
+
+    return (usage_weight * 0.7) + (time_weight * 0.3)
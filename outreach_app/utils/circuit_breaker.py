@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import smtplib
+import time
+from frappe.utils import cint, now_datetime, add_to_date
+from outreach_app.outreach_app.utils.send_slots import RedisSlotStore, InMemorySlotStore
+
+# Defaults, overridable from site_config.json
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_OPEN_SECONDS = 30
+DEFAULT_MAX_OPEN_SECONDS = 900
+DEFAULT_PROBE_TIMEOUT = 60
+
+# Attempts to write a state change before giving up on a contended breaker
+MAX_UPDATE_ATTEMPTS = 5
+
+BREAKERS_CACHE_KEY = "outreach:circuit_breakers"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_memory_store = None
+
+class CircuitOpenError(Exception):
+    """Raised instead of connecting while an account's or SMTP server's breaker is open"""
+
+    def __init__(self, message, retry_at):
+        super(CircuitOpenError, self).__init__(message)
+        self.retry_at = retry_at
+
+class BreakerState(object):
+    """
+    State of one breaker
+    Closed counts consecutive failures; open blocks sends until retry_at; half
+    open lets a single probe through until probe_until. Every time the breaker
+    opens again its open period doubles, up to the maximum.
+    Times are POSIX timestamps; a closed breaker with no failures is stored as ""
+    """
+
+    __slots__ = ("state", "failures", "retry_at", "opens", "probe_until")
+
+    def __init__(self, state=CLOSED, failures=0, retry_at=0, opens=0, probe_until=0):
+        self.state = state
+        self.failures = failures
+        self.retry_at = retry_at
+        self.opens = opens
+        self.probe_until = probe_until
+
+    @classmethod
+    def loads(cls, value):
+        if not value:
+            return cls()
+
+        state, failures, retry_at, opens, probe_until = value.split("|")
+        return cls(state, int(failures), float(retry_at), int(opens), float(probe_until))
+
+    def dumps(self):
+        if self.state == CLOSED and not self.failures:
+            return ""
+
+        return f"{self.state}|{self.failures}|{self.retry_at:.3f}|{self.opens}|{self.probe_until:.3f}"
+
+    def blocked_until(self, now):
+        """Time sends may resume, or None if a send (or a probe) may go through now"""
+        if self.state == OPEN and now < self.retry_at:
+            return self.retry_at
+
+        if self.state == HALF_OPEN and now < self.probe_until:
+            return self.probe_until
+
+        return None
+
+class BreakerTicket(object):
+    """The breakers checked for one send, as they were when it was let through"""
+
+    __slots__ = ("fields", "values")
+
+    def __init__(self, fields, values):
+        self.fields = fields
+        self.values = values
+
+class CircuitBreaker(object):
+    """
+    Circuit breakers per email account and per SMTP server, shared by all workers
+    through the cache
+    After failure_threshold consecutive connection failures a breaker opens and
+    sends are refused without connecting. Once its open period has passed one
+    send is let through as a probe: success closes the breaker, failure opens it
+    again for twice as long, up to max_open_seconds. A probe that does not
+    report back within probe_timeout is given up and another one is allowed.
+    """
+
+    def __init__(self, store=None, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+            open_seconds=DEFAULT_OPEN_SECONDS, max_open_seconds=DEFAULT_MAX_OPEN_SECONDS,
+            probe_timeout=DEFAULT_PROBE_TIMEOUT):
+        self.store = store or get_breaker_store()
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max(open_seconds, max_open_seconds)
+        self.probe_timeout = probe_timeout
+
+    def acquire(self, account_name, smtp_server=None, now=None):
+        """
+        Check the breakers of an account and its SMTP server before sending
+        Returns a BreakerTicket to report the outcome with
+        Raises CircuitOpenError if either breaker is open
+        """
+        fields = breaker_fields(account_name, smtp_server)
+
+        for attempt in range(MAX_UPDATE_ATTEMPTS):
+            now = now or time.time()
+            values = self.store.get(fields)
+            states = {field: BreakerState.loads(values[field]) for field in fields}
+
+            blocked = [state.blocked_until(now) for state in states.values() if state.blocked_until(now)]
+            if blocked:
+                raise CircuitOpenError(f"Circuit open for {account_name} ({smtp_server})", max(blocked))
+
+            # Open breakers past their open period let this send through as the probe
+            updates = {}
+            for field, state in states.items():
+                if state.state in (OPEN, HALF_OPEN):
+                    state.state = HALF_OPEN
+                    state.probe_until = now + self.probe_timeout
+                    updates[field] = state.dumps()
+
+            if not updates or self.store.compare_and_set(values, updates):
+                return BreakerTicket(fields, dict(values, **updates))
+
+            now = None
+
+        # Lost every race: other workers are probing
+        raise CircuitOpenError(f"Circuit half open for {account_name} ({smtp_server})", time.time() + self.probe_timeout)
+
+    def record_success(self, ticket):
+        """Close the ticket's breakers; free when they were closed already"""
+        if not any(ticket.values.values()):
+            return
+
+        self._update(ticket.fields, lambda state, now: BreakerState())
+
+    def record_failure(self, ticket, now=None):
+        """Count a connection failure against the ticket's breakers"""
+        self._update(ticket.fields, self._fail, now)
+
+    def blocked_until(self, accounts, now=None):
+        """
+        Accounts that cannot send now, with one cache read
+        accounts is a list of (account name, smtp_server)
+        Returns a dict of account name -> time sends may resume
+        """
+        accounts = list(accounts)
+        if not accounts:
+            return {}
+
+        now = now or time.time()
+        fields = list({field for name, smtp_server in accounts for field in breaker_fields(name, smtp_server)})
+        values = self.store.get(fields)
+
+        blocked = {}
+        for name, smtp_server in accounts:
+            times = [BreakerState.loads(values[field]).blocked_until(now) for field in breaker_fields(name, smtp_server)]
+            times = [t for t in times if t]
+            if times:
+                blocked[name] = max(times)
+
+        return blocked
+
+    def _fail(self, state, now):
+        if state.state == CLOSED:
+            state.failures += 1
+            if state.failures < self.failure_threshold:
+                return state
+
+            state.opens = 0
+        elif state.state == OPEN:
+            # Sends already in flight when it opened
+            return state
+
+        state.state = OPEN
+        state.opens += 1
+        state.retry_at = now + min(self.max_open_seconds, self.open_seconds * 2 ** (state.opens - 1))
+        state.probe_until = 0
+
+        return state
+
+    def _update(self, fields, change, now=None):
+        for attempt in range(MAX_UPDATE_ATTEMPTS):
+            values = self.store.get(fields)
+            updates = {
+                field: change(BreakerState.loads(values[field]), now or time.time()).dumps()
+                for field in fields
+            }
+
+            updates = {field: value for field, value in updates.items() if value != values[field]}
+            if not updates or self.store.compare_and_set(values, updates):
+                return
+
+def get_retry_datetime(retry_at):
+    """
+    Site datetime for a breaker's retry_at, to compare with scheduled_time
+    retry_at is a POSIX timestamp, while scheduled_time is naive in the system
+    timezone, which need not be the OS timezone; so the offset from now is
+    carried over rather than the timestamp converted
+    """
+    return add_to_date(now_datetime(), seconds=max(0.0, retry_at - time.time()))
+
+def breaker_fields(account_name, smtp_server=None):
+    fields = [f"account:{account_name}"]
+    if smtp_server:
+        fields.append(f"host:{smtp_server.lower()}")
+
+    return fields
+
+def is_breaker_failure(error):
+    """
+    True if a send failed because the server could not be reached or refused
+    service, as opposed to rejecting this particular message
+    """
+    from outreach_app.outreach_app.utils.smtp_pool import is_connection_error
+
+    if isinstance(error, smtplib.SMTPConnectError) or is_connection_error(error):
+        return True
+
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+def get_breaker_store():
+    """Redis store by default; the in-process store wherever the rate limiter uses one"""
+    global _memory_store
+
+    if frappe.flags.in_test or frappe.conf.get("outreach_rate_limiter_store") == "memory":
+        if _memory_store is None:
+            _memory_store = InMemorySlotStore()
+
+        return _memory_store
+
+    return RedisSlotStore(key=BREAKERS_CACHE_KEY)
+
+def get_circuit_breaker():
+    """Get a circuit breaker bound to the site's breaker store and settings"""
+    conf = frappe.conf or {}
+
+    return CircuitBreaker(
+        failure_threshold=cint(conf.get("outreach_breaker_failure_threshold")) or DEFAULT_FAILURE_THRESHOLD,
+        open_seconds=cint(conf.get("outreach_breaker_open_seconds")) or DEFAULT_OPEN_SECONDS,
+        max_open_seconds=cint(conf.get("outreach_breaker_max_open_seconds")) or DEFAULT_MAX_OPEN_SECONDS,
+        probe_timeout=cint(conf.get("outreach_breaker_probe_timeout")) or DEFAULT_PROBE_TIMEOUT
+    )
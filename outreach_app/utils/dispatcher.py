@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import heapq
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from frappe.utils import now_datetime, add_to_date, cint
+from outreach_app.outreach_app.utils.link_validation import clear_link_cache
+
+# Defaults, overridable from site_config.json
+DEFAULT_LOOKAHEAD = 300
+DEFAULT_REFILL_INTERVAL = 15
+DEFAULT_LOCK_TTL = 30
+DEFAULT_REFILL_LIMIT = 5000
+
+# Longest sleep between checks of the heap and the leader lock
+MAX_WAIT = 1.0
+
+# Dispatched emails are remembered for this long, so rows read again before their
+# claim shows up are not dispatched twice
+DISPATCHED_TTL = 600
+
+# Modified rows are read again for this long, so rows committed late are not missed
+WATERMARK_OVERLAP = 60
+
+LEADER_KEY = "outreach:dispatcher:leader"
+
+# KEYS[1]: lock key, ARGV[1]: owner, ARGV[2]: ttl in milliseconds
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1]: lock key, ARGV[1]: owner
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class LeaderLock(object):
+    """
+    Redis lock held by the one dispatcher allowed to dispatch for a site
+    The lock expires unless renewed, so a crashed dispatcher is replaced
+    within one ttl
+    """
+
+    def __init__(self, ttl=DEFAULT_LOCK_TTL, cache=None):
+        self.cache = cache or frappe.cache()
+        self.key = self.cache.make_key(LEADER_KEY)
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renew = self.cache.register_script(RENEW_SCRIPT)
+        self._release = self.cache.register_script(RELEASE_SCRIPT)
+
+    def acquire(self):
+        return bool(self.cache.set(self.key, self.owner, nx=True, px=int(self.ttl * 1000)))
+
+    def renew(self):
+        return bool(int(self._renew(keys=[self.key], args=[self.owner, int(self.ttl * 1000)])))
+
+    def release(self):
+        self._release(keys=[self.key], args=[self.owner])
+
+class EmailDispatcher(object):
+    """
+    Long-running dispatcher for due emails
+    Upcoming Queued/Scheduled emails are kept in a min-heap keyed by
+    scheduled_time. The heap is refilled incrementally: each refill only reads
+    rows that entered the lookahead window or were modified since the last one.
+    Due emails are handed to the send jobs within about a second of their slot.
+    Only the instance holding the leader lock dispatches; others wait to take over.
+    """
+
+    def __init__(self, lookahead=None, refill_interval=None, lock_ttl=None, refill_limit=None):
+        conf = frappe.conf or {}
+        self.lookahead = lookahead or cint(conf.get("outreach_dispatcher_lookahead")) or DEFAULT_LOOKAHEAD
+        self.refill_interval = (refill_interval or cint(conf.get("outreach_dispatcher_refill_interval"))
+            or DEFAULT_REFILL_INTERVAL)
+        self.refill_limit = refill_limit or cint(conf.get("outreach_dispatcher_refill_limit")) or DEFAULT_REFILL_LIMIT
+        self.lock = LeaderLock(lock_ttl or cint(conf.get("outreach_dispatcher_lock_ttl")) or DEFAULT_LOCK_TTL)
+
+        self.heap = []
+        self.queued = {}
+        self.dispatched = {}
+        self.horizon = None
+        self.watermark = None
+        self.next_refill = 0
+        self.is_leader = False
+        self._stop = threading.Event()
+
+    def run(self):
+        """Dispatch until stopped by SIGTERM/SIGINT or stop()"""
+        self.install_signal_handlers()
+        next_renew = 0
+
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+
+                if now >= next_renew:
+                    self.check_leadership()
+                    next_renew = now + self.lock.ttl / 3.0
+
+                if not self.is_leader:
+                    self._stop.wait(min(MAX_WAIT, self.lock.ttl / 3.0))
+                    continue
+
+                if now >= self.next_refill:
+                    self.refill()
+                    self.next_refill = now + self.refill_interval
+
+                self.dispatch_due()
+
+                # End the transaction so the next refill sees new rows
+                frappe.db.commit()
+
+                self._stop.wait(self.seconds_to_next())
+        finally:
+            if self.is_leader:
+                self.lock.release()
+                self.is_leader = False
+
+    def stop(self, *args):
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+    def check_leadership(self):
+        """Renew the leader lock, or try to take it over"""
+        if self.is_leader and self.lock.renew():
+            return
+
+        was_leader = self.is_leader
+        self.is_leader = self.lock.acquire()
+
+        if was_leader and not self.is_leader:
+            frappe.log_error(
+                message=f"Dispatcher {self.lock.owner} lost the leader lock and stopped dispatching",
+                title="Email Dispatcher"
+            )
+
+        if self.is_leader != was_leader:
+            # Start over from the database; the previous leader may have dispatched anything
+            self.reset()
+
+    def reset(self):
+        self.heap = []
+        self.queued = {}
+        self.horizon = None
+        self.watermark = None
+        self.next_refill = 0
+
+    def refill(self):
+        """Add emails that entered the lookahead window or changed since the last refill"""
+        # Links validated on earlier refills may point at records deleted since
+        clear_link_cache()
+
+        now = now_datetime()
+        horizon = add_to_date(now, seconds=self.lookahead)
+        values = {"horizon": horizon, "limit": self.refill_limit}
+
+        if self.horizon is None:
+            condition = ""
+        else:
+            condition = "and (scheduled_time >= %(previous_horizon)s or modified >= %(watermark)s)"
+            values.update({
+                "previous_horizon": self.horizon,
+                "watermark": add_to_date(self.watermark, seconds=-WATERMARK_OVERLAP)
+            })
+
+        rows = frappe.db.sql(f"""
+            select name, email_account, scheduled_time, status, modified
+            from `tabEmail Queue`
+            where status in ('Queued', 'Scheduled')
+                and scheduled_time <= %(horizon)s
+                {condition}
+            order by scheduled_time asc
+            limit %(limit)s
+        """, values, as_dict=True)
+
+        for row in rows:
+            self.push(row)
+
+        # A full page means the window was cut short; continue from its last row next time
+        self.horizon = horizon if len(rows) < self.refill_limit else rows[-1].scheduled_time
+        self.watermark = now
+
+    def push(self, row):
+        """Add or reschedule one email; the heap entry of an older schedule is skipped when popped"""
+        dispatched = self.dispatched.get(row.name)
+        if dispatched:
+            # Back in the queue since it was dispatched (released, deferred or its claim lost)
+            if row.modified <= dispatched:
+                return
+
+            del self.dispatched[row.name]
+
+        if self.queued.get(row.name) == row.scheduled_time:
+            return
+
+        self.queued[row.name] = row.scheduled_time
+        heapq.heappush(self.heap, (row.scheduled_time, row.name, row.email_account))
+
+    def dispatch_due(self):
+        """Hand every email whose slot has come to the send jobs"""
+        from outreach_app.outreach_app.doctype.email_queue.email_queue import enqueue_batches, claim_emails
+
+        now = now_datetime()
+        due = []
+
+        while self.heap and self.heap[0][0] <= now:
+            scheduled_time, name, email_account = heapq.heappop(self.heap)
+
+            if self.queued.get(name) != scheduled_time:
+                continue
+
+            del self.queued[name]
+            self.dispatched[name] = now
+            due.append(frappe._dict({"name": name, "email_account": email_account}))
+
+        if due:
+            # Emails rescheduled, cancelled or sent since the last refill are not claimed
+            claim, claimed = claim_emails([email.name for email in due])
+            frappe.db.commit()
+            enqueue_batches([email for email in due if email.name in claimed], claim)
+
+            # Unclaimed emails were not dispatched; take them back when they are read again
+            for email in due:
+                if email.name not in claimed:
+                    del self.dispatched[email.name]
+
+        self.expire_dispatched()
+
+        return len(due)
+
+    def expire_dispatched(self):
+        cutoff = add_to_date(now_datetime(), seconds=-DISPATCHED_TTL)
+        for name in [name for name, dispatched in self.dispatched.items() if dispatched < cutoff]:
+            del self.dispatched[name]
+
+    def seconds_to_next(self):
+        """Time to sleep until the next slot, refill or lock renewal, at most MAX_WAIT"""
+        wait = min(MAX_WAIT, max(0, self.next_refill - time.monotonic()))
+
+        if self.heap:
+            wait = min(wait, max(0, (self.heap[0][0] - now_datetime()).total_seconds()))
+
+        return wait
+
+def is_dispatcher_running():
+    """True while a dispatcher holds the leader lock of the site"""
+    cache = frappe.cache()
+    return bool(cache.exists(cache.make_key(LEADER_KEY)))
+
+def run_dispatcher():
+    """Run the dispatcher for the connected site until it is stopped"""
+    EmailDispatcher().run()
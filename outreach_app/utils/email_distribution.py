@@ -7,7 +7,21 @@ from __future__ import unicode_literals
 import frappe
 import random
 from frappe.utils import now_datetime, get_datetime, add_to_date, time_diff_in_seconds, cint
+from outreach_app.outreach_app.utils.allocator import BatchAllocator
+from outreach_app.outreach_app.utils.assignment_cache import clear_local_assignments
+from outreach_app.outreach_app.utils.batch_loader import CampaignBatch
+from outreach_app.outreach_app.utils.capacity import CapacitySnapshot
+from outreach_app.outreach_app.utils.fair_share import fair_shares, get_campaign_weights
+from outreach_app.outreach_app.utils.link_validation import clear_link_cache
+from outreach_app.outreach_app.utils.query_profiler import profiled
+from outreach_app.outreach_app.utils.send_slots import get_send_slot_calendar
+from outreach_app.outreach_app.utils.sequences import get_step_successors, advance_campaign_contacts
+from outreach_app.outreach_app.utils.templates import get_compiled_template
 
+# Defaults, overridable from site_config.json
+DEFAULT_DISTRIBUTION_CHUNK_SIZE = 100
+
+@profiled()
 def assign_sender(email_queue_doc):
     """
     Assign a sender to an email queue entry
@@ -17,20 +31,14 @@ def assign_sender(email_queue_doc):
         return
     
     # Check if contact already has a sender assignment
-    assignment = frappe.get_all(
-        "Sender Assignment",
-        filters={
-            "contact": email_queue_doc.contact,
-            "is_active": 1
-        },
-        fields=["name", "email_account", "email_provider"],
-        limit=1
-    )
+    from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
+    
+    assignment = SenderAssignment.get_cached_assignment(email_queue_doc.contact)
     
     if assignment:
         # Use existing assignment
-        email_queue_doc.email_account = assignment[0].email_account
-        email_queue_doc.email_provider = assignment[0].email_provider
+        email_queue_doc.email_account = assignment.email_account
+        email_queue_doc.email_provider = assignment.email_provider
         return
     
     # No existing assignment, get a provider
@@ -76,104 +84,43 @@ def assign_sender(email_queue_doc):
         email_queue_doc.campaign
     )
 
-def get_least_used_provider():
+def get_least_used_provider(snapshot=None):
     """
     Get the provider with the least usage relative to its limits
-    Returns the provider document or None
+    Returns the ProviderCapacity record from the snapshot or None
     """
-    providers = frappe.get_all(
-        "Email Provider",
-        filters={"is_active": 1},
-        fields=["name"]
-    )
-    
-    if not providers:
-        return None
+    snapshot = snapshot or CapacitySnapshot.build()
     
-    # Calculate usage ratio for each provider
-    provider_usage = []
-    for provider_data in providers:
-        provider = frappe.get_doc("Email Provider", provider_data.name)
-        
-        # Get all accounts for this provider
-        accounts = provider.get_available_accounts()
-        
-        if not accounts:
-            continue
-        
-        # Calculate total daily usage and limits
-        total_daily_count = sum(account.daily_count for account in accounts)
-        total_daily_limit = sum(account.daily_limit for account in accounts)
-        
-        # Avoid division by zero
-        if total_daily_limit == 0:
-            usage_ratio = 1.0
-        else:
-            usage_ratio = float(total_daily_count) / float(total_daily_limit)
-        
-        provider_usage.append({
-            "provider": provider,
-            "usage_ratio": usage_ratio
-        })
-    
-    if not provider_usage:
-        return None
-    
-    # Sort by usage ratio (ascending)
-    provider_usage.sort(key=lambda x: x["usage_ratio"])
-    
-    return provider_usage[0]["provider"]
+    return snapshot.least_used_provider()
 
-def get_optimal_account_for_contact(contact, campaign=None):
+def get_optimal_account_for_contact(contact, campaign=None, snapshot=None):
     """
     Get the optimal email account for a contact
     First checks for existing assignment, then tries to find the best available account
-    Returns the account document or None
+    The account is counted against the capacity snapshot; callers processing a
+    batch should use BatchAllocator for all contacts at once instead
+    Returns the AccountCapacity record or None
     """
-    # Check if contact already has a sender assignment
-    from outreach_app.outreach_app.doctype.sender_assignment.sender_assignment import SenderAssignment
+    snapshot = snapshot or CapacitySnapshot.build()
     
-    assignment = SenderAssignment.get_assignment_for_contact(contact)
-    
-    if assignment:
-        # Check if the assigned account is still available
-        account = frappe.get_doc("Email Account", assignment.email_account)
-        if (account.is_active and 
-            account.daily_count < account.daily_limit and 
-            account.hourly_count < account.hourly_limit):
-            return account
-        else:
-            # Deactivate the assignment since the account is no longer available
-            assignment.is_active = 0
-            assignment.save()
-    
-    # Get the provider with the least usage
-    provider = get_least_used_provider()
-    
-    if not provider:
-        return None
-    
-    # Get the next available account from this provider
-    account = provider.get_next_available_account(contact)
-    
-    if account:
-        # Create a new assignment
-        SenderAssignment.create_assignment(
-            contact,
-            account.name,
-            provider.name,
-            campaign
-        )
+    allocator = BatchAllocator(snapshot)
+    account = allocator.allocate([contact]).get(contact)
+    allocator.save(campaign)
     
     return account
 
-def calculate_next_send_time(email_provider=None, last_send_time=None):
+def calculate_next_send_time(email_provider=None, last_send_time=None, provider=None):
     """
     Calculate the next time an email can be sent based on provider settings
+    provider can be passed to reuse an already loaded provider record
     If email_provider is not provided, use the default provider
     If last_send_time is not provided, use current time
     """
-    if not email_provider:
+    if provider:
+        min_interval = provider.min_interval_seconds
+        max_interval = provider.max_interval_seconds
+        use_random = provider.enable_random_intervals
+    elif not email_provider:
         providers = frappe.get_all(
             "Email Provider",
             filters={"is_active": 1},
@@ -209,7 +156,7 @@ def calculate_next_send_time(email_provider=None, last_send_time=None):
     next_send_time = add_to_date(last_send_time, seconds=interval_seconds)
     return next_send_time
 
-def calculate_natural_send_time(email_provider=None):
+def calculate_natural_send_time(email_provider=None, provider=None):
     """
     Calculate a natural-looking send time to make emails appear more human
     Avoids sending at exact intervals and adds some randomness
@@ -221,98 +168,144 @@ def calculate_natural_send_time(email_provider=None):
     natural_delay = random.randint(5, 30)
     
     # Calculate the next send time based on provider settings
-    next_time = calculate_next_send_time(email_provider, current_time)
+    next_time = calculate_next_send_time(email_provider, current_time, provider)
     
     # Add the natural delay
     natural_time = add_to_date(next_time, seconds=natural_delay)
     
     return natural_time
 
-def check_daily_limits_reached(provider_name=None):
+def check_daily_limits_reached(provider_name=None, snapshot=None):
     """
     Check if daily limits have been reached for a provider or all providers
     Returns True if limits reached, False otherwise
     """
-    if provider_name:
-        # Check specific provider
-        provider = frappe.get_doc("Email Provider", provider_name)
-        accounts = provider.get_available_accounts()
-        
-        if not accounts:
-            return True
-        
-        # Check if any account is available
-        for account in accounts:
-            if account.daily_count < account.daily_limit:
-                return False
-        
-        # All accounts have reached their limits
-        return True
-    else:
-        # Check all providers
-        providers = frappe.get_all(
-            "Email Provider",
-            filters={"is_active": 1},
-            fields=["name"]
-        )
-        
-        if not providers:
-            return True
-        
-        for provider_data in providers:
-            if not check_daily_limits_reached(provider_data.name):
-                return False
-        
-        # All providers have reached their limits
-        return True
+    snapshot = snapshot or CapacitySnapshot.build()
+    
+    return snapshot.daily_limits_reached(provider_name)
 
-def distribute_emails_for_campaign(campaign, limit=100):
+@profiled()
+def distribute_emails_for_campaign(campaign, limit=100, chunk_size=None):
     """
     Distribute emails for a campaign
     Creates email queue entries for contacts in the campaign
     Respects daily limits and sender consistency
+    Due contacts are claimed in chunks with SELECT ... FOR UPDATE SKIP LOCKED and
+    each chunk is committed once queued, so concurrent runs (the scheduler, the
+    CLI, parallel workers) never queue the same contact twice
+    Contacts are due as of the start of the run, so those queued here, even for
+    a step with no delay, are not claimed again by a later chunk
     Returns the number of emails queued
     """
     if not frappe.db.exists("Campaign", campaign):
         frappe.throw(f"Campaign {campaign} does not exist")
     
-    # Get campaign contacts that are ready for the next email
-    campaign_contacts = frappe.get_all(
-        "Campaign Contact",
-        filters={
-            "campaign": campaign,
-            "status": ["in", ["Pending", "In Progress"]],
-            "next_message_date": ["<=", now_datetime()]
-        },
-        fields=["name", "contact", "current_step", "next_message_date"],
-        limit=limit
-    )
+    chunk_size = (chunk_size or cint(frappe.conf.get("outreach_distribution_chunk_size"))
+        or DEFAULT_DISTRIBUTION_CHUNK_SIZE)
     
-    if not campaign_contacts:
-        return 0
+    now = now_datetime()
+    queued = 0
+    claimed = 0
+    skipped = []
     
-    # Check if daily limits have been reached
-    if check_daily_limits_reached():
-        frappe.log_error(
-            message=f"Daily email limits reached for all providers",
-            title="Email Distribution Error"
-        )
-        return 0
+    while claimed < cint(limit):
+        # Claim campaign contacts that are ready for the next email
+        campaign_contacts = claim_campaign_contacts(campaign, min(chunk_size, cint(limit) - claimed), now, skipped)
+        
+        if not campaign_contacts:
+            break
+        
+        claimed += len(campaign_contacts)
+        
+        # Records may have been deleted or reassigned since the last chunk
+        clear_link_cache()
+        clear_local_assignments()
+        
+        # Load provider and account capacity once for the whole chunk
+        snapshot = CapacitySnapshot.build()
+        
+        # Check if daily limits have been reached
+        if check_daily_limits_reached(snapshot=snapshot):
+            frappe.log_error(
+                message=f"Daily email limits reached for all providers",
+                title="Email Distribution Error"
+            )
+            frappe.db.commit()
+            break
+        
+        queued_names = set(distribute_campaign_contacts(campaign, campaign_contacts, snapshot))
+        queued += len(queued_names)
+        
+        # Contacts left where they were are still due; keep later chunks off them
+        skipped.extend(row.name for row in campaign_contacts if row.name not in queued_names)
+        
+        # Release the claimed rows; queued contacts have moved on to their next step
+        frappe.db.commit()
+    
+    return queued
+
+def claim_campaign_contacts(campaign, limit, now=None, exclude=None):
+    """
+    Lock up to limit campaign contacts due by now for this transaction
+    Rows locked by another transaction are skipped rather than waited for, and
+    rows in exclude (skipped earlier in this run) are not claimed again
+    """
+    values = {"campaign": campaign, "now": now or now_datetime(), "limit": cint(limit)}
+    exclude_condition = ""
+    
+    if exclude:
+        exclude_condition = "and name not in %(exclude)s"
+        values["exclude"] = tuple(exclude)
+    
+    return frappe.db.sql(f"""
+        select name, contact, current_step, next_message_date
+        from `tabCampaign Contact`
+        where campaign = %(campaign)s
+            and status in ('Pending', 'In Progress')
+            and next_message_date <= %(now)s
+            {exclude_condition}
+        order by next_message_date asc
+        limit %(limit)s
+        for update skip locked
+    """, values, as_dict=True)
+
+def distribute_campaign_contacts(campaign, campaign_contacts, snapshot):
+    """
+    Queue the next email of each claimed campaign contact
+    Returns the names of the campaign contacts queued
+    """
+    # Fetch contacts, steps, templates, sequence and providers for the whole batch
+    batch = CampaignBatch.load(campaign, campaign_contacts)
     
-    emails_queued = 0
+    queue_rows = []
+    advanced_contacts = []
+    ready = []
     
     for campaign_contact in campaign_contacts:
         # Get contact details
-        contact = frappe.get_doc("Contact", campaign_contact.contact)
+        contact = batch.get_contact(campaign_contact.contact)
         
         # Get campaign step
-        campaign_step = frappe.get_doc("Campaign Step", campaign_contact.current_step)
+        campaign_step = batch.get_step(campaign_contact.current_step)
         
         # Get message template
-        template = frappe.get_doc("Message Template", campaign_step.message_template)
+        template = batch.get_template(campaign_step.message_template) if campaign_step else None
         
-        # Get the optimal account for this contact
-        account = get_optimal_account_for_contact(contact.name, campaign)
+        if not (contact and campaign_step and template):
+            frappe.log_error(
+                message=f"Missing contact, campaign step or message template for campaign contact {campaign_contact.name}",
+                title="Email Distribution Error"
+            )
+            continue
+        
+        ready.append((campaign_contact, contact, campaign_step, template))
+    
+    # Allocate accounts for the whole batch against the remaining capacity
+    allocator = BatchAllocator(snapshot)
+    allocation = allocator.allocate([contact.name for campaign_contact, contact, campaign_step, template in ready])
+    
+    for campaign_contact, contact, campaign_step, template in ready:
+        account = allocation.get(contact.name)
         
         if not account:
             frappe.log_error(
@@ -322,20 +315,15 @@ def distribute_emails_for_campaign(campaign, limit=100):
             continue
         
         # Get provider
-        provider = frappe.get_doc("Email Provider", account.parent)
-        
-        # Calculate natural send time
-        send_time = calculate_natural_send_time(provider.name)
+        provider = batch.get_provider(account.parent)
         
         # Create personalized message
-        subject, message = personalize_message(template, contact)
+        subject, message = personalize_message(template, contact, batch.campaign)
         
-        # Create email queue entry
-        email_queue = frappe.get_doc({
-            "doctype": "Email Queue",
+        # Prepare email queue entry
+        queue_rows.append({
             "status": "Scheduled",
             "priority": "Medium",
-            "scheduled_time": send_time,
             "recipient": contact.full_name,
             "recipient_email": contact.email_id,
             "contact": contact.name,
@@ -346,103 +334,128 @@ def distribute_emails_for_campaign(campaign, limit=100):
             "subject": subject,
             "message": message
         })
-        
-        email_queue.insert()
-        emails_queued += 1
-        
-        # Update campaign contact
-        update_campaign_contact(campaign_contact.name, campaign_step)
+        advanced_contacts.append((campaign_contact.name, campaign_step.name))
+    
+    # Persist the new sender assignments with one insert
+    allocator.save(campaign)
+    
+    # Natural send times for the whole batch, paced per account and provider
+    send_times = get_send_slot_calendar().allocate(
+        [(row["email_account"], row["email_provider"]) for row in queue_rows]
+    )
+    
+    for row, send_time in zip(queue_rows, send_times):
+        row["scheduled_time"] = send_time or calculate_natural_send_time(row["email_provider"], batch.get_provider(row["email_provider"]))
+    
+    # Write all email queue entries with multi-row inserts
+    from outreach_app.outreach_app.doctype.email_queue.email_queue import bulk_enqueue
+    bulk_enqueue(queue_rows)
+    
+    # Move the queued contacts to their next step, a few statements for the whole batch
+    advance_campaign_contacts(advanced_contacts, batch.successors)
+    
+    return [campaign_contact for campaign_contact, current_step in advanced_contacts]
+
+def distribute_emails_for_all_campaigns(limit=100, force=False):
+    """
+    Distribute emails for all active campaigns
+    limit emails, capped by the sends left before the providers' hourly or daily
+    limits, are split across campaigns by weighted fair share
+    (outreach_campaign_weights), so one large campaign cannot starve the others;
+    with force the remaining capacity is not checked.
+    This function is called every 15 minutes via scheduler
+    Returns a dict of campaign name -> number of emails queued
+    """
+    shares = get_campaign_shares(limit, force)
+    
+    counts = {}
+    for campaign, share in shares.items():
+        counts[campaign] = distribute_emails_for_campaign(campaign, share) if share else 0
+    
+    return counts
+
+def get_campaign_shares(limit=100, force=False):
+    """
+    Number of campaign contacts each active campaign may queue in this run
+    limit is split by campaign weight, capped by the remaining capacity less
+    the emails already queued to go out within the hour
+    Returns a dict of campaign name -> share
+    """
+    campaigns = frappe.get_all("Campaign", filters={"status": "Active"}, pluck="name")
+    
+    if not campaigns:
+        return {}
+    
+    # Due campaign contacts per campaign, one grouped query
+    demands = dict(frappe.db.sql("""
+        select campaign, count(*)
+        from `tabCampaign Contact`
+        where campaign in %(campaigns)s
+            and status in ('Pending', 'In Progress')
+            and next_message_date <= %(now)s
+        group by campaign
+    """, {"campaigns": tuple(campaigns), "now": now_datetime()}))
+    
+    demands = {campaign: cint(demands.get(campaign)) for campaign in campaigns}
+    total = cint(limit)
+    
+    if not force:
+        # Emails due within the hour use up the same capacity; those the slot
+        # calendar paced further ahead count against later windows
+        pending = frappe.db.count("Email Queue", {
+            "status": ["in", ["Queued", "Scheduled"]],
+            "scheduled_time": ["<=", add_to_date(now_datetime(), hours=1)]
+        })
+        total = min(total, max(0, CapacitySnapshot.build().remaining_capacity() - pending))
     
-    return emails_queued
+    return fair_shares(demands, total, get_campaign_weights(campaigns))
 
-def personalize_message(template, contact):
+def personalize_message(template, contact, campaign=None):
     """
     Personalize a message template for a contact
+    The template is compiled once per revision; see utils/templates.py for the
+    available variables
     Returns the personalized subject and message
     """
-    subject = template.subject
-    message = template.body
-    
-    # Basic personalization variables
-    variables = {
-        "first_name": contact.first_name or "",
-        "last_name": contact.last_name or "",
-        "full_name": contact.full_name or "",
-        "email": contact.email_id or "",
-        "company": contact.company_name or ""
-    }
-    
-    # Replace variables in subject and message
-    for var_name, var_value in variables.items():
-        subject = subject.replace(f"{{{var_name}}}", var_value)
-        message = message.replace(f"{{{var_name}}}", var_value)
-    
-    return subject, message
+    return get_compiled_template(template).render(contact, campaign)
 
-def update_campaign_contact(campaign_contact_name, current_step):
+def update_campaign_contact(campaign_contact_name, current_step, successors=None):
     """
     Update a campaign contact after queuing an email
     Sets the next message date and updates the current step if needed
+    successors can be passed to reuse the step map already loaded for a batch
     """
-    campaign_contact = frappe.get_doc("Campaign Contact", campaign_contact_name)
-    
-    # Get the campaign sequence
-    campaign = frappe.get_doc("Campaign", campaign_contact.campaign)
-    sequence = frappe.get_doc("Campaign Sequence", campaign.sequence)
-    
-    # Find the next step
-    next_step = None
-    found_current = False
-    
-    for step in sequence.steps:
-        if found_current:
-            next_step = step
-            break
-        
-        if step.name == current_step.name:
-            found_current = True
+    if successors is None:
+        campaign = frappe.db.get_value("Campaign Contact", campaign_contact_name, "campaign")
+        successors = get_step_successors(frappe.db.get_value("Campaign", campaign, "sequence"))
     
-    # Update campaign contact
-    if next_step:
-        # Calculate next message date based on delay
-        next_date = add_to_date(now_datetime(), days=cint(next_step.delay_days))
-        
-        campaign_contact.current_step = next_step.name
-        campaign_contact.next_message_date = next_date
-        campaign_contact.status = "In Progress"
-    else:
-        # No more steps, mark as completed
-        campaign_contact.status = "Completed"
-    
-    campaign_contact.last_message_date = now_datetime()
-    campaign_contact.save()
+    advance_campaign_contacts([(campaign_contact_name, current_step.name)], successors)
 
-def reset_daily_counters():
+def sync_usage_counters():
     """
-    Reset daily counters for all email accounts
-    This function is called daily via scheduler
+    Refresh the daily/hourly counter fields of all email accounts from the
+    rolling-window limiter, for display only
+    Limits are enforced by the limiter, so nothing needs resetting
+    This function is called hourly via scheduler
     """
-    providers = frappe.get_all("Email Provider")
+    from outreach_app.outreach_app.utils.rate_limiter import get_rate_limiter
     
-    for provider_data in providers:
-        provider = frappe.get_doc("Email Provider", provider_data.name)
-        provider.reset_daily_counters()
-        
-    frappe.db.commit()
-    frappe.log_error(
-        message="Daily email counters have been reset",
-        title="Email Counter Reset"
+    accounts = frappe.get_all(
+        "Email Account",
+        filters={"parenttype": "Email Provider"},
+        fields=["name", "daily_count", "hourly_count"]
     )
-
-def reset_hourly_counters():
-    """
-    Reset hourly counters for all email accounts
-    This function is called hourly via scheduler
-    """
-    providers = frappe.get_all("Email Provider")
     
-    for provider_data in providers:
-        provider = frappe.get_doc("Email Provider", provider_data.name)
-        provider.reset_hourly_counters()
-        
+    usage = get_rate_limiter().get_account_usage([account.name for account in accounts])
+    
+    # Only write accounts whose usage changed
+    for account in accounts:
+        hourly_count, daily_count = usage[account.name]
+        if (hourly_count, daily_count) != (account.hourly_count, account.daily_count):
+            frappe.db.sql("""
+                update `tabEmail Account`
+                set hourly_count = %(hourly_count)s, daily_count = %(daily_count)s
+                where name = %(account)s
+            """, {"hourly_count": hourly_count, "daily_count": daily_count, "account": account.name})
+    
     frappe.db.commit()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+
+DEFAULT_WEIGHT = 1.0
+
+# Queue name for emails that do not belong to a campaign
+NO_CAMPAIGN = ""
+
+def get_campaign_weights(campaigns):
+    """
+    Fair-share weight of each campaign
+    Weights come from outreach_campaign_weights in site_config.json, a dict of
+    campaign name -> weight; campaigns not listed get DEFAULT_WEIGHT
+    """
+    configured = frappe.conf.get("outreach_campaign_weights") or {}
+    weights = {}
+
+    for campaign in campaigns:
+        try:
+            weight = float(configured.get(campaign, DEFAULT_WEIGHT))
+        except (TypeError, ValueError):
+            weight = DEFAULT_WEIGHT
+
+        weights[campaign] = weight if weight > 0 else DEFAULT_WEIGHT
+
+    return weights
+
+class DeficitRoundRobin(object):
+    """
+    Deficit round robin over named queues
+    Every round each non-empty queue earns its weight in credit and is served
+    while it has at least one unit, so over time each queue gets a share of the
+    items proportional to its weight, and queues that run dry give their share to
+    the others
+    """
+
+    def __init__(self, queues, weights=None):
+        self.queues = {name: list(items) for name, items in queues.items() if items}
+        self.weights = weights or {}
+        self.deficits = {name: 0.0 for name in self.queues}
+        self.positions = {name: 0 for name in self.queues}
+
+    def take(self, count=None):
+        """
+        Items in fair order, at most count of them
+        Returns a list of (queue name, item)
+        """
+        taken = []
+        active = [name for name in self.queues if self.positions[name] < len(self.queues[name])]
+
+        while active and (count is None or len(taken) < count):
+            still_active = []
+
+            for name in active:
+                items = self.queues[name]
+                self.deficits[name] += self.weights.get(name, DEFAULT_WEIGHT)
+
+                while self.deficits[name] >= 1 and self.positions[name] < len(items):
+                    if count is not None and len(taken) >= count:
+                        break
+
+                    taken.append((name, items[self.positions[name]]))
+                    self.positions[name] += 1
+                    self.deficits[name] -= 1
+
+                if self.positions[name] < len(items):
+                    still_active.append(name)
+                else:
+                    # An emptied queue does not keep its credit
+                    self.deficits[name] = 0.0
+
+            active = still_active
+
+        return taken
+
+def fair_shares(demands, total, weights=None):
+    """
+    Split total units of capacity across queues by weight
+    demands is a dict of queue name -> units wanted; no queue gets more than it wants
+    Returns a dict of queue name -> units granted
+    """
+    shares = {name: 0 for name in demands}
+    queues = {name: range(demand) for name, demand in demands.items() if demand > 0}
+
+    for name, unit in DeficitRoundRobin(queues, weights).take(total):
+        shares[name] += 1
+
+    return shares
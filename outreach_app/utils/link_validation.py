@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+
+def get_link_cache():
+    """
+    Names known to exist, per doctype, for the current request or background job
+    Lives on frappe.local, so it is dropped when the request or job ends;
+    long-running loops (the dispatcher, distribution workers) clear it with
+    clear_link_cache at each refill or chunk so deleted records are noticed
+    """
+    if not getattr(frappe.local, "outreach_link_cache", None):
+        frappe.local.outreach_link_cache = {}
+
+    return frappe.local.outreach_link_cache
+
+def link_exists(doctype, name):
+    """frappe.db.exists for a single name, remembered for the rest of the job"""
+    known = get_link_cache().setdefault(doctype, set())
+
+    if name in known:
+        return True
+
+    if frappe.db.exists(doctype, name):
+        known.add(name)
+        return True
+
+    # Missing names are not cached, so a record created later in the job is found
+    return False
+
+def prime_links(doctype, names):
+    """
+    Check many names of one doctype with a single query and cache those that exist
+    Returns the set of names that do not exist
+    """
+    known = get_link_cache().setdefault(doctype, set())
+    names = {name for name in names if name} - known
+
+    if not names:
+        return set()
+
+    existing = set(frappe.get_all(doctype, filters={"name": ["in", list(names)]}, pluck="name"))
+    known.update(existing)
+
+    return names - existing
+
+def mark_existing(doctype, names):
+    """Record names already loaded from the database as existing, without a query"""
+    get_link_cache().setdefault(doctype, set()).update(name for name in names if name)
+
+def validate_links(doc, link_fields):
+    """
+    Throw if any set link field of doc points at a missing record
+    link_fields is a dict of fieldname -> linked doctype; doc can be a document or a dict
+    """
+    for fieldname, doctype in link_fields.items():
+        value = doc.get(fieldname)
+
+        if value and not link_exists(doctype, value):
+            frappe.throw(f"{doctype} {value} does not exist")
+
+def validate_links_bulk(rows, link_fields):
+    """validate_links for many rows, with one query per linked doctype"""
+    for fieldname, doctype in link_fields.items():
+        missing = prime_links(doctype, {row.get(fieldname) for row in rows})
+
+        if missing:
+            frappe.throw(f"{doctype} {sorted(missing)[0]} does not exist")
+
+def clear_link_cache():
+    """Forget every cached name, e.g. at the start of each unit of work in a long-running process"""
+    frappe.local.outreach_link_cache = {}
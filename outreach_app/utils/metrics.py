@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import time
+from frappe.utils import now_datetime, get_datetime, cint
+from outreach_app.outreach_app.utils.rate_limiter import MINUTE, HOUR, DAY, get_rate_limiter
+
+# Defaults, overridable from site_config.json
+DEFAULT_METRICS_CACHE_TTL = 30
+
+PENDING_STATUSES = ("Queued", "Scheduled", "Dispatching", "Sending")
+
+QUEUE_CACHE_KEY = "outreach:metrics:queue"
+LIMITS_CACHE_KEY = "outreach:metrics:limits"
+
+def get_cache_ttl():
+    return cint(frappe.conf.get("outreach_metrics_cache_ttl")) or DEFAULT_METRICS_CACHE_TTL
+
+def get_queue_stats():
+    """
+    Pending email counts by (status, priority, provider) and the scheduled time of
+    the oldest due email
+    Read with two aggregate queries at most once per cache TTL, however often
+    metrics are scraped
+    """
+    stats = frappe.cache().get_value(QUEUE_CACHE_KEY)
+    if stats is not None:
+        return stats
+
+    depth = frappe.db.sql("""
+        select status, priority, ifnull(email_provider, '') as email_provider, count(*) as count
+        from `tabEmail Queue`
+        where status in %(statuses)s
+        group by status, priority, email_provider
+    """, {"statuses": PENDING_STATUSES}, as_dict=True)
+
+    oldest_due = frappe.db.sql("""
+        select min(scheduled_time) from `tabEmail Queue`
+        where status in ('Queued', 'Scheduled') and scheduled_time <= %(now)s
+    """, {"now": now_datetime()})[0][0]
+
+    stats = {
+        "depth": [[row.status, row.priority or "", row.email_provider, row.count] for row in depth],
+        "oldest_due": str(oldest_due) if oldest_due else None
+    }
+    frappe.cache().set_value(QUEUE_CACHE_KEY, stats, expires_in_sec=get_cache_ttl())
+
+    return stats
+
+def get_limits():
+    """
+    Hourly and daily limits of active providers and their active accounts, cached
+    like the queue stats
+    """
+    limits = frappe.cache().get_value(LIMITS_CACHE_KEY)
+    if limits is not None:
+        return limits
+
+    providers = frappe.get_all(
+        "Email Provider",
+        filters={"is_active": 1},
+        fields=["name", "hourly_email_limit", "daily_email_limit"]
+    )
+
+    accounts = frappe.get_all(
+        "Email Account",
+        filters={
+            "parent": ["in", [provider.name for provider in providers] or [""]],
+            "parenttype": "Email Provider",
+            "is_active": 1
+        },
+        fields=["name", "email", "parent", "hourly_limit", "daily_limit"]
+    )
+
+    limits = {
+        "providers": [[row.name, row.hourly_email_limit or 0, row.daily_email_limit or 0] for row in providers],
+        "accounts": [[row.name, row.email, row.parent, row.hourly_limit or 0, row.daily_limit or 0] for row in accounts]
+    }
+    frappe.cache().set_value(LIMITS_CACHE_KEY, limits, expires_in_sec=get_cache_ttl())
+
+    return limits
+
+def collect_metrics():
+    """
+    Current metrics as a list of (name, type, help, samples), samples being
+    (labels dict, value) pairs
+    Queue figures come from the cached aggregates; send rates and remaining
+    capacity come from the rate limiter's counters, one Redis round trip
+    """
+    queue = get_queue_stats()
+    limits = get_limits()
+
+    account_usage, provider_usage = get_rate_limiter().get_usage(
+        [row[0] for row in limits["accounts"]],
+        [row[0] for row in limits["providers"]],
+        (MINUTE, HOUR, DAY)
+    )
+
+    backlog_age = 0.0
+    if queue["oldest_due"]:
+        backlog_age = max(0.0, (now_datetime() - get_datetime(queue["oldest_due"])).total_seconds())
+
+    sends_per_minute = []
+    account_remaining = []
+    for name, email, provider, hourly_limit, daily_limit in limits["accounts"]:
+        minute_count, hourly_count, daily_count = account_usage[name]
+        labels = {"account": name, "email": email, "provider": provider}
+
+        sends_per_minute.append((labels, minute_count))
+        account_remaining.append((dict(labels, window="hour"), max(0, hourly_limit - hourly_count)))
+        account_remaining.append((dict(labels, window="day"), max(0, daily_limit - daily_count)))
+
+    provider_sends_per_minute = []
+    provider_remaining = []
+    for name, hourly_limit, daily_limit in limits["providers"]:
+        minute_count, hourly_count, daily_count = provider_usage[name]
+        labels = {"provider": name}
+
+        provider_sends_per_minute.append((labels, minute_count))
+        provider_remaining.append((dict(labels, window="hour"), max(0, hourly_limit - hourly_count)))
+        provider_remaining.append((dict(labels, window="day"), max(0, daily_limit - daily_count)))
+
+    return [
+        ("outreach_queue_depth", "gauge", "Pending emails by status, priority and provider", [
+            ({"status": status, "priority": priority, "provider": provider}, count)
+            for status, priority, provider, count in queue["depth"]
+        ]),
+        ("outreach_backlog_age_seconds", "gauge", "Seconds the oldest due but unsent email has been waiting", [
+            ({}, backlog_age)
+        ]),
+        ("outreach_account_sends_per_minute", "gauge", "Emails sent by an account in the last 60 seconds",
+            sends_per_minute),
+        ("outreach_provider_sends_per_minute", "gauge", "Emails sent through a provider in the last 60 seconds",
+            provider_sends_per_minute),
+        ("outreach_account_remaining_capacity", "gauge", "Sends left before an account's rolling hourly or daily limit",
+            account_remaining),
+        ("outreach_provider_remaining_capacity", "gauge", "Sends left before a provider's rolling hourly or daily limit",
+            provider_remaining),
+        ("outreach_metrics_timestamp_seconds", "gauge", "Unix time the metrics were collected", [
+            ({}, time.time())
+        ])
+    ]
+
+def format_prometheus(metrics):
+    """Render collected metrics in the Prometheus text exposition format"""
+    lines = []
+
+    for name, metric_type, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{escape_label(label)}"' for key, label in sorted(labels.items()))
+            lines.append(f"{name}{{{label_text}}} {format_value(value)}" if label_text else f"{name} {format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_value(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+
+    return str(int(value))
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import base64
+import hashlib
+import mimetypes
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from email.mime.base import MIMEBase
+
+# Defaults, overridable from site_config.json
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Bytes read per step; a multiple of 57 so every step encodes to whole 76-character lines
+READ_CHUNK_SIZE = 57 * 16 * 1024
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+class EncodedAttachment(object):
+    """A file's base64 body, encoded once and shared by every message that attaches it"""
+
+    __slots__ = ("digest", "content_type", "encoded")
+
+    def __init__(self, digest, content_type, encoded):
+        self.digest = digest
+        self.content_type = content_type
+        self.encoded = encoded
+
+    @property
+    def size(self):
+        return len(self.encoded)
+
+    def to_mime(self, filename):
+        """A new MIME part around the shared encoded body; nothing is re-encoded"""
+        maintype, subtype = self.content_type.split("/", 1)
+        part = MIMEBase(maintype, subtype)
+        part.set_payload(self.encoded)
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=filename)
+
+        return part
+
+class MIMEPartCache(object):
+    """
+    LRU cache of encoded attachments keyed by content hash, bounded by total size
+    File paths are mapped to their hash by (size, mtime), so a file is hashed
+    again only when it changes, and identical files at different paths share
+    one encoded body
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._parts = OrderedDict()
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, content_type=None):
+        """
+        Get the encoded attachment for a file
+        Returns None if the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            known = self._digests.get(path)
+            if known and known[0] == stat_key and known[1] in self._parts:
+                self._parts.move_to_end(known[1])
+                return self._parts[known[1]]
+
+        digest = hash_file(path, stat.st_size)
+
+        with self._lock:
+            self._digests[path] = (stat_key, digest)
+            part = self._parts.get(digest)
+            if part:
+                self._parts.move_to_end(digest)
+                return part
+
+        part = EncodedAttachment(digest, content_type or guess_content_type(path), encode_file(path, stat.st_size))
+
+        with self._lock:
+            self._parts[digest] = part
+            self.total_bytes += part.size
+
+            # Keep at least the part just added, even if it alone is over the limit
+            while self.total_bytes > self.max_bytes and len(self._parts) > 1:
+                digest, evicted = self._parts.popitem(last=False)
+                self.total_bytes -= evicted.size
+
+        return part
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self._digests.clear()
+            self.total_bytes = 0
+
+def read_chunks(path, size):
+    """Yield the file's content in READ_CHUNK_SIZE pieces through a read-only memory map"""
+    if not size:
+        return
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, len(mapped), READ_CHUNK_SIZE):
+                yield mapped[offset:offset + READ_CHUNK_SIZE]
+
+def hash_file(path, size):
+    digest = hashlib.sha256()
+    for chunk in read_chunks(path, size):
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+def encode_file(path, size):
+    """Base64 in 76-character lines, encoded chunk by chunk"""
+    return "".join(base64.encodebytes(chunk).decode("ascii") for chunk in read_chunks(path, size))
+
+def guess_content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+
+    if not content_type or encoding:
+        return "application/octet-stream"
+
+    return content_type
+
+def resolve_attachment_path(file_path):
+    """Filesystem path of an attachment, accepting site file URLs such as /private/files/x.pdf"""
+    if not file_path or os.path.isabs(file_path) and os.path.exists(file_path):
+        return file_path
+
+    relative = file_path.lstrip("/")
+    if relative.startswith("files/"):
+        relative = os.path.join("public", relative)
+
+    return frappe.get_site_path(relative)
+
+def get_mime_cache():
+    """Get this process's MIME part cache for the current site"""
+    site = frappe.local.site
+    cache = _caches.get(site)
+
+    if cache is None:
+        with _cache_lock:
+            cache = _caches.get(site)
+            if cache is None:
+                cache = _caches[site] = MIMEPartCache(
+                    (frappe.conf or {}).get("outreach_mime_cache_bytes", DEFAULT_CACHE_BYTES)
+                )
+
+    return cache
+
+def get_attachment_parts(attachments):
+    """
+    MIME parts for a list of {"fname", "fpath"} attachments
+    Missing files are skipped
+    """
+    cache = get_mime_cache()
+    parts = []
+
+    for attachment in attachments or []:
+        encoded = cache.get(resolve_attachment_path(attachment.get("fpath")))
+        if encoded:
+            parts.append(encoded.to_mime(attachment.get("fname") or os.path.basename(attachment.get("fpath"))))
+
+    return parts
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import cint
+
+def get_series_db():
+    """
+    A second connection to the site database, used only to advance naming series
+    Opened with the same settings as frappe.connect; the caller closes it
+    """
+    from frappe.database import get_db
+
+    conf = frappe.conf
+
+    return get_db(
+        socket=conf.db_socket,
+        host=conf.db_host,
+        port=conf.db_port,
+        user=conf.db_user or conf.db_name,
+        password=conf.db_password,
+        cur_db_name=conf.db_name
+    )
+
+def reserve_series(counts):
+    """
+    Advance naming series and return the last value each had before
+    counts is a dict of series prefix -> number of names to reserve. Missing series
+    rows are created with insert ignore (on conflict do nothing on Postgres), so
+    concurrent callers never collide, and the reservation is committed right away
+    on a connection of its own, closed once done: the row lock is held for a few
+    statements rather than until the caller's transaction ends, so workers
+    inserting in parallel do not serialize on it. Names reserved by a transaction
+    that later rolls back are skipped, as with auto increment keys.
+    Returns a dict of prefix -> previous current value
+    """
+    if not counts:
+        return {}
+
+    db = get_series_db()
+
+    try:
+        values = ", ".join(["(%s, 0)"] * len(counts))
+        if frappe.conf.db_type == "postgres":
+            db.sql(f"insert into `tabSeries` (`name`, `current`) values {values} on conflict (`name`) do nothing",
+                tuple(counts))
+        else:
+            db.sql(f"insert ignore into `tabSeries` (`name`, `current`) values {values}", tuple(counts))
+
+        by_count = {}
+        for prefix, count in counts.items():
+            by_count.setdefault(cint(count), []).append(prefix)
+
+        for count, prefixes in by_count.items():
+            db.sql("update `tabSeries` set `current` = `current` + %(count)s where `name` in %(prefixes)s",
+                {"count": count, "prefixes": tuple(prefixes)})
+
+        current = dict(db.sql("select `name`, `current` from `tabSeries` where `name` in %(prefixes)s",
+            {"prefixes": tuple(counts)}))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    return {prefix: cint(current[prefix]) - cint(count) for prefix, count in counts.items()}
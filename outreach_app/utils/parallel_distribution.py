@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def split_work(shares, workers):
+    """
+    Split each campaign's share into one part per worker
+    Returns a list with one list of (campaign, limit) per worker
+    """
+    work = [[] for i in range(workers)]
+
+    for campaign, share in shares.items():
+        for i in range(workers):
+            part = share // workers + (1 if i < share % workers else 0)
+            if part:
+                work[i].append((campaign, part))
+
+    return [items for items in work if items]
+
+def distribute_in_parallel(site, shares, workers, chunk_size=None):
+    """
+    Distribute emails for several campaigns with worker processes
+    shares is a dict of campaign name -> number of campaign contacts to queue.
+    Every worker connects to the site on its own and claims disjoint chunks of
+    due contacts (SELECT ... FOR UPDATE SKIP LOCKED), committing each chunk, so
+    workers never wait on or double-queue each other's contacts
+    Returns a dict of campaign name -> number of emails queued
+    """
+    work = split_work(shares, max(1, workers))
+    counts = {campaign: 0 for campaign in shares}
+
+    if not work:
+        return counts
+
+    sites_path = frappe.local.sites_path
+
+    # Spawned workers start without the parent's database connection
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(work), mp_context=context) as executor:
+        futures = [
+            executor.submit(distribute_worker, site, sites_path, items, chunk_size)
+            for items in work
+        ]
+
+        for future in futures:
+            for campaign, count in future.result().items():
+                counts[campaign] += count
+
+    return counts
+
+def distribute_worker(site, sites_path, items, chunk_size=None):
+    """Worker process: distribute (campaign, limit) items for one site"""
+    from outreach_app.outreach_app.utils.email_distribution import distribute_emails_for_campaign
+
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+
+    try:
+        counts = {}
+        for campaign, limit in items:
+            counts[campaign] = distribute_emails_for_campaign(campaign, limit, chunk_size)
+            frappe.db.commit()
+
+        return counts
+    finally:
+        frappe.destroy()
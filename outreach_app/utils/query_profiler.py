@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import functools
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from frappe.utils import cint
+
+DEFAULT_TOP_STATEMENTS = 10
+
+# Statements kept per entry point in the saved profiles
+SAVED_STATEMENTS = 20
+
+PROFILES_CACHE_KEY = "outreach:query_profiles"
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+VALUE_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+class QueryProfile(object):
+    """Query count, database time and repeated statements of one profiled block"""
+
+    def __init__(self, name=None):
+        self.name = name
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.items = None
+
+    def record(self, query, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        self.statements[normalize_query(query)] += 1
+
+    @property
+    def queries_per_item(self):
+        if not self.items:
+            return None
+
+        return float(self.queries) / self.items
+
+    def top(self, count=DEFAULT_TOP_STATEMENTS):
+        """The most often run statements as (statement, count) pairs"""
+        return self.statements.most_common(count)
+
+    def report(self, count=DEFAULT_TOP_STATEMENTS):
+        lines = [f"{self.name or 'Profile'}: {self.queries} queries, {self.db_time * 1000:.1f} ms in the database"]
+
+        if self.items:
+            lines[0] += f", {self.queries_per_item:.2f} per item over {self.items} items"
+
+        for statement, statement_count in self.top(count):
+            lines.append(f"  {statement_count:>6}x  {statement[:200]}")
+
+        return "\n".join(lines)
+
+def normalize_query(query):
+    """Statement with literals and value lists replaced, so repeats of one query group together"""
+    query = STRING_LITERAL.sub("?", str(query))
+    query = NUMBER_LITERAL.sub("?", query)
+    query = VALUE_LIST.sub("(...)", query)
+
+    return WHITESPACE.sub(" ", query).strip()
+
+@contextmanager
+def profile_queries(name=None):
+    """
+    Record every frappe.db.sql call made inside the block, including those made by
+    get_all, get_value and get_doc
+    Blocks can be nested; each profile records the queries run while it is open
+    """
+    db = frappe.db
+    profile = QueryProfile(name)
+    active = getattr(db, "_outreach_query_profiles", None)
+
+    if active is None:
+        active = db._outreach_query_profiles = []
+        original = db.sql
+
+        def sql(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                query = args[0] if args else kwargs.get("query", "")
+                for open_profile in active:
+                    open_profile.record(query, elapsed)
+
+        db.sql = sql
+        db._outreach_original_sql = original
+
+    active.append(profile)
+
+    try:
+        yield profile
+    finally:
+        active.remove(profile)
+
+        if not active:
+            db.sql = db._outreach_original_sql
+            del db._outreach_original_sql
+            del db._outreach_query_profiles
+
+def is_profiling_enabled():
+    return bool(frappe.flags.outreach_profile_queries or cint(frappe.conf.get("outreach_query_profiling")))
+
+def profiled(name=None):
+    """
+    Profile the queries of an entry point when query profiling is enabled
+    (outreach_query_profiling in site_config.json, or frappe.flags.outreach_profile_queries),
+    adding each call to the saved profile of the entry point. If the entry point
+    returns a count, it is used as the number of items processed. When profiling
+    is off the call goes straight through.
+    """
+    def decorator(fn):
+        entry_point = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not is_profiling_enabled() or not frappe.db:
+                return fn(*args, **kwargs)
+
+            with profile_queries(entry_point) as profile:
+                try:
+                    result = fn(*args, **kwargs)
+                    if isinstance(result, int) and not isinstance(result, bool):
+                        profile.items = result
+
+                    return result
+                finally:
+                    save_profile(profile)
+
+        return wrapper
+
+    return decorator
+
+def save_profile(profile):
+    """Add a profile to the totals of its entry point, kept in the cache"""
+    saved = frappe.cache().hget(PROFILES_CACHE_KEY, profile.name) or {}
+    statements = Counter(dict(saved.get("statements") or []))
+    statements.update(profile.statements)
+
+    frappe.cache().hset(PROFILES_CACHE_KEY, profile.name, {
+        "calls": saved.get("calls", 0) + 1,
+        "queries": saved.get("queries", 0) + profile.queries,
+        "db_time": saved.get("db_time", 0.0) + profile.db_time,
+        "items": saved.get("items", 0) + (profile.items or 0),
+        "max_queries": max(saved.get("max_queries", 0), profile.queries),
+        "statements": statements.most_common(SAVED_STATEMENTS)
+    })
+
+def get_query_profiles():
+    """
+    Saved profile totals per entry point
+
+    bench --site <site> execute outreach_app.outreach_app.utils.query_profiler.get_query_profiles
+    """
+    return frappe.cache().hgetall(PROFILES_CACHE_KEY) or {}
+
+def clear_query_profiles():
+    frappe.cache().delete_value(PROFILES_CACHE_KEY)
+
+@contextmanager
+def assert_query_budget(max_queries=None, per_item=None, name=None):
+    """
+    Fail with AssertionError if the block runs more queries than its budget
+    per_item budgets are checked against profile.items, which the block sets:
+
+        with assert_query_budget(per_item=3) as profile:
+            profile.items = distribute_emails_for_campaign(campaign, 100)
+
+    The error lists the most repeated statements, which is usually where an
+    N+1 pattern shows up
+    """
+    with profile_queries(name) as profile:
+        yield profile
+
+    problems = []
+
+    if max_queries is not None and profile.queries > max_queries:
+        problems.append(f"{profile.queries} queries, budget {max_queries}")
+
+    if per_item is not None:
+        if profile.items is None:
+            raise AssertionError("Set profile.items to check a per-item query budget")
+
+        if profile.queries > per_item * max(1, profile.items):
+            problems.append(f"{profile.queries} queries for {profile.items} items, budget {per_item} per item")
+
+    if problems:
+        raise AssertionError("Query budget exceeded: " + "; ".join(problems) + "\n" + profile.report())
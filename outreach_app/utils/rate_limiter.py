@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import bisect
+import threading
+import time
+import uuid
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# Send events are kept for the longest window plus a margin
+EVENT_TTL = DAY + 60
+
+_memory_store = None
+
+# KEYS: one sorted set of send events per account/provider
+# ARGV: now, member, ttl, then per key: number of windows followed by (window, limit) pairs
+# Returns {1, count per window of the first key...} when the send was recorded, {0} otherwise
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local ttl = tonumber(ARGV[3])
+local pos = 4
+local counts = {}
+for i, key in ipairs(KEYS) do
+    local windows = tonumber(ARGV[pos])
+    pos = pos + 1
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - ttl)
+    for j = 1, windows do
+        local window = tonumber(ARGV[pos])
+        local limit = tonumber(ARGV[pos + 1])
+        pos = pos + 2
+        local count = redis.call('ZCOUNT', key, '(' .. (now - window), '+inf')
+        if limit >= 0 and count >= limit then
+            return {0}
+        end
+        if i == 1 then
+            table.insert(counts, count + 1)
+        end
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, member)
+    redis.call('EXPIRE', key, ttl)
+end
+table.insert(counts, 1, 1)
+return counts
+"""
+
+class SendToken(object):
+    """A recorded send, returned by acquire so it can be released if the send fails"""
+
+    def __init__(self, keys, member, counts):
+        self.keys = keys
+        self.member = member
+        self.counts = counts
+
+class RedisWindowStore(object):
+    """Send events in Redis sorted sets, shared by all workers of the site"""
+
+    def __init__(self, cache=None):
+        self.cache = cache or frappe.cache()
+        self._acquire = self.cache.register_script(ACQUIRE_SCRIPT)
+
+    def acquire(self, checks, member, now):
+        keys = [self.cache.make_key(key) for key, windows in checks]
+        args = [now, member, EVENT_TTL]
+        for key, windows in checks:
+            args.append(len(windows))
+            for window, limit in windows:
+                args.extend([window, -1 if limit is None else limit])
+
+        result = self._acquire(keys=keys, args=args)
+        if not result or not int(result[0]):
+            return None
+
+        return [int(count) for count in result[1:]]
+
+    def release(self, keys, member):
+        pipeline = self.cache.pipeline()
+        for key in keys:
+            pipeline.zrem(self.cache.make_key(key), member)
+        pipeline.execute()
+
+    def count(self, keys, windows, now):
+        pipeline = self.cache.pipeline()
+        for key in keys:
+            for window in windows:
+                pipeline.zcount(self.cache.make_key(key), "({0}".format(now - window), "+inf")
+
+        results = pipeline.execute()
+        counts = {}
+        for i, key in enumerate(keys):
+            counts[key] = [int(count) for count in results[i * len(windows):(i + 1) * len(windows)]]
+
+        return counts
+
+class InMemoryWindowStore(object):
+    """In-process stand-in for RedisWindowStore, for tests and single-process use"""
+
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, checks, member, now):
+        with self._lock:
+            counts = None
+            for key, windows in checks:
+                events = self._prune(key, now)
+                key_counts = []
+                for window, limit in windows:
+                    count = len(events) - bisect.bisect_right(events, now - window, key=event_time)
+                    if limit is not None and count >= limit:
+                        return None
+                    key_counts.append(count + 1)
+
+                if counts is None:
+                    counts = key_counts
+
+            for key, windows in checks:
+                bisect.insort(self._events.setdefault(key, []), (now, member), key=event_time)
+
+            return counts or []
+
+    def release(self, keys, member):
+        with self._lock:
+            for key in keys:
+                events = self._events.get(key, [])
+                self._events[key] = [event for event in events if event[1] != member]
+
+    def count(self, keys, windows, now):
+        with self._lock:
+            counts = {}
+            for key in keys:
+                events = self._prune(key, now)
+                counts[key] = [
+                    len(events) - bisect.bisect_right(events, now - window, key=event_time)
+                    for window in windows
+                ]
+
+            return counts
+
+    def _prune(self, key, now):
+        events = self._events.get(key, [])
+        cutoff = bisect.bisect_right(events, now - EVENT_TTL, key=event_time)
+        if cutoff:
+            events = events[cutoff:]
+            self._events[key] = events
+
+        return events
+
+class SlidingWindowLimiter(object):
+    """
+    Rolling-window send limits per email account and per provider
+    Counts are "sends in the last 60 minutes / 24 hours", so there is no reset
+    boundary to burst across
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_window_store()
+
+    def try_acquire(self, account, account_limits, provider=None, provider_limits=None, now=None):
+        """
+        Record a send for an account (and its provider) if every window is under its limit
+        Limits are (hourly_limit, daily_limit) tuples; None means unlimited
+        Returns a SendToken, whose counts are the account's (hourly, daily) usage
+        including this send, or None if a limit has been reached
+        """
+        now = now or time.time()
+        checks = [(account_key(account), window_limits(account_limits))]
+        if provider:
+            checks.append((provider_key(provider), window_limits(provider_limits)))
+
+        member = uuid.uuid4().hex
+        counts = self.store.acquire(checks, member, now)
+        if counts is None:
+            return None
+
+        return SendToken([key for key, windows in checks], member, counts)
+
+    def release(self, token):
+        """Remove a recorded send, e.g. because the email could not be sent"""
+        if token:
+            self.store.release(token.keys, token.member)
+
+    def get_account_usage(self, accounts, now=None):
+        """Returns a dict of account name -> (sent last hour, sent last day)"""
+        return self._get_usage(accounts, account_key, now)
+
+    def get_provider_usage(self, providers, now=None):
+        """Returns a dict of provider name -> (sent last hour, sent last day)"""
+        return self._get_usage(providers, provider_key, now)
+
+    def get_usage(self, accounts=(), providers=(), windows=(HOUR, DAY), now=None):
+        """
+        Sends within each window for many accounts and providers in one round trip
+        Returns (account name -> counts, provider name -> counts), counts in the order of windows
+        """
+        accounts, providers = list(accounts), list(providers)
+        keys = [account_key(name) for name in accounts] + [provider_key(name) for name in providers]
+        if not keys:
+            return {}, {}
+
+        counts = self.store.count(keys, windows, now or time.time())
+        return (
+            {name: tuple(counts[account_key(name)]) for name in accounts},
+            {name: tuple(counts[provider_key(name)]) for name in providers}
+        )
+
+    def _get_usage(self, names, make_key, now):
+        names = list(names)
+        if not names:
+            return {}
+
+        counts = self.store.count([make_key(name) for name in names], (HOUR, DAY), now or time.time())
+        return {name: tuple(counts[make_key(name)]) for name in names}
+
+def event_time(event):
+    return event[0]
+
+def account_key(account):
+    return f"outreach:send_window:account:{account}"
+
+def provider_key(provider):
+    return f"outreach:send_window:provider:{provider}"
+
+def window_limits(limits):
+    hourly_limit, daily_limit = limits or (None, None)
+    return [(HOUR, hourly_limit), (DAY, daily_limit)]
+
+def get_window_store():
+    """Redis store by default; the in-process store in tests or when configured"""
+    global _memory_store
+
+    if frappe.flags.in_test or frappe.conf.get("outreach_rate_limiter_store") == "memory":
+        if _memory_store is None:
+            _memory_store = InMemoryWindowStore()
+
+        return _memory_store
+
+    return RedisWindowStore()
+
+def get_rate_limiter():
+    """Get a limiter bound to the site's window store"""
+    return SlidingWindowLimiter()
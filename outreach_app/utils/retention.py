@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import gzip
+import json
+import os
+import time
+from frappe.utils import now_datetime, add_to_date, cint
+
+# Defaults, overridable from site_config.json
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_RETENTION_CHUNK_SIZE = 1000
+DEFAULT_RETENTION_TIME_BUDGET = 600
+
+FINISHED_STATUSES = ("Sent", "Error", "Expired", "Cancelled")
+
+CURSOR_CACHE_KEY = "outreach:retention_cursor"
+
+def purge_old_emails(days=None, chunk_size=None, time_budget=None, archive=None):
+    """
+    Delete finished Email Queue rows older than days
+    Rows are read in chunks by keyset pagination on name and each chunk is
+    deleted, with its attachment rows, in its own transaction. When the time
+    budget runs out the position is kept in the cache and the next run resumes
+    from there. With archiving enabled (outreach_retention_archive) every chunk is
+    appended to a gzipped JSONL file under private/outreach_archive before it is
+    deleted.
+    Returns the number of rows deleted
+    """
+    conf = frappe.conf or {}
+    days = days or cint(conf.get("outreach_retention_days")) or DEFAULT_RETENTION_DAYS
+    chunk_size = chunk_size or cint(conf.get("outreach_retention_chunk_size")) or DEFAULT_RETENTION_CHUNK_SIZE
+    time_budget = time_budget or cint(conf.get("outreach_retention_time_budget")) or DEFAULT_RETENTION_TIME_BUDGET
+    if archive is None:
+        archive = cint(conf.get("outreach_retention_archive"))
+
+    cutoff = add_to_date(now_datetime(), days=-days)
+    after = frappe.cache().get_value(CURSOR_CACHE_KEY) or ""
+    start = time.monotonic()
+    deleted = 0
+
+    while True:
+        if time_budget and time.monotonic() - start >= time_budget:
+            # Resume after the last deleted row next time
+            frappe.cache().set_value(CURSOR_CACHE_KEY, after)
+            return deleted
+
+        names = frappe.db.sql_list("""
+            select name from `tabEmail Queue`
+            where name > %(after)s and status in %(statuses)s and modified < %(cutoff)s
+            order by name asc
+            limit %(limit)s
+        """, {"after": after, "statuses": FINISHED_STATUSES, "cutoff": cutoff, "limit": chunk_size})
+
+        if not names:
+            # Pass complete; the next run starts from the beginning
+            frappe.cache().delete_value(CURSOR_CACHE_KEY)
+            return deleted
+
+        if archive:
+            archive_emails(names)
+
+        frappe.db.sql("""
+            delete from `tabEmail Queue Attachment`
+            where parenttype = 'Email Queue' and parent in %(names)s
+        """, {"names": tuple(names)})
+        frappe.db.sql("delete from `tabEmail Queue` where name in %(names)s", {"names": tuple(names)})
+        frappe.db.commit()
+
+        deleted += len(names)
+        after = names[-1]
+
+def archive_emails(names):
+    """
+    Append Email Queue rows and their attachment rows to today's archive file
+    The file is flushed to disk before returning, so rows are only deleted once
+    they are archived
+    """
+    emails = frappe.db.sql("select * from `tabEmail Queue` where name in %(names)s order by name asc",
+        {"names": tuple(names)}, as_dict=True)
+
+    attachments = {}
+    for attachment in frappe.db.sql("""
+        select * from `tabEmail Queue Attachment`
+        where parenttype = 'Email Queue' and parent in %(names)s
+        order by parent, idx
+    """, {"names": tuple(names)}, as_dict=True):
+        attachments.setdefault(attachment.parent, []).append(attachment)
+
+    path = get_archive_path()
+
+    # Each append adds a gzip member; gzip readers treat the members as one stream
+    with gzip.open(path, "at", encoding="utf-8") as archive_file:
+        for email in emails:
+            email["attachments"] = attachments.get(email.name, [])
+            archive_file.write(json.dumps(email, default=str))
+            archive_file.write("\n")
+
+        archive_file.flush()
+        os.fsync(archive_file.fileno())
+
+    return path
+
+def get_archive_path():
+    """Path of today's archive file, creating the archive folder if needed"""
+    folder = frappe.get_site_path("private", "outreach_archive")
+    os.makedirs(folder, exist_ok=True)
+
+    return os.path.join(folder, f"email_queue-{now_datetime().strftime('%Y%m%d')}.jsonl.gz")
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import datetime
+import json
+import random
+import threading
+from frappe.utils import now_datetime
+from outreach_app.outreach_app.utils.rate_limiter import HOUR, DAY, get_rate_limiter
+
+# Small random delay added to every provider gap so sends do not land on exact intervals
+NATURAL_DELAY = (5, 30)
+
+# Used when no provider interval settings are available
+DEFAULT_MIN_INTERVAL = 60
+DEFAULT_MAX_INTERVAL = 300
+
+# Attempts to write the cursors back before the last computed allocation is written as is
+MAX_ALLOCATE_ATTEMPTS = 5
+
+SLOTS_CACHE_KEY = "outreach:send_slots"
+
+_memory_store = None
+
+# KEYS[1]: hash of cursors
+# ARGV: number of fields n, then n fields, n expected values and n new values
+# Sets every field and returns 1 only if none changed since they were read
+COMPARE_AND_SET_SCRIPT = """
+local n = tonumber(ARGV[1])
+for i = 1, n do
+    local current = redis.call('HGET', KEYS[1], ARGV[1 + i]) or ''
+    if current ~= ARGV[1 + n + i] then
+        return 0
+    end
+end
+for i = 1, n do
+    redis.call('HSET', KEYS[1], ARGV[1 + i], ARGV[1 + 2 * n + i])
+end
+return 1
+"""
+
+class SlotCursor(object):
+    """
+    Last slot handed out for one account or provider, and the sends counted in
+    its current hourly and daily blocks
+    Times are POSIX timestamps
+    """
+
+    __slots__ = ("last", "hour_start", "hour_used", "day_start", "day_used")
+
+    def __init__(self, last=0, hour_start=0, hour_used=0, day_start=0, day_used=0):
+        self.last = last
+        self.hour_start = hour_start
+        self.hour_used = hour_used
+        self.day_start = day_start
+        self.day_used = day_used
+
+    @classmethod
+    def loads(cls, value):
+        if not value:
+            return cls()
+
+        return cls(*json.loads(value))
+
+    def dumps(self):
+        return json.dumps([self.last, self.hour_start, self.hour_used, self.day_start, self.day_used])
+
+    def open_blocks(self, now, hourly_count, daily_count):
+        """
+        Start new hourly/daily blocks at now if the stored ones have ended,
+        counting the sends the rate limiter has already recorded
+        """
+        if now >= self.hour_start + HOUR:
+            self.hour_start, self.hour_used = now, hourly_count
+
+        if now >= self.day_start + DAY:
+            self.day_start, self.day_used = now, daily_count
+
+    def fit(self, t, hourly_limit, daily_limit):
+        """
+        Earliest time at or after t with room in both blocks
+        Returns None if a limit leaves no room at all
+        """
+        if (hourly_limit is not None and hourly_limit <= 0) or (daily_limit is not None and daily_limit <= 0):
+            return None
+
+        while True:
+            if t >= self.day_start + DAY:
+                self.day_start, self.day_used = t, 0
+
+            if t >= self.hour_start + HOUR:
+                self.hour_start, self.hour_used = t, 0
+
+            if daily_limit is not None and self.day_used >= daily_limit:
+                t = self.day_start + DAY
+            elif hourly_limit is not None and self.hour_used >= hourly_limit:
+                t = self.hour_start + HOUR
+            else:
+                return t
+
+    def take(self, t):
+        self.last = t
+        self.hour_used += 1
+        self.day_used += 1
+
+class RedisSlotStore(object):
+    """
+    Cursors in one Redis hash, shared by all workers of the site
+    The key is resolved once, so the store can be used from threads without a site context
+    """
+
+    def __init__(self, cache=None, key=SLOTS_CACHE_KEY):
+        self.cache = cache or frappe.cache()
+        self.key = self.cache.make_key(key)
+        self._compare_and_set = self.cache.register_script(COMPARE_AND_SET_SCRIPT)
+
+    def get(self, fields):
+        values = self.cache.hmget(self.key, fields) if fields else []
+        return {field: frappe.safe_decode(value) if value else "" for field, value in zip(fields, values)}
+
+    def compare_and_set(self, expected, values):
+        fields = list(values)
+        args = [len(fields)] + fields + [expected[field] for field in fields] + [values[field] for field in fields]
+        return bool(int(self._compare_and_set(keys=[self.key], args=args)))
+
+class InMemorySlotStore(object):
+    """In-process stand-in for RedisSlotStore, for tests and single-process use"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, fields):
+        with self._lock:
+            return {field: self._values.get(field, "") for field in fields}
+
+    def compare_and_set(self, expected, values):
+        with self._lock:
+            if any(self._values.get(field, "") != expected[field] for field in values):
+                return False
+
+            self._values.update(values)
+            return True
+
+class SendSlotCalendar(object):
+    """
+    Hands out send times per email account and provider
+    Slots of an account and of a provider are strictly increasing. Consecutive
+    slots of a provider are spaced by its interval settings (plus a small random
+    delay), and an account's slots are spread evenly over its hourly limit.
+    Hourly and daily blocks keep the slots within the remaining capacity; the rate
+    limiter still enforces the rolling windows when the emails are sent.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or get_slot_store()
+
+    def allocate(self, requests, now=None, natural=True):
+        """
+        Allocate one slot per request in a single call
+        requests is a list of (email_account, email_provider); either may be None
+        Set natural to add a small random delay to every provider gap
+        Returns a list of datetimes, None where no slot could be found (all None
+        when the cursors could not be updated)
+        """
+        if not requests:
+            return []
+
+        now = (now or now_datetime()).timestamp()
+        accounts = sorted({account for account, provider in requests if account})
+        providers = sorted({provider for account, provider in requests if provider})
+
+        settings = load_slot_settings(accounts, providers)
+        fields = [account_field(account) for account in accounts] + [provider_field(provider) for provider in providers]
+
+        for attempt in range(MAX_ALLOCATE_ATTEMPTS):
+            stored = self.store.get(fields)
+            cursors = {field: SlotCursor.loads(stored[field]) for field in fields}
+
+            for account in accounts:
+                hourly_count, daily_count = settings.account_usage[account]
+                cursors[account_field(account)].open_blocks(now, hourly_count, daily_count)
+
+            for provider in providers:
+                hourly_count, daily_count = settings.provider_usage[provider]
+                cursors[provider_field(provider)].open_blocks(now, hourly_count, daily_count)
+
+            slots = [
+                self._place(account, provider, cursors, settings, now, natural)
+                for account, provider in requests
+            ]
+
+            values = {field: cursors[field].dumps() for field in fields}
+            if self.store.compare_and_set(stored, values):
+                break
+        else:
+            # Other workers kept moving the cursors; slots that were never recorded could
+            # overlap theirs, so hand out none and let the caller fall back
+            frappe.log_error(
+                message=f"Send slot cursors changed during {MAX_ALLOCATE_ATTEMPTS} attempts, no slots allocated",
+                title="Send Slot Allocation"
+            )
+            return [None] * len(requests)
+
+        return [datetime.datetime.fromtimestamp(slot) if slot is not None else None for slot in slots]
+
+    def _place(self, account, provider, cursors, settings, now, natural):
+        account_cursor = cursors[account_field(account)] if account else None
+        provider_cursor = cursors[provider_field(provider)] if provider else None
+
+        t = now
+        if provider_cursor:
+            t = max(t, max(provider_cursor.last, now) + settings.provider_gap(provider, natural))
+
+        if account_cursor:
+            account_limits = settings.account_limits[account]
+            if account_cursor.last:
+                t = max(t, account_cursor.last + settings.account_gap(account))
+
+        # Move forward until both the account and the provider have room
+        while True:
+            start = t
+
+            if account_cursor:
+                t = account_cursor.fit(t, *account_limits)
+                if t is None:
+                    return None
+
+            if provider_cursor:
+                t = provider_cursor.fit(t, *settings.provider_limits[provider])
+                if t is None:
+                    return None
+
+            if t == start:
+                break
+
+        if account_cursor:
+            account_cursor.take(t)
+
+        if provider_cursor:
+            provider_cursor.take(t)
+
+        return t
+
+class SlotSettings(object):
+    """Limits, usage and interval settings of the accounts and providers of one allocation"""
+
+    def __init__(self, account_limits, account_usage, providers, provider_usage):
+        self.account_limits = account_limits
+        self.account_usage = account_usage
+        self.providers = providers
+        self.provider_usage = provider_usage
+        self.provider_limits = {
+            name: (provider.get("hourly_email_limit") or None, provider.get("daily_email_limit") or None)
+            for name, provider in providers.items()
+        }
+
+    def provider_gap(self, provider_name, natural=True):
+        provider = self.providers.get(provider_name)
+
+        if provider:
+            min_interval = provider.min_interval_seconds or 0
+            max_interval = max(provider.max_interval_seconds or 0, min_interval)
+            use_random = provider.enable_random_intervals
+        else:
+            min_interval, max_interval, use_random = DEFAULT_MIN_INTERVAL, DEFAULT_MAX_INTERVAL, True
+
+        gap = random.randint(min_interval, max_interval) if use_random else min_interval
+
+        if natural:
+            gap += random.randint(*NATURAL_DELAY)
+
+        return max(gap, 1)
+
+    def account_gap(self, account_name):
+        hourly_limit = self.account_limits[account_name][0]
+        return float(HOUR) / hourly_limit if hourly_limit else 1
+
+def load_slot_settings(accounts, providers):
+    """Load limits, usage and interval settings with two queries and two limiter round trips"""
+    account_limits = {account: (None, None) for account in accounts}
+    if accounts:
+        for row in frappe.get_all(
+            "Email Account",
+            filters={"name": ["in", accounts]},
+            fields=["name", "hourly_limit", "daily_limit"]
+        ):
+            account_limits[row.name] = (row.hourly_limit or 0, row.daily_limit or 0)
+
+    provider_rows = {}
+    if providers:
+        provider_rows = {
+            row.name: row
+            for row in frappe.get_all(
+                "Email Provider",
+                filters={"name": ["in", providers]},
+                fields=["name", "min_interval_seconds", "max_interval_seconds", "enable_random_intervals",
+                    "hourly_email_limit", "daily_email_limit"]
+            )
+        }
+
+    for provider in providers:
+        provider_rows.setdefault(provider, frappe._dict({
+            "name": provider,
+            "min_interval_seconds": DEFAULT_MIN_INTERVAL,
+            "max_interval_seconds": DEFAULT_MAX_INTERVAL,
+            "enable_random_intervals": 1
+        }))
+
+    limiter = get_rate_limiter()
+
+    return SlotSettings(
+        account_limits,
+        limiter.get_account_usage(accounts),
+        provider_rows,
+        limiter.get_provider_usage(providers)
+    )
+
+def account_field(account):
+    return f"account:{account}"
+
+def provider_field(provider):
+    return f"provider:{provider}"
+
+def get_slot_store():
+    """Redis store by default; the in-process store wherever the rate limiter uses one"""
+    global _memory_store
+
+    if frappe.flags.in_test or frappe.conf.get("outreach_rate_limiter_store") == "memory":
+        if _memory_store is None:
+            _memory_store = InMemorySlotStore()
+
+        return _memory_store
+
+    return RedisSlotStore()
+
+def get_send_slot_calendar():
+    """Get a calendar bound to the site's slot store"""
+    return SendSlotCalendar()
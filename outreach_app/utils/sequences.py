@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+from frappe.utils import now_datetime, add_to_date, cint
+
+SUCCESSORS_CACHE_KEY = "outreach_step_successors"
+
+def compile_sequence(steps):
+    """
+    Map each step of a sequence to the step after it
+    steps are Campaign Step rows in sequence order
+    Returns a dict of step name -> (next step name, next step delay_days), with
+    (None, 0) for the last step
+    """
+    successors = {}
+
+    for step, next_step in zip(steps, list(steps[1:]) + [None]):
+        if next_step:
+            successors[step.name] = (next_step.name, cint(next_step.delay_days))
+        else:
+            successors[step.name] = (None, 0)
+
+    return successors
+
+def get_step_successors(sequence):
+    """
+    Get the compiled step -> (next_step, delay_days) map of a Campaign Sequence
+    Compiled once and kept in the cache until the sequence is edited
+    """
+    if not sequence:
+        return {}
+
+    successors = frappe.cache().hget(SUCCESSORS_CACHE_KEY, sequence)
+    if successors is not None:
+        return successors
+
+    steps = frappe.get_all(
+        "Campaign Step",
+        filters={"parent": sequence, "parenttype": "Campaign Sequence"},
+        fields=["name", "delay_days"],
+        order_by="idx asc"
+    )
+
+    successors = compile_sequence(steps)
+    frappe.cache().hset(SUCCESSORS_CACHE_KEY, sequence, successors)
+
+    return successors
+
+def clear_step_successors(doc, method=None):
+    """Drop the compiled map of a Campaign Sequence when it is saved or deleted"""
+    frappe.cache().hdel(SUCCESSORS_CACHE_KEY, doc.name)
+
+def advance_campaign_contacts(campaign_contacts, successors):
+    """
+    Move campaign contacts past the step they were just sent
+    campaign_contacts is a list of (campaign contact name, current step name)
+    Contacts are updated with one statement per distinct (next_step, delay_days),
+    and contacts on the last step are marked Completed with one more
+    """
+    if not campaign_contacts:
+        return
+
+    now = now_datetime()
+    groups = {}
+
+    for campaign_contact, current_step in campaign_contacts:
+        # Steps missing from the sequence complete the contact, as the last step does
+        groups.setdefault(successors.get(current_step, (None, 0)), []).append(campaign_contact)
+
+    for (next_step, delay_days), names in groups.items():
+        if next_step:
+            frappe.db.sql("""
+                update `tabCampaign Contact`
+                set current_step = %(next_step)s, next_message_date = %(next_date)s,
+                    status = 'In Progress', last_message_date = %(now)s, modified = %(now)s
+                where name in %(names)s
+            """, {
+                "next_step": next_step,
+                "next_date": add_to_date(now, days=delay_days),
+                "now": now,
+                "names": tuple(names)
+            })
+        else:
+            frappe.db.sql("""
+                update `tabCampaign Contact`
+                set status = 'Completed', last_message_date = %(now)s, modified = %(now)s
+                where name in %(names)s
+            """, {"now": now, "names": tuple(names)})
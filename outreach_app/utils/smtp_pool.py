@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+# Defaults, overridable from site_config.json
+DEFAULT_MAX_SESSIONS_PER_ACCOUNT = 2
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_HEALTH_CHECK_INTERVAL = 30
+DEFAULT_CONNECT_TIMEOUT = 30
+DEFAULT_ACQUIRE_TIMEOUT = 60
+
+# One pool per site, so sessions are keyed by (site, account) and each site's settings apply
+_pools = {}
+_pool_lock = threading.Lock()
+
+class SMTPPoolError(Exception):
+    pass
+
+class SMTPSession(object):
+    """A logged-in SMTP connection owned by the pool"""
+
+    def __init__(self, account_name, fingerprint, server):
+        self.account_name = account_name
+        self.fingerprint = fingerprint
+        self.server = server
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.last_checked = self.created
+        self.uses = 0
+
+    def is_alive(self):
+        """Check the connection with a NOOP"""
+        try:
+            code = self.server.noop()[0]
+        except Exception:
+            return False
+
+        self.last_checked = time.monotonic()
+        return code == 250
+
+    def close(self):
+        """Close the connection, ignoring errors from dead sockets"""
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+class SMTPConnectionPool(object):
+    """
+    Keep-alive SMTP sessions keyed by Email Account
+    A worker sending many messages from one account connects and logs in once
+    A pool holds the accounts of a single site; get_smtp_pool keeps one per site
+    """
+
+    def __init__(self, max_sessions_per_account=DEFAULT_MAX_SESSIONS_PER_ACCOUNT,
+            idle_timeout=DEFAULT_IDLE_TIMEOUT, health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        self.max_sessions_per_account = max(1, max_sessions_per_account)
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = {}
+        self._in_use = {}
+        self._condition = threading.Condition()
+        self._last_eviction = time.monotonic()
+
+    def connect(self, account):
+        """Open and authenticate a new SMTP connection for an account"""
+        server = smtplib.SMTP(account.smtp_server, account.smtp_port, timeout=self.connect_timeout)
+
+        try:
+            if account.use_tls:
+                server.starttls()
+
+            server.login(account.username, account.get_password())
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+            raise
+
+        return server
+
+    def acquire(self, account):
+        """
+        Get a healthy session for an account, reusing an idle one when possible
+        Blocks while the account is at its session cap
+        """
+        fingerprint = get_account_fingerprint(account)
+        deadline = time.monotonic() + self.acquire_timeout
+
+        self.evict_idle()
+
+        while True:
+            with self._condition:
+                idle = self._idle.setdefault(account.name, [])
+                session = None
+
+                while idle:
+                    candidate = idle.pop()
+                    if candidate.fingerprint == fingerprint:
+                        session = candidate
+                        break
+
+                    # Account settings changed since this session was opened
+                    candidate.close()
+
+                in_use = self._in_use.get(account.name, 0)
+
+                if not session and in_use + len(idle) >= self.max_sessions_per_account:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise SMTPPoolError(f"Timed out waiting for an SMTP session for {account.name}")
+
+                    self._condition.wait(remaining)
+                    continue
+
+                self._in_use[account.name] = in_use + 1
+
+            try:
+                if session:
+                    if time.monotonic() - session.last_checked < self.health_check_interval or session.is_alive():
+                        return session
+
+                    session.close()
+
+                return SMTPSession(account.name, fingerprint, self.connect(account))
+            except Exception:
+                self._release_slot(account.name)
+                raise
+
+    def release(self, session, discard=False):
+        """Return a session to the pool, or close it if it is no longer usable"""
+        if discard:
+            session.close()
+        else:
+            session.last_used = time.monotonic()
+
+        self._release_slot(session.account_name, None if discard else session)
+
+    def _release_slot(self, account_name, session=None):
+        with self._condition:
+            if session:
+                self._idle.setdefault(account_name, []).append(session)
+
+            self._in_use[account_name] = max(0, self._in_use.get(account_name, 0) - 1)
+            self._condition.notify_all()
+
+    @contextmanager
+    def session(self, account):
+        """Context manager yielding a logged-in smtplib.SMTP for an account"""
+        session = self.acquire(account)
+
+        try:
+            yield session.server
+        except Exception as e:
+            self.release(session, discard=is_connection_error(e))
+            raise
+        else:
+            self.release(session)
+
+    def sendmail(self, account, from_addr, to_addrs, msg, breaker=None):
+        """
+        Send a message over a pooled session
+        Reconnects once if a reused connection turns out to be dead; failures on a
+        fresh connection are not retried so a message is never sent twice
+        With a CircuitBreaker, nothing is attempted while the account's or its
+        server's breaker is open (CircuitOpenError), and the outcome is reported to it
+        """
+        ticket = breaker.acquire(account.name, account.smtp_server) if breaker else None
+
+        try:
+            result = self._sendmail(account, from_addr, to_addrs, msg)
+        except Exception as e:
+            if ticket and not isinstance(e, SMTPPoolError):
+                from outreach_app.outreach_app.utils.circuit_breaker import is_breaker_failure
+
+                if is_breaker_failure(e):
+                    breaker.record_failure(ticket)
+                else:
+                    # The server answered; only this message was refused
+                    breaker.record_success(ticket)
+            raise
+
+        if ticket:
+            breaker.record_success(ticket)
+
+        return result
+
+    def _sendmail(self, account, from_addr, to_addrs, msg):
+        for attempt in range(2):
+            session = self.acquire(account)
+            reused = session.uses > 0
+
+            try:
+                session.uses += 1
+                result = session.server.sendmail(from_addr, to_addrs, msg)
+            except Exception as e:
+                connection_error = is_connection_error(e)
+                self.release(session, discard=connection_error)
+
+                if connection_error and reused and attempt == 0:
+                    continue
+
+                raise
+
+            self.release(session)
+            return result
+
+    def evict_idle(self, force=False):
+        """Close sessions that have been idle longer than idle_timeout"""
+        now = time.monotonic()
+
+        if not force and now - self._last_eviction < min(self.idle_timeout, self.health_check_interval):
+            return
+
+        expired = []
+
+        with self._condition:
+            self._last_eviction = now
+
+            for account_name, idle in self._idle.items():
+                keep = []
+                for session in idle:
+                    if now - session.last_used > self.idle_timeout:
+                        expired.append(session)
+                    else:
+                        keep.append(session)
+
+                self._idle[account_name] = keep
+
+        for session in expired:
+            session.close()
+
+    def close_account(self, account_name):
+        """Close all idle sessions for an account, e.g. after a credential error"""
+        with self._condition:
+            idle = self._idle.pop(account_name, [])
+
+        for session in idle:
+            session.close()
+
+    def close_all(self):
+        """Close every idle session in the pool"""
+        with self._condition:
+            idle = [session for sessions in self._idle.values() for session in sessions]
+            self._idle = {}
+
+        for session in idle:
+            session.close()
+
+def get_account_fingerprint(account):
+    """Connection settings that invalidate pooled sessions when changed"""
+    return (account.smtp_server, account.smtp_port, account.use_tls, account.username, str(account.modified))
+
+def is_connection_error(error):
+    """
+    True if the error means the underlying connection is unusable
+    smtplib.SMTPException subclasses OSError, so protocol errors are excluded explicitly
+    """
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+
+    if isinstance(error, smtplib.SMTPResponseException):
+        return False
+
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def get_smtp_pool():
+    """
+    Get this process's SMTP connection pool for the current site
+    Workers serving several sites keep a pool per site, so an Email Account name
+    used on two sites never shares a session and each site's settings apply
+    """
+    site = getattr(frappe.local, "site", None)
+    pool = _pools.get(site)
+
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(site)
+            if pool is None:
+                conf = frappe.conf or {}
+                pool = _pools[site] = SMTPConnectionPool(
+                    max_sessions_per_account=conf.get("outreach_smtp_max_sessions_per_account", DEFAULT_MAX_SESSIONS_PER_ACCOUNT),
+                    idle_timeout=conf.get("outreach_smtp_idle_timeout", DEFAULT_IDLE_TIMEOUT),
+                    health_check_interval=conf.get("outreach_smtp_health_check_interval", DEFAULT_HEALTH_CHECK_INTERVAL),
+                    connect_timeout=conf.get("outreach_smtp_connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+                    acquire_timeout=conf.get("outreach_smtp_acquire_timeout", DEFAULT_ACQUIRE_TIMEOUT)
+                )
+
+    return pool
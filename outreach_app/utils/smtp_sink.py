@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import asyncio
+import threading
+import time
+
+class SMTPSink(object):
+    """
+    Minimal local SMTP server that accepts and discards every message
+    Used to measure sending throughput without a real provider:
+
+        with SMTPSink(latency=0.01) as sink:
+            # point test accounts at sink.host / sink.port with use_tls = 0
+            ...
+        print(sink.messages)
+
+    Any AUTH credentials are accepted. STARTTLS is not supported.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.messages = 0
+        self.connections = 0
+        self.logins = 0
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Start serving in a background thread"""
+        self._thread = threading.Thread(target=self._run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for the background thread to exit"""
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def wait_for(self, count, timeout=30):
+        """Wait until at least count messages have been received"""
+        deadline = time.monotonic() + timeout
+        while self.messages < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        return self.messages >= count
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+
+        async def reply(line):
+            writer.write(line.encode("ascii") + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply("220 outreach-sink ESMTP")
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                parts = line.decode("utf-8", "replace").strip().split(" ", 2)
+                command = parts[0].upper()
+
+                if command == "EHLO":
+                    await reply("250-outreach-sink\r\n250-8BITMIME\r\n250-AUTH PLAIN LOGIN\r\n250 SMTPUTF8")
+                elif command == "HELO":
+                    await reply("250 outreach-sink")
+                elif command == "AUTH":
+                    mechanism = parts[1].upper() if len(parts) > 1 else ""
+                    if mechanism == "LOGIN":
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await reader.readline()
+                    elif len(parts) < 3:
+                        await reply("334 ")
+                        await reader.readline()
+
+                    self.logins += 1
+                    await reply("235 2.7.0 Authentication successful")
+                elif command in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+
+                    while True:
+                        data = await reader.readline()
+                        if not data or data in (b".\r\n", b".\n"):
+                            break
+
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+
+                    self.messages += 1
+                    await reply("250 OK queued")
+                elif command == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
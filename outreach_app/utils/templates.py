@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import re
+import threading
+
+PLACEHOLDER_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)?)\}")
+
+# Built-in variable names and the Contact field each one reads
+CONTACT_ALIASES = {
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "full_name": "full_name",
+    "email": "email_id",
+    "company": "company_name"
+}
+
+CAMPAIGN_PREFIX = "campaign."
+
+_compiled_templates = {}
+_lock = threading.Lock()
+
+class CompiledText(object):
+    """
+    A template string split once into literal and placeholder segments
+    Literals are at even positions and variable names at odd positions, so
+    rendering is a single join
+    """
+
+    __slots__ = ("segments", "variables")
+
+    def __init__(self, text):
+        self.segments = PLACEHOLDER_PATTERN.split(text or "")
+        self.variables = set(self.segments[1::2])
+
+    def render(self, values):
+        parts = list(self.segments)
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+
+        return "".join(parts)
+
+class CompiledTemplate(object):
+    """Compiled subject and body of one Message Template revision"""
+
+    __slots__ = ("name", "modified", "subject", "body", "variables", "unknown")
+
+    def __init__(self, name, modified, subject, body, known_variables=None):
+        self.name = name
+        self.modified = modified
+        self.subject = CompiledText(subject)
+        self.body = CompiledText(body)
+        self.variables = self.subject.variables | self.body.variables
+        self.unknown = frozenset(self.variables - known_variables) if known_variables is not None else frozenset()
+
+    @property
+    def contact_fields(self):
+        """Contact fields that have to be loaded to render this template"""
+        fields = set()
+        for variable in self.variables - self.unknown:
+            if variable.startswith(CAMPAIGN_PREFIX):
+                continue
+
+            fields.add(CONTACT_ALIASES.get(variable, variable))
+
+        return fields
+
+    def render(self, contact, campaign=None):
+        """
+        Render subject and body for one recipient
+        Returns the personalized subject and message
+        """
+        values = {}
+        extra = None
+
+        for variable in self.variables:
+            if variable in self.unknown:
+                # Unknown placeholders are left as they are
+                value = "{" + variable + "}"
+            elif variable.startswith(CAMPAIGN_PREFIX):
+                value = campaign.get(variable[len(CAMPAIGN_PREFIX):]) if campaign else None
+            elif variable in CONTACT_ALIASES or contact.get(variable) is not None:
+                value = contact.get(CONTACT_ALIASES.get(variable, variable))
+            else:
+                if extra is None:
+                    extra = get_extra_variables(contact, campaign)
+                value = extra.get(variable)
+
+            values[variable] = "" if value is None else str(value)
+
+        return self.subject.render(values), self.body.render(values)
+
+def get_compiled_template(template):
+    """
+    Get the compiled form of a Message Template, cached by name and modified timestamp
+    Unknown placeholders are reported when a revision is compiled
+    """
+    modified = str(template.modified)
+    key = (frappe.local.site, template.name)
+
+    compiled = _compiled_templates.get(key)
+    if compiled and compiled.modified == modified:
+        return compiled
+
+    compiled = CompiledTemplate(template.name, modified, template.subject, template.body, get_known_variables())
+
+    if compiled.unknown:
+        frappe.log_error(
+            message=f"Message Template {template.name} uses unknown placeholders: {', '.join(sorted(compiled.unknown))}",
+            title="Message Template Error"
+        )
+
+    with _lock:
+        _compiled_templates[key] = compiled
+
+    return compiled
+
+def get_known_variables():
+    """
+    Variables a template may use: built-ins, any Contact field, Campaign fields
+    as {campaign.<field>} and names declared by the outreach_template_variable_names hook
+    """
+    known = set(CONTACT_ALIASES)
+    known.update(frappe.get_meta("Contact").get_valid_columns())
+    known.update(CAMPAIGN_PREFIX + field for field in frappe.get_meta("Campaign").get_valid_columns())
+    known.update(frappe.get_hooks("outreach_template_variable_names"))
+
+    return known
+
+def get_extra_variables(contact, campaign=None):
+    """
+    Values from apps that extend the variable set via the outreach_template_variables hook
+    Each hook method takes the recipient's contact and campaign and returns a dict;
+    the names it provides are declared in outreach_template_variable_names
+    """
+    values = {}
+    for method in frappe.get_hooks("outreach_template_variables"):
+        values.update(frappe.get_attr(method)(contact, campaign) or {})
+
+    return values
+
+def validate_template(doc, method=None):
+    """Warn about unknown placeholders when a Message Template is saved"""
+    compiled = CompiledTemplate(doc.name, str(doc.modified), doc.subject, doc.body, get_known_variables())
+
+    if compiled.unknown:
+        frappe.msgprint(
+            f"Unknown placeholders will be left as they are: {', '.join(sorted(compiled.unknown))}",
+            title="Message Template",
+            indicator="orange"
+        )
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import unittest
+from outreach_app.outreach_app.utils.allocator import proportional_split
+
+class TestProportionalSplit(unittest.TestCase):
+    def test_splits_in_proportion(self):
+        self.assertEqual(proportional_split(10, {"a": 50, "b": 30, "c": 20}), {"a": 5, "b": 3, "c": 2})
+
+    def test_largest_remainders_get_the_leftover_units(self):
+        shares = proportional_split(10, {"a": 10, "b": 10, "c": 10})
+
+        self.assertEqual(sum(shares.values()), 10)
+        self.assertEqual(sorted(shares.values()), [3, 3, 4])
+
+    def test_never_exceeds_capacity(self):
+        shares = proportional_split(7, {"a": 1, "b": 2, "c": 100})
+
+        self.assertEqual(sum(shares.values()), 7)
+        self.assertLessEqual(shares["a"], 1)
+        self.assertLessEqual(shares["b"], 2)
+
+    def test_count_over_total_gives_full_capacity(self):
+        self.assertEqual(proportional_split(50, {"a": 3, "b": 4}), {"a": 3, "b": 4})
+
+    def test_negative_and_missing_capacity_count_as_zero(self):
+        self.assertEqual(proportional_split(3, {"a": -2, "b": None, "c": 5}), {"a": 0, "b": 0, "c": 3})
+
+    def test_zero_count(self):
+        self.assertEqual(proportional_split(0, {"a": 3, "b": 4}), {"a": 0, "b": 0})
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import threading
+import unittest
+from outreach_app.outreach_app.utils.async_sender import AsyncSendEngine, PreparedAccount, SendJob
+from outreach_app.outreach_app.utils.smtp_pool import SMTPConnectionPool
+from outreach_app.outreach_app.utils.smtp_sink import SMTPSink
+
+class TrackingPool(SMTPConnectionPool):
+    """Connection pool that records how many sends run at once, overall and per account"""
+
+    def __init__(self, *args, **kwargs):
+        super(TrackingPool, self).__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.account_in_flight = {}
+        self.max_account_in_flight = {}
+
+    def sendmail(self, account, from_addr, to_addrs, msg, breaker=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.account_in_flight[account.name] = self.account_in_flight.get(account.name, 0) + 1
+            self.max_account_in_flight[account.name] = max(
+                self.max_account_in_flight.get(account.name, 0), self.account_in_flight[account.name]
+            )
+
+        try:
+            return super(TrackingPool, self).sendmail(account, from_addr, to_addrs, msg, breaker)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.account_in_flight[account.name] -= 1
+
+class TestAsyncSendEngine(unittest.TestCase):
+    def send_through_sink(self, messages, accounts, global_concurrency):
+        with SMTPSink(latency=0.01) as sink:
+            prepared = [
+                PreparedAccount(f"test-{i}", f"sender{i}@example.com", sink.host, sink.port, 0, f"sender{i}", "secret")
+                for i in range(accounts)
+            ]
+            jobs = [
+                SendJob(f"job-{i}", prepared[i % accounts], f"recipient{i}@example.com",
+                    "Subject: Test\r\n\r\nHello\r\n")
+                for i in range(messages)
+            ]
+
+            pool = TrackingPool()
+            try:
+                AsyncSendEngine(global_concurrency, pool=pool).run(jobs)
+            finally:
+                pool.close_all()
+
+            sink.wait_for(messages, timeout=5)
+
+        return sink, pool, jobs
+
+    def test_delivers_every_message(self):
+        sink, pool, jobs = self.send_through_sink(60, 6, 4)
+
+        self.assertTrue(all(job.success for job in jobs), [job.error for job in jobs if not job.success])
+        self.assertEqual(sink.messages, 60)
+
+    def test_one_send_at_a_time_per_account(self):
+        sink, pool, jobs = self.send_through_sink(40, 4, 10)
+
+        self.assertEqual(set(pool.max_account_in_flight.values()), {1})
+
+    def test_global_concurrency_cap(self):
+        sink, pool, jobs = self.send_through_sink(60, 10, 3)
+
+        self.assertLessEqual(pool.max_in_flight, 3)
+        self.assertEqual(sink.messages, 60)
+
+    def test_sessions_are_reused(self):
+        sink, pool, jobs = self.send_through_sink(30, 3, 3)
+
+        # One login per account, however many messages it sends
+        self.assertEqual(sink.logins, 3)
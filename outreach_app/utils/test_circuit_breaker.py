@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import datetime
+import smtplib
+import unittest
+from unittest.mock import patch
+from frappe.utils import add_to_date
+from outreach_app.outreach_app.utils.circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, is_breaker_failure, get_retry_datetime
+)
+from outreach_app.outreach_app.utils.send_slots import InMemorySlotStore
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(InMemorySlotStore(), failure_threshold=3, open_seconds=10,
+            max_open_seconds=25, probe_timeout=5)
+
+    def fail(self, account, smtp_server, now):
+        self.breaker.record_failure(self.breaker.acquire(account, smtp_server, now=now), now=now)
+
+    def assertBlocked(self, account, smtp_server, now, retry_at):
+        with self.assertRaises(CircuitOpenError) as context:
+            self.breaker.acquire(account, smtp_server, now=now)
+
+        self.assertEqual(context.exception.retry_at, retry_at)
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail("A", "smtp.example.com", 100)
+        self.fail("A", "smtp.example.com", 100)
+        self.breaker.acquire("A", "smtp.example.com", now=100)
+
+        self.fail("A", "smtp.example.com", 100)
+        self.assertBlocked("A", "smtp.example.com", 105, 110)
+
+    def test_success_resets_the_failure_count(self):
+        self.fail("A", None, 100)
+        self.fail("A", None, 100)
+        self.breaker.record_success(self.breaker.acquire("A", None, now=100))
+        self.fail("A", None, 100)
+        self.fail("A", None, 100)
+
+        self.assertEqual(self.breaker.blocked_until([("A", None)], now=101), {})
+
+    def test_server_breaker_blocks_every_account_on_it(self):
+        for i in range(3):
+            self.fail("A", "smtp.example.com", 100)
+
+        blocked = self.breaker.blocked_until(
+            [("A", "smtp.example.com"), ("B", "SMTP.example.com"), ("C", "smtp.other.com")], now=101
+        )
+        self.assertEqual(blocked, {"A": 110, "B": 110})
+
+    def test_half_open_allows_a_single_probe(self):
+        for i in range(3):
+            self.fail("A", None, 100)
+
+        self.breaker.acquire("A", None, now=111)
+        self.assertBlocked("A", None, 112, 116)
+
+    def test_failed_probe_doubles_the_open_period_up_to_the_maximum(self):
+        for i in range(3):
+            self.fail("A", None, 100)
+
+        self.fail("A", None, 111)
+        self.assertEqual(self.breaker.blocked_until([("A", None)], now=112), {"A": 131})
+
+        self.fail("A", None, 131)
+        self.assertEqual(self.breaker.blocked_until([("A", None)], now=132), {"A": 156})
+
+    def test_successful_probe_closes(self):
+        for i in range(3):
+            self.fail("A", None, 100)
+
+        self.breaker.record_success(self.breaker.acquire("A", None, now=111))
+
+        self.assertEqual(self.breaker.blocked_until([("A", None)], now=111), {})
+        self.assertEqual(self.breaker.store.get(["account:A"]), {"account:A": ""})
+
+    def test_abandoned_probe_is_given_up(self):
+        for i in range(3):
+            self.fail("A", None, 100)
+
+        self.breaker.acquire("A", None, now=111)
+        self.assertBlocked("A", None, 115, 116)
+
+        # The probe lease ran out, so the next caller probes instead
+        self.breaker.acquire("A", None, now=117)
+        self.assertBlocked("A", None, 118, 122)
+
+    def test_breaker_failures(self):
+        self.assertTrue(is_breaker_failure(ConnectionRefusedError()))
+        self.assertTrue(is_breaker_failure(smtplib.SMTPServerDisconnected()))
+        self.assertTrue(is_breaker_failure(smtplib.SMTPConnectError(421, b"busy")))
+        self.assertTrue(is_breaker_failure(smtplib.SMTPResponseException(421, b"try later")))
+        self.assertFalse(is_breaker_failure(smtplib.SMTPRecipientsRefused({})))
+        self.assertFalse(is_breaker_failure(smtplib.SMTPResponseException(550, b"no such user")))
+
+    def test_retry_datetime_keeps_the_offset_from_now(self):
+        now = datetime.datetime(2025, 3, 3, 9, 0, 0)
+
+        with patch("outreach_app.outreach_app.utils.circuit_breaker.now_datetime", return_value=now), \
+                patch("outreach_app.outreach_app.utils.circuit_breaker.time.time", return_value=1000.0):
+            self.assertEqual(get_retry_datetime(1090.0), add_to_date(now, seconds=90))
+            self.assertEqual(get_retry_datetime(900.0), now)
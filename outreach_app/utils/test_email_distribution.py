@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import unittest
+from outreach_app.outreach_app.benchmarks.pipeline import BenchmarkData
+from outreach_app.outreach_app.utils.email_distribution import distribute_emails_for_campaign
+from outreach_app.outreach_app.utils.query_profiler import assert_query_budget
+from outreach_app.outreach_app.utils.smtp_sink import SMTPSink
+
+CONTACTS = 200
+CHUNK_SIZE = 50
+
+# Query budget per queued email; each chunk runs a fixed set of statements,
+# so a per-contact query shows up as several queries per email
+DISTRIBUTION_BUDGET_PER_EMAIL = 1
+
+class TestDistributionQueryBudget(unittest.TestCase):
+    def setUp(self):
+        # Nothing is sent; the sink only gives the accounts a valid address
+        self.data = BenchmarkData(CONTACTS, providers=2, accounts=3)
+        with SMTPSink() as sink:
+            self.data.create(sink)
+
+    def tearDown(self):
+        frappe.db.rollback()
+        self.data.cleanup()
+
+    def test_distribute_emails_for_campaign(self):
+        with assert_query_budget(per_item=DISTRIBUTION_BUDGET_PER_EMAIL, name="distribute_emails_for_campaign") as profile:
+            profile.items = distribute_emails_for_campaign(self.data.campaign, CONTACTS, CHUNK_SIZE)
+
+        self.assertEqual(profile.items, CONTACTS)
+        self.assertEqual(frappe.db.count("Email Queue", {"campaign": self.data.campaign}), CONTACTS)
+        self.assertEqual(frappe.db.count("Sender Assignment", {"contact": ["like", f"{self.data.run_id}-%"]}), CONTACTS)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import unittest
+from outreach_app.outreach_app.utils.fair_share import DeficitRoundRobin, fair_shares
+
+class TestDeficitRoundRobin(unittest.TestCase):
+    def test_interleaves_equal_weights(self):
+        taken = DeficitRoundRobin({"a": [1, 2, 3], "b": [4, 5, 6]}).take()
+
+        self.assertEqual([name for name, item in taken], ["a", "b", "a", "b", "a", "b"])
+
+    def test_serves_in_proportion_to_weight(self):
+        queues = {"a": range(100), "b": range(100)}
+        taken = DeficitRoundRobin(queues, {"a": 3, "b": 1}).take(40)
+
+        self.assertEqual(sum(1 for name, item in taken if name == "a"), 30)
+        self.assertEqual(sum(1 for name, item in taken if name == "b"), 10)
+
+    def test_keeps_order_within_a_queue(self):
+        taken = DeficitRoundRobin({"a": [1, 2, 3], "b": [4]}, {"a": 0.5}).take()
+
+        self.assertEqual([item for name, item in taken if name == "a"], [1, 2, 3])
+        self.assertEqual(len(taken), 4)
+
+    def test_empty_queues_are_ignored(self):
+        self.assertEqual(DeficitRoundRobin({"a": [], "b": [1]}).take(), [("b", 1)])
+
+class TestFairShares(unittest.TestCase):
+    def test_splits_by_weight(self):
+        self.assertEqual(fair_shares({"a": 100, "b": 100}, 40, {"a": 3, "b": 1}), {"a": 30, "b": 10})
+
+    def test_unused_share_goes_to_others(self):
+        self.assertEqual(fair_shares({"a": 5, "b": 100}, 40), {"a": 5, "b": 35})
+
+    def test_never_exceeds_demand(self):
+        self.assertEqual(fair_shares({"a": 3, "b": 2}, 100), {"a": 3, "b": 2})
+
+    def test_no_capacity(self):
+        self.assertEqual(fair_shares({"a": 10, "b": 0}, 0), {"a": 0, "b": 0})
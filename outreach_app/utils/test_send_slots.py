@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import frappe
+import datetime
+import unittest
+from unittest.mock import patch
+from outreach_app.outreach_app.utils.rate_limiter import HOUR
+from outreach_app.outreach_app.utils.send_slots import InMemorySlotStore, SendSlotCalendar, SlotSettings
+
+NOW = datetime.datetime(2025, 3, 3, 9, 0, 0)
+
+def make_settings(accounts=None, providers=None, account_usage=None, provider_usage=None):
+    """SlotSettings for accounts {name: (hourly_limit, daily_limit)} and providers {name: row fields}"""
+    accounts = accounts or {}
+    providers = {
+        name: frappe._dict(dict({
+            "name": name,
+            "min_interval_seconds": 60,
+            "max_interval_seconds": 60,
+            "enable_random_intervals": 0
+        }, **fields))
+        for name, fields in (providers or {}).items()
+    }
+
+    return SlotSettings(
+        accounts,
+        dict({name: (0, 0) for name in accounts}, **(account_usage or {})),
+        providers,
+        dict({name: (0, 0) for name in providers}, **(provider_usage or {}))
+    )
+
+class ContendedSlotStore(InMemorySlotStore):
+    """Slot store whose cursors another worker always moves first"""
+
+    def compare_and_set(self, expected, values):
+        return False
+
+class TestSendSlotCalendar(unittest.TestCase):
+    def allocate(self, requests, settings, calendar=None):
+        calendar = calendar or SendSlotCalendar(InMemorySlotStore())
+
+        with patch("outreach_app.outreach_app.utils.send_slots.load_slot_settings", return_value=settings):
+            return calendar.allocate(requests, now=NOW, natural=False)
+
+    def offsets(self, slots):
+        return [(slot - NOW).total_seconds() for slot in slots]
+
+    def test_account_slots_spread_over_hourly_limit(self):
+        settings = make_settings(accounts={"A": (4, 100)})
+        slots = self.allocate([("A", None)] * 3, settings)
+
+        self.assertEqual(self.offsets(slots), [0, HOUR / 4, HOUR / 2])
+
+    def test_provider_slots_spaced_by_interval(self):
+        settings = make_settings(
+            accounts={"A": (3600, 10000), "B": (3600, 10000)},
+            providers={"P": {"min_interval_seconds": 90, "max_interval_seconds": 90}}
+        )
+        slots = self.allocate([("A", "P"), ("B", "P"), ("A", "P")], settings)
+
+        self.assertEqual(self.offsets(slots), [90, 180, 270])
+
+    def test_full_hourly_block_moves_to_next_hour(self):
+        # One send already recorded this hour leaves room for one more
+        settings = make_settings(accounts={"A": (2, 100)}, account_usage={"A": (1, 1)})
+        slots = self.allocate([("A", None)] * 2, settings)
+
+        self.assertEqual(self.offsets(slots), [0, HOUR])
+
+    def test_no_slot_without_capacity(self):
+        settings = make_settings(accounts={"A": (10, 0)})
+
+        self.assertEqual(self.allocate([("A", None)], settings), [None])
+
+    def test_allocations_continue_from_stored_cursors(self):
+        calendar = SendSlotCalendar(InMemorySlotStore())
+        settings = make_settings(accounts={"A": (6, 100)})
+
+        first = self.allocate([("A", None)] * 2, settings, calendar)
+        second = self.allocate([("A", None)], settings, calendar)
+
+        self.assertEqual(self.offsets(first + second), [0, HOUR / 6, HOUR / 3])
+
+    def test_no_slots_when_cursors_cannot_be_recorded(self):
+        calendar = SendSlotCalendar(ContendedSlotStore())
+        settings = make_settings(accounts={"A": (6, 100)})
+
+        with patch("outreach_app.outreach_app.utils.send_slots.frappe.log_error"):
+            self.assertEqual(self.allocate([("A", None)] * 2, settings, calendar), [None, None])
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import random
+import unittest
+from collections import Counter
+from outreach_app.outreach_app.utils.weighted_sampler import WeightedSampler
+
+class TestWeightedSampler(unittest.TestCase):
+    def test_prefix_sums(self):
+        sampler = WeightedSampler([1, 2, 3, 4, 5])
+
+        self.assertEqual([sampler.prefix_sum(i) for i in range(6)], [0, 1, 3, 6, 10, 15])
+        self.assertEqual(sampler.total, 15)
+
+    def test_update_changes_sums(self):
+        sampler = WeightedSampler([1, 2, 3, 4, 5])
+        sampler.update(2, 10)
+
+        self.assertEqual(sampler.get(2), 10)
+        self.assertEqual(sampler.prefix_sum(3), 13)
+        self.assertEqual(sampler.total, 22)
+
+    def test_find_maps_targets_to_indexes(self):
+        sampler = WeightedSampler([1, 0, 2, 1])
+
+        self.assertEqual(sampler.find(0), 0)
+        self.assertEqual(sampler.find(0.99), 0)
+        self.assertEqual(sampler.find(1), 2)
+        self.assertEqual(sampler.find(2.99), 2)
+        self.assertEqual(sampler.find(3.5), 3)
+
+    def test_zero_weights_are_never_sampled(self):
+        sampler = WeightedSampler([0, 1, 0, 1, 0])
+        rng = random.Random(7)
+
+        self.assertEqual({sampler.sample(rng) for i in range(500)}, {1, 3})
+
+    def test_all_zero_returns_none(self):
+        self.assertIsNone(WeightedSampler([0, 0]).sample())
+        self.assertIsNone(WeightedSampler([]).sample())
+
+        sampler = WeightedSampler([1])
+        sampler.update(0, 0)
+        self.assertIsNone(sampler.sample())
+
+    def test_samples_in_proportion_to_weight(self):
+        sampler = WeightedSampler([1, 3, 6])
+        rng = random.Random(42)
+        counts = Counter(sampler.sample(rng) for i in range(20000))
+
+        for index, expected in enumerate([0.1, 0.3, 0.6]):
+            self.assertAlmostEqual(counts[index] / 20000.0, expected, delta=0.02)
+
+    def test_negative_weights_count_as_zero(self):
+        sampler = WeightedSampler([-5, 2])
+
+        self.assertEqual(sampler.total, 2)
+        self.assertEqual(sampler.sample(random.Random(1)), 1)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2025, Your Company and contributors
+# For license information, please see license.txt
+
+from __future__ import unicode_literals
+import random
+
+class WeightedSampler(object):
+    """
+    Weighted random sampling over indexes 0..n-1 backed by a Fenwick tree
+    Sampling and changing one weight are O(log n); building is O(n)
+    Weights must be non-negative; an index with weight 0 is never sampled
+    """
+
+    def __init__(self, weights=()):
+        self.weights = [max(0.0, float(weight)) for weight in weights]
+        self.size = len(self.weights)
+        self.tree = [0.0] + self.weights
+
+        # Build in O(n) by pushing each node's sum to its parent
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+        self.top = 1 << self.size.bit_length() if self.size else 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def total(self):
+        return self.prefix_sum(self.size)
+
+    def get(self, index):
+        return self.weights[index]
+
+    def update(self, index, weight):
+        """Set the weight of one index"""
+        weight = max(0.0, float(weight))
+        delta = weight - self.weights[index]
+
+        if not delta:
+            return
+
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, count):
+        """Sum of the weights of the first count indexes"""
+        total = 0.0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+
+        return total
+
+    def sample(self, rng=random):
+        """
+        Pick an index with probability proportional to its weight
+        Returns None if every weight is 0
+        """
+        total = self.total
+        if total <= 0:
+            return None
+
+        return self.find(rng.random() * total)
+
+    def find(self, target):
+        """Smallest index whose prefix sum including it exceeds target"""
+        position = 0
+        step = self.top
+
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+
+        index = min(position, self.size - 1)
+        if self.weights[index]:
+            return index
+
+        # Floating point drift left position on a zero weight or past the end
+        for candidate in list(range(index - 1, -1, -1)) + list(range(index + 1, self.size)):
+            if self.weights[candidate]:
+                return candidate
+
+        return None